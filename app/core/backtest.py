@@ -0,0 +1,225 @@
+# backtest.py
+import argparse
+import json
+import logging
+import os
+import time
+import numpy as np
+import pandas as pd
+from indicators import calculate_ema_matrix, OHLCV_COLUMNS
+from candle_store import CandleStore
+
+SEARCH_CHUNK = 256
+TP_TOLERANCE = 0.0001  # same slack process_trade gives the take-profit check
+
+def load_ohlcv(path):
+    """
+    Load candles from .npy (n x 6 array) or .csv (timestamp, open, high, low,
+    close, volume; timestamps in ms or as dates). Returns a float64 n x 6 array.
+    """
+    if path.endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    df = pd.read_csv(path)
+    if list(df.columns[:6]) != OHLCV_COLUMNS:
+        df = pd.read_csv(path, header=None, names=OHLCV_COLUMNS, usecols=range(6))
+    if not np.issubdtype(df['timestamp'].dtype, np.number):
+        df['timestamp'] = pd.to_datetime(df['timestamp']).astype('datetime64[ms]').astype(np.int64)
+    return df[OHLCV_COLUMNS].to_numpy(dtype=np.float64)
+
+def crossed_above(fast, slow):
+    cross = np.zeros(len(fast), dtype=bool)
+    cross[1:] = (fast[:-1] <= slow[:-1]) & (fast[1:] > slow[1:])
+    return cross
+
+def crossed_below(fast, slow):
+    cross = np.zeros(len(fast), dtype=bool)
+    cross[1:] = (fast[:-1] >= slow[:-1]) & (fast[1:] < slow[1:])
+    return cross
+
+def _first_index(condition, start, stop):
+    # First i in [start, stop) where condition(slice) is true, searched in growing chunks
+    chunk = SEARCH_CHUNK
+    lo = start
+    while lo < stop:
+        hi = min(stop, lo + chunk)
+        hits = np.flatnonzero(condition(slice(lo, hi)))
+        if len(hits):
+            return lo + int(hits[0])
+        lo = hi
+        chunk *= 2
+    return None
+
+def _simulate_exit(e, ohlcv, exit_setups, tp_pct, sl_pct, exit_minutes, use_exitmin):
+    """
+    Exit for a long entered at the open of bar e, following process_trade:
+    at each bar open the take-profit, stop-loss, EMA-crossover and time exits are
+    checked in that order; inside a bar the stop-loss is assumed to be hit before
+    the take-profit when both are in range.
+    """
+    timestamps, opens, highs, lows, closes = ohlcv[:, 0], ohlcv[:, 1], ohlcv[:, 2], ohlcv[:, 3], ohlcv[:, 4]
+    n = len(ohlcv)
+    entry = opens[e]
+    tp_price = entry * (1 + tp_pct / 100) - TP_TOLERANCE
+    sl_price = entry * (1 - sl_pct / 100)
+
+    scheduled, scheduled_reason = n, None
+    if use_exitmin:
+        time_bar = int(np.searchsorted(timestamps, timestamps[e] + exit_minutes * 60000, side='left'))
+        if time_bar < n:
+            scheduled, scheduled_reason = time_bar, f"⏳ Time-Based ({exit_minutes} min)"
+
+    # exitcondition: the second EMA below EMA3 stores that candle's low, a later close below it exits
+    i = int(np.searchsorted(exit_setups, e - 1))
+    if i < len(exit_setups) and exit_setups[i] + 1 < scheduled:
+        q = int(exit_setups[i])
+        stored_low = lows[q]
+        if stored_low:
+            m = _first_index(lambda s: closes[s] < stored_low, q + 1, min(scheduled, n - 1))
+            if m is not None:
+                scheduled, scheduled_reason = m + 1, "EMA Crossover Exit"
+
+    k = _first_index(lambda s: (opens[s] >= tp_price) | (opens[s] <= sl_price) | (lows[s] <= sl_price) | (highs[s] >= tp_price), e, scheduled)
+    if k is None:
+        if scheduled < n:
+            k = scheduled
+        else:
+            return n - 1, closes[-1], "End of data"
+    if opens[k] >= tp_price:
+        return k, opens[k], "Take-profit"
+    if opens[k] <= sl_price:
+        return k, opens[k], "Stop-loss"
+    if k == scheduled:
+        return k, opens[k], scheduled_reason
+    if lows[k] <= sl_price:
+        return k, sl_price, "Stop-loss"
+    return k, tp_price + TP_TOLERANCE, "Take-profit"
+
+def run_backtest(ohlcv, ema1, ema2, ema3, tp_pct, sl_pct, exit_minutes, use_exitmin=True, leverage=1, fee_pct=0.0, margin_fraction=0.99):
+    """
+    Replay candles through the check_strategy entry rules and the process_trade
+    exits. Crossovers are found with array operations; the small state machine
+    only runs on crossover events. Returns (trades, equity) where equity holds
+    the account value (starting at 1.0) after each trade.
+    """
+    ohlcv = np.asarray(ohlcv, dtype=np.float64)
+    n = len(ohlcv)
+    timestamps, opens, highs, closes = ohlcv[:, 0], ohlcv[:, 1], ohlcv[:, 2], ohlcv[:, 4]
+    ema1_up, ema2_up = crossed_above(ema1, ema3), crossed_above(ema2, ema3)
+    ema1_down, ema2_down = crossed_below(ema1, ema3), crossed_below(ema2, ema3)
+    entry_events = np.flatnonzero(ema1_up | ema2_up)
+    exit_setups = np.flatnonzero((ema1_down & (ema2 < ema3)) | (ema2_down & (ema1 < ema3)))
+
+    trades = []
+    equity = [1.0]
+    next_free = 1
+    while True:
+        i = int(np.searchsorted(entry_events, next_free))
+        if i == len(entry_events):
+            break
+        t = int(entry_events[i])
+        if t + 3 >= n:
+            break
+        # check_strategy: first cross on t, the other EMA must cross on t + 1, breakout on t + 2
+        second = ema2_up[t + 1] if ema1_up[t] else ema1_up[t + 1]
+        if not second:
+            next_free = t + 2
+            continue
+        stored_high = highs[t + 1]
+        if not (stored_high and closes[t + 2] > stored_high):
+            next_free = t + 3
+            continue
+        e = t + 3  # entry at the next candle's open
+        x, exit_price, reason = _simulate_exit(e, ohlcv, exit_setups, tp_pct, sl_pct, exit_minutes, use_exitmin)
+        entry_price = opens[e]
+        pl_pct = ((exit_price - entry_price) / entry_price * 100 - 2 * fee_pct) * leverage
+        equity.append(equity[-1] * (1 + pl_pct / 100 * margin_fraction))
+        trades.append({
+            "entry_time": int(timestamps[e]),
+            "exit_time": int(timestamps[x]),
+            "entry_price": float(entry_price),
+            "exit_price": float(exit_price),
+            "pl_pct": round(float(pl_pct), 4),
+            "reason": reason,
+        })
+        next_free = max(x, e + 1)
+    return trades, np.asarray(equity)
+
+def backtest_symbol(ohlcv, params, leverage=1, fee_pct=0.0):
+    ohlcv = np.asarray(ohlcv, dtype=np.float64)
+    emas = calculate_ema_matrix(ohlcv[:, 4], [params['ema1'], params['ema2'], params['ema3']])
+    return run_backtest(ohlcv, emas[:, 0], emas[:, 1], emas[:, 2], params['tp'], params['sl'], params['exitmin'], params.get('use_exitmin', True), leverage, fee_pct)
+
+def summarize(trades, equity):
+    pl = np.array([trade['pl_pct'] for trade in trades], dtype=np.float64)
+    wins, losses = pl[pl > 0], pl[pl <= 0]
+    peak = np.maximum.accumulate(equity)
+    return {
+        "trades": len(pl),
+        "win_rate": float(len(wins) / len(pl) * 100) if len(pl) else 0.0,
+        "avg_win": float(wins.mean()) if len(wins) else 0.0,
+        "avg_loss": float(losses.mean()) if len(losses) else 0.0,
+        "return_pct": float((equity[-1] - 1) * 100),
+        "max_drawdown_pct": float(((equity - peak) / peak).min() * 100),
+    }
+
+def load_parameters(config_path):
+    params = {}
+    if os.path.exists(config_path):
+        with open(config_path, 'r') as f:
+            params = json.load(f).get('parameters', {})
+    return {
+        'ema1': params.get('ema1', 21),
+        'ema2': params.get('ema2', 60),
+        'ema3': params.get('ema3', 365),
+        'tp': params.get('tp', 0.5),
+        'sl': params.get('sl', 2),
+        'exitmin': params.get('exitmin', 2),
+        'use_exitmin': params.get('use_exitmin', True),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the EMA crossover strategy on local OHLCV files")
+    parser.add_argument('data', nargs='+', help="OHLCV .csv or .npy files, one per symbol (symbols with --store)")
+    parser.add_argument('--store', help="Read the symbols from this candle store instead of files")
+    parser.add_argument('--timeframe', default='1m', help="Timeframe to read from --store")
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--ema1', type=int)
+    parser.add_argument('--ema2', type=int)
+    parser.add_argument('--ema3', type=int)
+    parser.add_argument('--tp', type=float)
+    parser.add_argument('--sl', type=float)
+    parser.add_argument('--exitmin', type=float)
+    parser.add_argument('--no-exitmin', action='store_true')
+    parser.add_argument('--leverage', type=int, default=1)
+    parser.add_argument('--fee', type=float, default=0.04, help="Fee per side in percent")
+    parser.add_argument('--out', default='backtest_results')
+    args = parser.parse_args()
+
+    params = load_parameters(args.config)
+    for name in ('ema1', 'ema2', 'ema3', 'tp', 'sl', 'exitmin'):
+        if getattr(args, name) is not None:
+            params[name] = getattr(args, name)
+    if args.no_exitmin:
+        params['use_exitmin'] = False
+
+    os.makedirs(args.out, exist_ok=True)
+    store = CandleStore(args.store) if args.store else None
+    for path in args.data:
+        started = time.perf_counter()
+        if store is not None:
+            symbol = path.split(':')[0].replace('/', '')
+            ohlcv = store.read_ohlcv(path, args.timeframe)
+        else:
+            symbol = os.path.splitext(os.path.basename(path))[0]
+            ohlcv = load_ohlcv(path)
+        trades, equity = backtest_symbol(ohlcv, params, args.leverage, args.fee)
+        elapsed = time.perf_counter() - started
+        pd.DataFrame(trades).to_csv(os.path.join(args.out, f"{symbol}_trades.csv"), index=False)
+        exit_times = [int(ohlcv[0, 0])] + [trade['exit_time'] for trade in trades]
+        pd.DataFrame({'timestamp': exit_times, 'equity': equity}).to_csv(os.path.join(args.out, f"{symbol}_equity.csv"), index=False)
+        stats = summarize(trades, equity)
+        print(f"{symbol}: {len(ohlcv)} bars in {elapsed:.2f}s | " + ", ".join(f"{key}={value:.2f}" for key, value in stats.items()))
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,239 @@
+# benchmark.py
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import numpy as np
+import pandas as pd
+from indicators import calculate_ema, calculate_emas, OHLCV_COLUMNS
+from strategy import check_strategy, exitcondition
+from trading import BalanceTracker
+from mock_exchange import MockExchange
+from market_rules import index_markets
+from positions import PositionManager
+from scanner import Scanner
+from time_utils import ServerClock
+from trade_journal import TradeJournal
+from backtest import load_ohlcv
+from candle_store import CandleStore
+
+TIMEFRAME = '1m'
+TIMEFRAME_MS = 60_000
+START_MS = 1_704_067_200_000  # 2024-01-01 00:00 UTC
+EMA_PERIODS = (21, 60, 365)
+
+def synthetic_ohlcv(bars, seed=0, start_ms=START_MS, price=100.0):
+    """Random-walk 1m candles as an n x 6 float64 array; the same seed gives the same candles."""
+    rng = np.random.default_rng(seed)
+    closes = price * np.exp(np.cumsum(rng.normal(0, 0.001, bars)))
+    opens = np.concatenate(([price], closes[:-1]))
+    spread = np.abs(rng.normal(0, 0.0005, (2, bars))) * closes
+    ohlcv = np.empty((bars, len(OHLCV_COLUMNS)), dtype=np.float64)
+    ohlcv[:, 0] = start_ms + np.arange(bars) * TIMEFRAME_MS
+    ohlcv[:, 1] = opens
+    ohlcv[:, 2] = np.maximum(opens, closes) + spread[0]
+    ohlcv[:, 3] = np.minimum(opens, closes) - spread[1]
+    ohlcv[:, 4] = closes
+    ohlcv[:, 5] = rng.uniform(1, 1000, bars)
+    return ohlcv
+
+def recorded_ohlcv(recorded, bars):
+    # Last bars candles of the recorded series, or None when it is shorter
+    return np.asarray(recorded[-bars:], dtype=np.float64) if len(recorded) >= bars else None
+
+def to_frame(ohlcv):
+    df = pd.DataFrame(ohlcv, columns=OHLCV_COLUMNS)
+    df["timestamp"] = pd.to_datetime(df["timestamp"].astype(np.int64), unit="ms")
+    return df
+
+def measure(fn, repeat=5, number=None, budget=0.2):
+    """
+    Seconds per call of fn, best/median/mean over repeat rounds. number calls
+    per round defaults to as many as fit in budget seconds (at least one).
+    """
+    if number is None:
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        number = max(1, int(budget / elapsed)) if elapsed > 0 else 1000
+    rounds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - started) / number)
+    return {'calls': number, 'repeat': repeat, 'min_ms': min(rounds) * 1000, 'median_ms': statistics.median(rounds) * 1000, 'mean_ms': statistics.fmean(rounds) * 1000}
+
+def bench_indicators(ohlcv, source, repeat):
+    df = to_frame(ohlcv)
+    closes = df['close']
+    with_emas = calculate_emas(df.copy(), *EMA_PERIODS)
+    results = []
+    cases = [
+        ('calculate_ema', lambda: calculate_ema(closes, EMA_PERIODS[2])),
+        ('calculate_emas', lambda: calculate_emas(df, *EMA_PERIODS)),
+        ('check_strategy', lambda: check_strategy(with_emas, 'BENCH/USDT', None, {}, True)),
+    ]
+    loop = asyncio.new_event_loop()
+    exit_state = {'first_ema_crossed': False, 'second_ema_crossed': False, 'stored_low': None}
+    cases.append(('exitcondition', lambda: loop.run_until_complete(exitcondition(with_emas, exit_state))))
+    try:
+        for name, fn in cases:
+            results.append({'name': name, 'data': source, 'bars': len(ohlcv), 'symbols': 1, **measure(fn, repeat)})
+    finally:
+        loop.close()
+    return results
+
+class ScanHarness:
+    """
+    The bot's own Scanner (scan_symbols: candles, incremental EMAs,
+    check_strategy, then BalanceTracker, MarketRules and PositionManager
+    sizing, leverage and a market buy on a signal) against a MockExchange,
+    without Telegram or main's globals. advance() appends one candle per
+    symbol, like a new close.
+    """
+
+    def __init__(self, series, leverage=2, concurrency=10):
+        self.series = series  # symbol -> n x 6 array, rows past self.position not yet visible
+        self.exchange = MockExchange(prices={symbol: float(ohlcv[-1, 4]) for symbol, ohlcv in series.items()}, balance=1_000_000.0)
+        self.positions = PositionManager(max_positions=len(series))
+        self.scanner = Scanner(
+            self.exchange, self.positions, BalanceTracker(self.exchange), ServerClock(self.exchange), TradeJournal(':memory:'),
+            index_markets({symbol: self.exchange.market(symbol) for symbol in series}), set(series), [TIMEFRAME], tuple([period] for period in EMA_PERIODS),
+            [leverage], [0.5], [2], scan_concurrency=[concurrency],
+        )
+        self.position = 0
+
+    @property
+    def orders(self):
+        return len(self.positions)
+
+    def show(self, candles):
+        self.position = candles
+        for symbol, ohlcv in self.series.items():
+            self.exchange.set_ohlcv(symbol, TIMEFRAME, ohlcv[:candles].tolist())
+
+    def advance(self):
+        for symbol, ohlcv in self.series.items():
+            self.exchange.ohlcv[(symbol, TIMEFRAME)].append(ohlcv[self.position].tolist())
+            self.exchange.prices[symbol] = float(ohlcv[self.position, 4])
+        self.position += 1
+
+    async def scan(self):
+        await self.scanner.scan_symbols(list(self.series))
+
+def bench_scan(series, source, window, candles, concurrency):
+    """Cold scan (first fetch, EMA rebuild) then one scan per new candle for candles candles."""
+    harness = ScanHarness(series, concurrency=concurrency)
+    harness.show(window)
+    loop = asyncio.new_event_loop()
+    try:
+        started = time.perf_counter()
+        loop.run_until_complete(harness.scan())
+        cold = time.perf_counter() - started
+        rounds = []
+        for _ in range(candles):
+            harness.advance()
+            started = time.perf_counter()
+            loop.run_until_complete(harness.scan())
+            rounds.append(time.perf_counter() - started)
+    finally:
+        loop.close()
+    rounds_ms = np.asarray(rounds) * 1000
+    return {
+        'name': 'scan_symbols', 'data': source, 'bars': window, 'symbols': len(series), 'calls': candles,
+        'cold_ms': cold * 1000, 'min_ms': float(rounds_ms.min()), 'median_ms': float(np.median(rounds_ms)),
+        'mean_ms': float(rounds_ms.mean()), 'p95_ms': float(np.percentile(rounds_ms, 95)),
+        'per_symbol_ms': float(np.median(rounds_ms)) / len(series), 'orders': harness.orders,
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def compare(results, baseline_path):
+    # Ratio of median_ms against a previous run's output for the cases both contain
+    with open(baseline_path, 'r') as f:
+        baseline = {(r['name'], r['data'], r['bars'], r['symbols']): r for r in json.load(f)['results']}
+    for result in results:
+        old = baseline.get((result['name'], result['data'], result['bars'], result['symbols']))
+        if old:
+            result['baseline_median_ms'] = old['median_ms']
+            result['ratio'] = result['median_ms'] / old['median_ms'] if old['median_ms'] else None
+
+def load_recorded(args):
+    if args.data:
+        return load_ohlcv(args.data)
+    if args.store:
+        return CandleStore(args.store).read_ohlcv(args.symbol, args.timeframe)
+    return None
+
+def run(args):
+    recorded = load_recorded(args)
+    sources = [('synthetic', lambda bars, seed: synthetic_ohlcv(bars, seed))]
+    if recorded is not None:
+        sources.append(('recorded', lambda bars, seed: recorded_ohlcv(recorded, bars)))
+    results = []
+    for source, make in sources:
+        for bars in args.bars:
+            ohlcv = make(bars, 0)
+            if ohlcv is None:
+                logging.warning(f"Recorded data has {len(recorded)} candles, skipping {bars} bars")
+                continue
+            results.extend(bench_indicators(ohlcv, source, args.repeat))
+        for symbols in args.symbols:
+            total = args.window + args.candles
+            series = {}
+            for i in range(symbols):
+                ohlcv = make(total, i)
+                if ohlcv is None:
+                    break
+                series[f"S{i:03d}/USDT"] = ohlcv
+            if len(series) < symbols:
+                logging.warning(f"Recorded data has {len(recorded)} candles, skipping the scan benchmark")
+                break
+            results.append(bench_scan(series, source, args.window, args.candles, args.concurrency))
+    if args.compare:
+        compare(results, args.compare)
+    return {
+        'commit': git_commit(), 'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__, 'machine': platform.machine(),
+        'results': results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the indicators, strategy checks and the per-candle scan")
+    parser.add_argument('--bars', type=int, nargs='+', default=[500, 10_000, 1_000_000])
+    parser.add_argument('--symbols', type=int, nargs='+', default=[1, 50, 500])
+    parser.add_argument('--window', type=int, default=500, help="Candles fetched per symbol in the scan benchmark")
+    parser.add_argument('--candles', type=int, default=20, help="New candles scanned after the cold scan")
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--data', help="Recorded OHLCV .csv or .npy file, benchmarked alongside synthetic candles")
+    parser.add_argument('--store', help="Read recorded candles for --symbol from this candle store")
+    parser.add_argument('--symbol', default='BTC/USDT')
+    parser.add_argument('--timeframe', default='1m')
+    parser.add_argument('--compare', help="Earlier benchmark JSON to compute median ratios against")
+    parser.add_argument('--out', help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text)
+        for result in report['results']:
+            ratio = f"  x{result['ratio']:.2f}" if result.get('ratio') else ""
+            print(f"{result['name']:<22} {result['data']:<9} bars={result['bars']:<8} symbols={result['symbols']:<4} median {result['median_ms']:.3f}ms{ratio}")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+    main()
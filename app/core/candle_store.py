@@ -0,0 +1,287 @@
+# candle_store.py
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+import numpy as np
+from indicators import OHLCV_COLUMNS
+from snapshot import normalize_symbol
+from rate_limiter import backoff_delay
+from time_utils import candle_duration_ms, candle_open_time
+
+COLUMN_DTYPES = {
+    "timestamp": np.int64,
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+    "volume": np.float64,
+}
+PAGE_LIMIT = 1500  # Binance futures maximum candles per fetch_ohlcv call
+
+def stack_columns(columns):
+    ohlcv = np.empty((len(columns['timestamp']), len(OHLCV_COLUMNS)), dtype=np.float64)
+    for i, column in enumerate(OHLCV_COLUMNS):
+        ohlcv[:, i] = columns[column]
+    return ohlcv
+
+class CandleStore:
+    """
+    Closed candles on disk, one directory per symbol/timeframe holding one
+    append-only binary file per column. Reads are memory-mapped, so a time
+    range is sliced without loading the rest of the file. Columns are trimmed
+    to a common length on open in case a write was interrupted. The last
+    stored timestamp is kept in memory after the first append, so appending
+    candles that are already stored touches no files; writes are serialized,
+    so append can run on a worker thread.
+    """
+
+    def __init__(self, root='data/ohlcv'):
+        self.root = root
+        self.last_stored = {}  # (normalized symbol, timeframe) -> last timestamp on disk
+        self._lock = threading.Lock()
+
+    def is_stored(self, symbol, timeframe, timestamp):
+        # Only what this store wrote or saw since it was created counts; unknown series return False
+        last = self.last_stored.get((normalize_symbol(symbol), timeframe))
+        return last is not None and timestamp <= last
+
+    def _dir(self, symbol, timeframe):
+        return os.path.join(self.root, normalize_symbol(symbol), timeframe)
+
+    def _column_path(self, directory, column):
+        return os.path.join(directory, f"{column}.bin")
+
+    def _recover(self, directory):
+        # Finish or roll back a rewrite that was interrupted between the two renames
+        if not os.path.isdir(directory) and os.path.isdir(directory + '.old'):
+            os.replace(directory + '.old', directory)
+        shutil.rmtree(directory + '.new', ignore_errors=True)
+        shutil.rmtree(directory + '.old', ignore_errors=True)
+
+    def length(self, symbol, timeframe):
+        directory = self._dir(symbol, timeframe)
+        self._recover(directory)
+        sizes = []
+        for column, dtype in COLUMN_DTYPES.items():
+            path = self._column_path(directory, column)
+            sizes.append(os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0)
+        return min(sizes)
+
+    def _trim(self, directory, length):
+        for column, dtype in COLUMN_DTYPES.items():
+            path = self._column_path(directory, column)
+            if os.path.exists(path) and os.path.getsize(path) != length * np.dtype(dtype).itemsize:
+                with open(path, 'r+b') as f:
+                    f.truncate(length * np.dtype(dtype).itemsize)
+
+    def read(self, symbol, timeframe, start=None, end=None):
+        """
+        Columns for candles with start <= timestamp < end (ms), as read-only
+        memmap views. Returns a dict of column name -> array.
+        """
+        length = self.length(symbol, timeframe)
+        if length == 0:
+            return {column: np.empty(0, dtype=dtype) for column, dtype in COLUMN_DTYPES.items()}
+        directory = self._dir(symbol, timeframe)
+        columns = {
+            column: np.memmap(self._column_path(directory, column), dtype=dtype, mode='r', shape=(length,))
+            for column, dtype in COLUMN_DTYPES.items()
+        }
+        timestamps = columns['timestamp']
+        lo = int(np.searchsorted(timestamps, start, side='left')) if start is not None else 0
+        hi = int(np.searchsorted(timestamps, end, side='left')) if end is not None else length
+        return {column: values[lo:hi] for column, values in columns.items()}
+
+    def read_ohlcv(self, symbol, timeframe, start=None, end=None):
+        # n x 6 float64 array in the layout backtest.py and CandleCache use
+        return stack_columns(self.read(symbol, timeframe, start, end))
+
+    def tail(self, symbol, timeframe, count):
+        columns = self.read(symbol, timeframe)
+        return stack_columns({column: values[-count:] for column, values in columns.items()})
+
+    def last_timestamp(self, symbol, timeframe):
+        timestamps = self.read(symbol, timeframe)['timestamp']
+        return int(timestamps[-1]) if len(timestamps) else None
+
+    def append(self, symbol, timeframe, ohlcv):
+        """
+        Append closed candles. Rows at or before the last stored timestamp are
+        skipped, so overlapping fetches can be appended as they are. Returns
+        the number of rows written.
+        """
+        rows = np.asarray(ohlcv, dtype=np.float64)
+        if not len(rows) or self.is_stored(symbol, timeframe, rows[:, 0].max()):
+            return 0
+        with self._lock:
+            directory = self._dir(symbol, timeframe)
+            length = self.length(symbol, timeframe)
+            os.makedirs(directory, exist_ok=True)
+            self._trim(directory, length)
+            last = self.last_timestamp(symbol, timeframe)
+            if last is not None:
+                rows = rows[rows[:, 0] > last]
+            if len(rows) > 1 and np.any(np.diff(rows[:, 0]) <= 0):
+                rows = rows[np.unique(rows[:, 0], return_index=True)[1]]
+            if len(rows):
+                for i, column in enumerate(OHLCV_COLUMNS):
+                    with open(self._column_path(directory, column), 'ab') as f:
+                        f.write(rows[:, i].astype(COLUMN_DTYPES[column]).tobytes())
+                last = int(rows[-1, 0])
+            if last is not None:
+                self.last_stored[(normalize_symbol(symbol), timeframe)] = last
+        return len(rows)
+
+    def rewrite(self, symbol, timeframe, ohlcv):
+        # Replaces the whole series; used by repair to insert candles inside existing history
+        rows = np.asarray(ohlcv, dtype=np.float64)
+        rows = rows[np.unique(rows[:, 0], return_index=True)[1]]
+        with self._lock:
+            directory = self._dir(symbol, timeframe)
+            self._recover(directory)
+            os.makedirs(directory + '.new')
+            for i, column in enumerate(OHLCV_COLUMNS):
+                with open(self._column_path(directory + '.new', column), 'wb') as f:
+                    f.write(rows[:, i].astype(COLUMN_DTYPES[column]).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            if os.path.isdir(directory):
+                os.replace(directory, directory + '.old')
+            os.replace(directory + '.new', directory)
+            shutil.rmtree(directory + '.old', ignore_errors=True)
+            self.last_stored.pop((normalize_symbol(symbol), timeframe), None)
+            if len(rows):
+                self.last_stored[(normalize_symbol(symbol), timeframe)] = int(rows[-1, 0])
+
+    def find_gaps(self, symbol, timeframe):
+        # Missing ranges as (first missing timestamp, next stored timestamp)
+        timestamps = self.read(symbol, timeframe)['timestamp']
+        if len(timestamps) < 2:
+            return []
+        next_opens = next_open_times(timeframe, timestamps[:-1])
+        return [(int(next_opens[i]), int(timestamps[i + 1])) for i in np.flatnonzero(timestamps[1:] > next_opens)]
+
+    async def backfill(self, exchange, symbol, timeframe, since, until=None):
+        """
+        Page fetch_ohlcv forward from since (or from the last stored candle)
+        up to until, appending each page as it arrives so an interrupted
+        backfill resumes where it stopped. History older than the first stored
+        candle is fetched first and merged in with one rewrite.
+        """
+        written = 0
+        timestamps = self.read(symbol, timeframe)['timestamp']
+        if len(timestamps) and since < timestamps[0]:
+            older = [page async for page in fetch_pages(exchange, symbol, timeframe, since, int(timestamps[0]))]
+            if older:
+                before = len(timestamps)
+                self.rewrite(symbol, timeframe, np.concatenate(older + [self.read_ohlcv(symbol, timeframe)]))
+                written += self.length(symbol, timeframe) - before
+        last = self.last_timestamp(symbol, timeframe)
+        if last is not None:
+            since = max(since, last + candle_duration_ms(timeframe, last))
+        async for page in fetch_pages(exchange, symbol, timeframe, since, until):
+            written += self.append(symbol, timeframe, page)
+        return written
+
+    async def repair(self, exchange, symbol, timeframe):
+        gaps = self.find_gaps(symbol, timeframe)
+        if not gaps:
+            return 0
+        fetched = []
+        for start, end in gaps:
+            async for page in fetch_pages(exchange, symbol, timeframe, start, end):
+                fetched.append(page)
+        if not fetched:
+            return 0
+        rows = np.concatenate([self.read_ohlcv(symbol, timeframe)] + fetched)
+        before = self.length(symbol, timeframe)
+        self.rewrite(symbol, timeframe, rows)
+        return self.length(symbol, timeframe) - before
+
+def next_open_times(timeframe, timestamps):
+    # Open time of the candle after each one in timestamps; 1M candles follow calendar months, the rest have a fixed length
+    if timeframe == '1M':
+        return np.array([int(t) + candle_duration_ms(timeframe, int(t)) for t in timestamps], dtype=np.int64)
+    return np.asarray(timestamps, dtype=np.int64) + candle_duration_ms(timeframe, 0)
+
+def count_candles(timeframe, start, end):
+    # Candles opening in [start, end)
+    if timeframe != '1M':
+        return (end - start) // candle_duration_ms(timeframe, start)
+    count = 0
+    while start < end:
+        start += candle_duration_ms(timeframe, start)
+        count += 1
+    return count
+
+async def fetch_pages(exchange, symbol, timeframe, since, until=None, limit=PAGE_LIMIT, max_retries=5, retry_delay=1):
+    # Yields closed candles with since <= timestamp < until as n x 6 arrays, one page per request
+    closed_before = candle_open_time(timeframe, int(time.time() * 1000))
+    until = min(until, closed_before) if until is not None else closed_before
+    while since < until:
+        for attempt in range(max_retries):
+            try:
+                ohlcv = await exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit)
+                break
+            except Exception as e:
+                logging.error(f"Attempt {attempt + 1} failed fetching {symbol} {timeframe} since {since}: {e}")
+                if attempt == max_retries - 1:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt, retry_delay))
+        rows = np.asarray(ohlcv, dtype=np.float64).reshape(-1, len(OHLCV_COLUMNS))
+        rows = rows[(rows[:, 0] >= since) & (rows[:, 0] < until)]
+        if not len(rows):
+            return
+        yield rows
+        since = int(rows[-1, 0]) + candle_duration_ms(timeframe, int(rows[-1, 0]))
+
+def parse_since(text):
+    if text.isdigit():
+        return int(text)
+    return int(datetime.strptime(text, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+async def run_command(args):
+    import ccxt.async_support as ccxt
+    exchange = ccxt.binance({'enableRateLimit': True, 'options': {'defaultType': 'future'}})
+    store = CandleStore(args.store)
+    try:
+        for symbol in args.symbols:
+            if args.command == 'backfill':
+                started = time.perf_counter()
+                written = await store.backfill(exchange, symbol, args.timeframe, parse_since(args.since), parse_since(args.until) if args.until else None)
+                print(f"{symbol} {args.timeframe}: {written} candles added in {time.perf_counter() - started:.1f}s, {store.length(symbol, args.timeframe)} stored")
+            elif args.command == 'repair':
+                filled = await store.repair(exchange, symbol, args.timeframe)
+                print(f"{symbol} {args.timeframe}: filled {filled} candles, {len(store.find_gaps(symbol, args.timeframe))} gaps left")
+            else:
+                gaps = store.find_gaps(symbol, args.timeframe)
+                print(f"{symbol} {args.timeframe}: {store.length(symbol, args.timeframe)} candles, {len(gaps)} gaps")
+                for start, end in gaps:
+                    print(f"  {datetime.fromtimestamp(start / 1000, timezone.utc)} -> {datetime.fromtimestamp(end / 1000, timezone.utc)} ({count_candles(args.timeframe, start, end)} missing)")
+    finally:
+        await exchange.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OHLCV store: backfill history, list and repair gaps")
+    parser.add_argument('command', choices=['backfill', 'gaps', 'repair'])
+    parser.add_argument('symbols', nargs='*', help="Defaults to selected_coins from --config")
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--store', default='data/ohlcv')
+    parser.add_argument('--timeframe', default='1m')
+    parser.add_argument('--since', default='2024-01-01', help="YYYY-MM-DD or ms timestamp")
+    parser.add_argument('--until', help="YYYY-MM-DD or ms timestamp, defaults to the last closed candle")
+    args = parser.parse_args()
+    if not args.symbols:
+        with open(args.config, 'r') as f:
+            args.symbols = json.load(f).get('selected_coins', [])
+    asyncio.run(run_command(args))
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
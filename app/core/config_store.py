@@ -0,0 +1,88 @@
+# config_store.py
+import json
+import logging
+import os
+import tempfile
+import threading
+
+class ConfigStore:
+    """
+    Parsed copy of config.json kept in memory. The file is only re-read when its
+    mtime/size change, writes go to a temp file that is renamed over the original,
+    and listeners are called with the new config after every reload or save.
+    load() hands out the cached dict itself; the file text it was parsed from
+    is kept so a failed save() can put back what is on disk.
+    """
+
+    def __init__(self, path='config.json'):
+        self.path = path
+        self._config = None
+        self._text = None  # JSON text self._config was parsed from, as on disk
+        self._signature = None
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _refresh(self):
+        signature = self._file_signature()
+        if self._config is not None and signature == self._signature:
+            return False
+        with self._lock:
+            with open(self.path, 'r') as f:
+                self._text = f.read()
+            self._config = json.loads(self._text)
+            self._signature = signature
+        logging.info(f"Loaded config from {self.path}")
+        return True
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def _notify(self):
+        for listener in self._listeners:
+            try:
+                listener(self._config)
+            except Exception as e:
+                logging.error(f"Error applying config change: {e}")
+
+    def load(self):
+        # The cached dict itself, not a copy: a caller that changes it must pass it to save() straight after,
+        # which restores it from the file text if the write fails
+        if self._refresh():
+            self._notify()
+        return self._config
+
+    def get(self, key, default=None):
+        if self._refresh():
+            self._notify()
+        return self._config.get(key, default)
+
+    def save(self, config):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with self._lock:
+            tmp_path = None
+            try:
+                text = json.dumps(config, indent=4)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.config-', suffix='.tmp')
+                with os.fdopen(fd, 'w') as f:
+                    f.write(text)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except Exception:
+                if tmp_path is not None and os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                # config may be the cached dict, changed in place by the caller: go back to what the file holds
+                if self._text is not None:
+                    self._config = json.loads(self._text)
+                raise
+            self._text = text
+            self._config = json.loads(text)
+            self._signature = self._file_signature()
+        self._notify()
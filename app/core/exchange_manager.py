@@ -0,0 +1,109 @@
+# exchange_manager.py
+import asyncio
+import logging
+import ssl
+import aiohttp
+import certifi
+import ccxt.async_support as ccxt
+from rate_limiter import WeightLimiter, install
+
+class ExchangeManager:
+    """
+    One ccxt Binance futures client per account, all sending through a single
+    keep-alive aiohttp connection pool owned here. Request weight is limited
+    by one WeightLimiter for the whole process (Binance counts it per IP) and
+    orders by a per-account limiter, so every account has its own order
+    budget. With weight_limit 0 the clients use ccxt's own throttle instead.
+    Clients can be created before start() (e.g. at import time); they are
+    attached to the pool when it opens and must not be used before then.
+    """
+
+    def __init__(self, pool_size=100, per_host=0, keepalive=60, dns_ttl=300, weight_limit=2400, order_limit=300):
+        self.pool_size = pool_size
+        self.per_host = per_host  # 0 = only pool_size limits connections to one host
+        self.keepalive = keepalive
+        self.dns_ttl = dns_ttl
+        self.weights = WeightLimiter(weight_limit) if weight_limit else None
+        self.order_limit = order_limit  # orders per 10 seconds per account
+        self.order_limiters = {}  # name -> WeightLimiter
+        self.accounts = {}  # name -> ccxt exchange
+        self.session = None
+
+    def add_account(self, name, api_key='', api_secret='', rate_limit=None, options=None, sandbox=False):
+        if name in self.accounts:
+            raise ValueError(f"Account {name} already exists")
+        config = {
+            'apiKey': api_key,
+            'secret': api_secret,
+            'enableRateLimit': True,
+            'options': {'defaultType': 'future', **(options or {})},
+        }
+        if rate_limit:
+            config['rateLimit'] = rate_limit  # ms between requests, for ccxt's throttle when weight_limit is 0
+        exchange = ccxt.binance(config)
+        exchange.set_sandbox_mode(sandbox)
+        # The pool belongs to the manager; ccxt must neither create its own session nor close this one
+        exchange.own_session = False
+        exchange.session = self.session
+        if self.weights is not None:
+            self.order_limiters[name] = WeightLimiter(self.order_limit, 10, header='x-mbx-order-count-10s')
+            install(exchange, self.weights, self.order_limiters[name])
+        self.accounts[name] = exchange
+        return exchange
+
+    def add_accounts(self, accounts):
+        # accounts maps name -> {"api_key", "api_secret", optional "rate_limit", "sandbox"}, as under "accounts" in config.json
+        for name, account in accounts.items():
+            self.add_account(name, account.get('api_key', ''), account.get('api_secret', ''), account.get('rate_limit'), account.get('options'), account.get('sandbox', False))
+
+    def get(self, name='default'):
+        return self.accounts[name]
+
+    async def start(self):
+        if self.session is not None:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            limit_per_host=self.per_host,
+            keepalive_timeout=self.keepalive,
+            ttl_dns_cache=self.dns_ttl,
+            enable_cleanup_closed=True,
+            ssl=ssl.create_default_context(cafile=certifi.where()),
+        )
+        self.session = aiohttp.ClientSession(connector=connector)
+        for exchange in self.accounts.values():
+            exchange.session = self.session
+        logging.info(f"Exchange connection pool open ({self.pool_size} connections, {self.keepalive}s keep-alive) for accounts: {', '.join(self.accounts)}")
+
+    async def warm(self):
+        # A cheap request per account keeps a pooled TLS connection open for the next order
+        names = list(self.accounts)
+        results = await asyncio.gather(*(self.accounts[name].fetch_time() for name in names), return_exceptions=True)
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logging.warning(f"Keep-alive request for account {name} failed: {result}")
+
+    async def run(self, interval=None):
+        # Re-warm before the pool's keep-alive timeout would drop idle connections
+        interval = interval or max(1, self.keepalive / 2)
+        while True:
+            await asyncio.sleep(interval)
+            await self.warm()
+
+    async def close(self):
+        names = list(self.accounts)
+        results = await asyncio.gather(*(self.accounts[name].close() for name in names), return_exceptions=True)
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logging.error(f"Error closing exchange for account {name}: {result}")
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        logging.info("Exchange connection pool closed")
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
@@ -0,0 +1,88 @@
+# fake_telegram.py
+import argparse
+import asyncio
+import itertools
+import logging
+import time
+from aiohttp import web
+
+class FakeBotAPI:
+    """
+    Local stand-in for the Telegram Bot API, enough for getMe and sendMessage.
+    Messages are recorded in self.messages; flood_limit makes it answer 429
+    with retry_after once more than that many messages arrive within a second,
+    like Telegram's per-chat flood control. Point a Bot at it with
+    Bot(token, base_url=f"http://{host}:{port}/bot").
+    """
+
+    def __init__(self, flood_limit=None, retry_after=1, latency=0.0):
+        self.flood_limit = flood_limit
+        self.retry_after = retry_after
+        self.latency = latency
+        self.messages = []  # (monotonic time, chat_id, text)
+        self.rejected = 0
+        self._ids = itertools.count(1)
+
+    async def _params(self, request):
+        params = dict(request.query)
+        if request.can_read_body:
+            if request.content_type == 'application/json':
+                params.update(await request.json())
+            else:
+                params.update(await request.post())
+        return params
+
+    async def handle(self, request):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        method = request.match_info['method']
+        params = await self._params(request)
+        if method == 'getMe':
+            return web.json_response({'ok': True, 'result': {'id': 1, 'is_bot': True, 'first_name': 'fake', 'username': 'fake_bot'}})
+        if method == 'sendMessage':
+            now = time.monotonic()
+            recent = sum(1 for sent, _, _ in self.messages if now - sent < 1)
+            if self.flood_limit is not None and recent >= self.flood_limit:
+                self.rejected += 1
+                return web.json_response({
+                    'ok': False, 'error_code': 429,
+                    'description': f"Too Many Requests: retry after {self.retry_after}",
+                    'parameters': {'retry_after': self.retry_after},
+                }, status=429)
+            self.messages.append((now, params.get('chat_id'), params.get('text', '')))
+            return web.json_response({'ok': True, 'result': {
+                'message_id': next(self._ids), 'date': int(time.time()),
+                'chat': {'id': int(params.get('chat_id', 0)), 'type': 'private'}, 'text': params.get('text', ''),
+            }})
+        return web.json_response({'ok': False, 'error_code': 404, 'description': 'Not Found: method not found'}, status=404)
+
+    async def serve(self, host='127.0.0.1', port=8081):
+        app = web.Application()
+        app.router.add_route('*', '/bot{token}/{method}', self.handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        logging.info(f"Fake Bot API listening on http://{host}:{port}/bot")
+        return runner
+
+async def run_forever(host, port, flood_limit):
+    api = FakeBotAPI(flood_limit=flood_limit)
+    runner = await api.serve(host, port)
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await runner.cleanup()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake Telegram Bot API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--flood-limit', type=int, help="Answer 429 above this many messages per second")
+    args = parser.parse_args()
+    asyncio.run(run_forever(args.host, args.port, args.flood_limit))
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,13 +1,20 @@
 # indicators.py
+import asyncio
+import logging
+import numpy as np
 import pandas as pd
+from rate_limiter import backoff_delay
+from time_utils import candle_duration_ms
+
+EMA_BLOCK_SIZE = 64
 
 def calculate_sma(prices, period):
     return prices.rolling(window=period, min_periods=1).mean()
 
-def calculate_ema(prices, period):
+def calculate_ema_iterative(prices, period):
     """
-    Calculate a pure EMA without SMA smoothing.
-    Initialize with the first price and compute EMA iteratively.
+    Reference EMA: initialize with the first price and compute EMA row by row.
+    Kept for parity checks against the vectorized engine.
     """
     ema = prices.copy()
     alpha = 2 / (period + 1)
@@ -16,28 +23,297 @@ def calculate_ema(prices, period):
         ema.iloc[i] = (prices.iloc[i] * alpha) + (ema.iloc[i - 1] * (1 - alpha))
     return ema
 
+def calculate_ema_matrix(values, periods, block_size=EMA_BLOCK_SIZE):
+    """
+    Calculate pure EMAs (seeded with the first price, alpha=2/(n+1)) for several
+    periods in one pass over a float64 array. Returns an array of shape
+    (len(values), len(periods)).
+
+    The recurrence is solved block by block: inside a block every EMA is a
+    weighted sum of the block's prices (a small lower-triangular matrix product)
+    plus the decayed EMA carried over from the previous block, so Python only
+    loops once per block instead of once per row.
+    """
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    n = len(values)
+    alphas = 2.0 / (np.asarray(periods, dtype=np.float64) + 1.0)
+    out = np.empty((n, len(alphas)), dtype=np.float64)
+    if n == 0:
+        return out
+
+    decays = 1.0 - alphas
+    steps = np.arange(block_size)
+    lags = steps[:, None] - steps[None, :]
+    # weights[p, k, j] = alpha * decay**(k - j) for j <= k, else 0
+    weights = np.where(lags >= 0, decays[:, None, None] ** np.maximum(lags, 0), 0.0) * alphas[:, None, None]
+    # carry[p, k] = decay**(k + 1): contribution of the previous block's last EMA
+    carry = decays[:, None] ** (steps + 1)
+
+    n_blocks = -(-n // block_size)
+    padded = np.zeros(n_blocks * block_size, dtype=np.float64)
+    padded[:n] = values
+    blocks = padded.reshape(n_blocks, block_size)
+    partial = np.einsum('pkj,bj->bpk', weights, blocks)
+
+    # Seeding with the first price is the same as carrying it in from a virtual previous block
+    last = np.full(len(alphas), values[0])
+    result = np.empty_like(partial)
+    for b in range(n_blocks):
+        result[b] = partial[b] + carry * last[:, None]
+        last = result[b, :, -1]
+    out[:] = result.transpose(0, 2, 1).reshape(n_blocks * block_size, len(alphas))[:n]
+    return out
+
+def calculate_ema(prices, period):
+    """
+    Calculate a pure EMA without SMA smoothing.
+    Initialize with the first price; same numbers as calculate_ema_iterative.
+    """
+    ema = calculate_ema_matrix(prices.to_numpy(dtype=np.float64), [period])
+    return pd.Series(ema[:, 0], index=prices.index, name=prices.name)
+
 def calculate_emas(df, ema_period1, ema_period2, ema_period3):
     if df.empty:
         return df
-    close = df['close']
-    df['EMA1'] = calculate_ema(close, ema_period1)
-    df['EMA2'] = calculate_ema(close, ema_period2)
-    df['EMA3'] = calculate_ema(close, ema_period3)
+    close = df['close'].to_numpy(dtype=np.float64)
+    emas = calculate_ema_matrix(close, [ema_period1, ema_period2, ema_period3])
+    df['EMA1'] = emas[:, 0]
+    df['EMA2'] = emas[:, 1]
+    df['EMA3'] = emas[:, 2]
+    return df
+
+class EmaState:
+    """
+    EMA for one (symbol, timeframe, period), kept for the closed candles only so
+    a new candle costs one recurrence step instead of a rebuild of the window.
+    The window grows to the longest frame it is given.
+    """
+
+    def __init__(self, period, window=500):
+        self.period = period
+        self.alpha = 2 / (period + 1)
+        self.window = window
+        self._timestamps = np.empty(2 * window, dtype=np.int64)
+        self._values = np.empty(2 * window, dtype=np.float64)
+        self._start = 0
+        self._end = 0
+
+    @property
+    def timestamps(self):
+        return self._timestamps[self._start:self._end]
+
+    @property
+    def values(self):
+        return self._values[self._start:self._end]
+
+    def rebuild(self, timestamps, closes):
+        n = min(len(timestamps), self.window)
+        self._start, self._end = 0, n
+        if len(closes):
+            values = calculate_ema_matrix(closes, [self.period])[:, 0]
+            self._timestamps[:n] = timestamps[-n:]
+            self._values[:n] = values[-n:]
+
+    def grow(self, window):
+        # Larger buffers for frames longer than the window, keeping the stored values
+        if window <= self.window:
+            return
+        timestamps, values = self.timestamps.copy(), self.values.copy()
+        self.window = window
+        self._timestamps = np.empty(2 * window, dtype=np.int64)
+        self._values = np.empty(2 * window, dtype=np.float64)
+        self._start, self._end = 0, len(values)
+        self._timestamps[:self._end] = timestamps
+        self._values[:self._end] = values
+
+    def load(self, timestamps, values):
+        # Restore EMA values saved from another EmaState, e.g. a warm-start snapshot
+        n = min(len(timestamps), self.window)
+        self._start, self._end = 0, n
+        self._timestamps[:n] = timestamps[-n:]
+        self._values[:n] = values[-n:]
+
+    def _append(self, timestamp, value):
+        if self._end == len(self._values):
+            keep = self.window - 1
+            self._timestamps[:keep] = self._timestamps[self._end - keep:self._end]
+            self._values[:keep] = self._values[self._end - keep:self._end]
+            self._start, self._end = 0, keep
+        self._timestamps[self._end] = timestamp
+        self._values[self._end] = value
+        self._end += 1
+        if self._end - self._start > self.window:
+            self._start += 1
+
+    def _advance(self, timestamps, closes):
+        # Returns False when the stored candles cannot be lined up with the new ones
+        if self._end == self._start or len(timestamps) == 0:
+            return False
+        stored = self.timestamps
+        if timestamps[0] < stored[0]:
+            return False
+        last_ts = stored[-1]
+        pos = np.searchsorted(timestamps, last_ts)
+        if pos >= len(timestamps) or timestamps[pos] != last_ts:
+            return False
+        first = np.searchsorted(stored, timestamps[0])
+        if stored[first] != timestamps[0] or len(stored) - first != pos + 1:
+            return False
+        value = self._values[self._end - 1]
+        for i in range(pos + 1, len(timestamps)):
+            value = closes[i] * self.alpha + value * (1 - self.alpha)
+            self._append(timestamps[i], value)
+        return True
+
+    def update(self, timestamps, closes):
+        """
+        timestamps/closes cover the window with the still-forming candle last.
+        Returns the EMA for every row; only closed candles are committed.
+        """
+        closed_ts, closed = timestamps[:-1], closes[:-1]
+        self.grow(len(closed_ts))
+        if not self._advance(closed_ts, closed):
+            self.rebuild(closed_ts, closed)
+        n_closed = len(closed_ts)
+        ema = np.empty(len(timestamps), dtype=np.float64)
+        if n_closed:
+            ema[:n_closed] = self.values[-n_closed:]
+            ema[-1] = closes[-1] * self.alpha + ema[n_closed - 1] * (1 - self.alpha)
+        else:
+            ema[-1] = closes[-1]
+        return ema
+
+def update_emas(df, symbol, timeframe, ema_period1, ema_period2, ema_period3, indicator_states):
+    """
+    Incremental calculate_emas: indicator_states maps (symbol, timeframe, period)
+    to an EmaState. A changed timeframe or period gets a fresh state (full rebuild)
+    and states that are no longer in use for the symbol are dropped.
+    """
+    if df.empty:
+        return df
+    periods = (ema_period1, ema_period2, ema_period3)
+    stale = [key for key in indicator_states if key[0] == symbol and (key[1] != timeframe or key[2] not in periods)]
+    for key in stale:
+        del indicator_states[key]
+    timestamps = df['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+    closes = df['close'].to_numpy(dtype=np.float64)
+    for column, period in zip(('EMA1', 'EMA2', 'EMA3'), periods):
+        key = (symbol, timeframe, period)
+        state = indicator_states.get(key)
+        if state is None:
+            state = indicator_states[key] = EmaState(period)
+        df[column] = state.update(timestamps, closes)
     return df
 
-async def fetch_binance_data(symbol, timeframe, exchange, limit=500, max_retries=5, retry_delay=5):
+OHLCV_COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+
+class CandleCache:
+    """
+    OHLCV rows for one (symbol, timeframe) in a preallocated float64 buffer.
+    New candles are merged in place; frames handed out are views of the buffer
+    and stay valid until the next merge (only the overlapping, still-forming
+    rows are overwritten).
+    """
+
+    def __init__(self, window=500):
+        self.window = window
+        self._rows = np.empty((2 * window, len(OHLCV_COLUMNS)), dtype=np.float64)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def rows(self):
+        return self._rows[self._start:self._end]
+
+    @property
+    def last_timestamp(self):
+        return int(self._rows[self._end - 1, 0]) if len(self) else None
+
+    def replace(self, ohlcv):
+        rows = np.asarray(ohlcv, dtype=np.float64)[-self.window:]
+        self._start, self._end = 0, len(rows)
+        self._rows[:len(rows)] = rows
+
+    def merge(self, ohlcv, timeframe_ms):
+        """
+        Merge candles fetched with since=last_timestamp. The overlapping rows
+        (at least the still-forming last bar) are replaced. Returns False when
+        the new candles do not connect to the cached ones.
+        """
+        rows = np.asarray(ohlcv, dtype=np.float64)
+        if not len(self) or not len(rows) or rows[0, 0] > self._rows[self._end - 1, 0] + timeframe_ms:
+            return False
+        keep_end = self._start + int(np.searchsorted(self.rows[:, 0], rows[0, 0]))
+        if keep_end + len(rows) > len(self._rows):
+            # Out of room: continue in a fresh buffer so older frames keep their data
+            keep = max(0, min(keep_end - self._start, self.window - len(rows)))
+            fresh = np.empty_like(self._rows)
+            fresh[:keep] = self._rows[keep_end - keep:keep_end]
+            self._rows, self._start, keep_end = fresh, 0, keep
+        self._rows[keep_end:keep_end + len(rows)] = rows
+        self._end = keep_end + len(rows)
+        self._start = max(self._start, self._end - self.window)
+        return True
+
+    def to_frame(self):
+        rows = self.rows
+        df = pd.DataFrame(rows[:, 1:], columns=OHLCV_COLUMNS[1:], copy=False)
+        df.insert(0, "timestamp", pd.to_datetime(rows[:, 0].astype(np.int64), unit="ms"))
+        return df
+
+async def store_closed_candles(candle_store, symbol, timeframe, cache):
+    # Everything but the last, still-forming candle goes to disk, written on a worker thread; a no-op until another candle closes
+    rows = cache.rows[:-1]
+    if not len(rows) or candle_store.is_stored(symbol, timeframe, rows[-1, 0]):
+        return
+    try:
+        await asyncio.to_thread(candle_store.append, symbol, timeframe, rows.copy())
+    except Exception as e:
+        logging.error(f"Error storing candles for {symbol} {timeframe}: {e}")
+
+async def fetch_binance_data(symbol, timeframe, exchange, limit=500, max_retries=5, retry_delay=1, candle_cache=None, candle_store=None):
+    """
+    With a candle_cache dict ((symbol, timeframe) -> CandleCache), only the
+    candles since the last cached one are fetched and merged; a full window is
+    fetched on the first call, on gaps, or when the delta fills a whole page.
+    With a candle_store, an empty cache is first seeded from disk and closed
+    candles are appended to it. Failed attempts are retried after a jittered
+    backoff starting around retry_delay seconds.
+    """
+    cache = None
+    if candle_cache is not None:
+        cache = candle_cache.setdefault((symbol, timeframe), CandleCache(limit))
+        if candle_store is not None and not len(cache):
+            stored = await asyncio.to_thread(candle_store.tail, symbol, timeframe, limit)
+            if len(stored):
+                cache.replace(stored)
     for attempt in range(max_retries):
         try:
+            if cache is not None and len(cache):
+                ohlcv = await exchange.fetch_ohlcv(symbol, timeframe, since=cache.last_timestamp, limit=limit)
+                if ohlcv and len(ohlcv) < limit and cache.merge(ohlcv, candle_duration_ms(timeframe, cache.last_timestamp)):
+                    if candle_store is not None:
+                        await store_closed_candles(candle_store, symbol, timeframe, cache)
+                    return cache.to_frame()
+                logging.info("Candle cache for %s %s out of date, fetching full window", symbol, timeframe)
             ohlcv = await exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
             if not ohlcv:
                 raise ValueError(f"No data returned for {symbol}")
-            df = pd.DataFrame(ohlcv, columns=["timestamp", "open", "high", "low", "close", "volume"])
+            if cache is not None:
+                cache.replace(ohlcv)
+                if candle_store is not None:
+                    await store_closed_candles(candle_store, symbol, timeframe, cache)
+                return cache.to_frame()
+            df = pd.DataFrame(ohlcv, columns=OHLCV_COLUMNS)
             df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
             return df
         except Exception as e:
             logging.error(f"Attempt {attempt + 1} failed for {symbol}: {str(e)}")
             if attempt < max_retries - 1:
-                await asyncio.sleep(retry_delay)
+                await asyncio.sleep(backoff_delay(attempt, retry_delay))
             else:
                 logging.error(f"All {max_retries} attempts failed for {symbol}. Skipping...")
-                return pd.DataFrame()
\ No newline at end of file
+                return pd.DataFrame()
@@ -0,0 +1,113 @@
+# latency.py
+import asyncio
+import bisect
+import contextlib
+import logging
+import time
+import numpy as np
+
+# Histogram bucket upper bounds in seconds, Prometheus style
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class StageStats:
+    """Bucket counts plus the last max_samples durations (for percentiles) of one stage."""
+
+    def __init__(self, max_samples=2048):
+        self.samples = np.zeros(max_samples, dtype=np.float64)
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.samples[self.count % len(self.samples)] = seconds
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def percentiles(self, quantiles=(50, 95, 99)):
+        recent = self.samples[:min(self.count, len(self.samples))]
+        return np.percentile(recent, quantiles) if len(recent) else np.zeros(len(quantiles))
+
+class LatencyRecorder:
+    """
+    Timing spans for the candle-to-order pipeline, keyed by stage name. With
+    enabled False, span() hands back one shared no-op context manager and
+    record() returns immediately.
+    """
+
+    def __init__(self, enabled=True, max_samples=2048):
+        self.enabled = enabled
+        self.max_samples = max_samples
+        self.stages = {}
+
+    def record(self, stage, seconds):
+        if not self.enabled:
+            return
+        stats = self.stages.get(stage)
+        if stats is None:
+            stats = self.stages[stage] = StageStats(self.max_samples)
+        stats.add(seconds)
+
+    @contextlib.contextmanager
+    def _span(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def span(self, stage):
+        # Works around awaits too: `with latency.span("fetch_candles"): df = await ...`
+        return self._span(stage) if self.enabled else NULL_SPAN
+
+    def reset(self):
+        self.stages.clear()
+
+    def report(self):
+        if not self.stages:
+            return "No latency samples yet."
+        lines = ["⏱️ Latency (ms)   p50 / p95 / p99  (n)"]
+        for stage, stats in self.stages.items():
+            p50, p95, p99 = stats.percentiles() * 1000
+            lines.append(f"{stage}: {p50:.1f} / {p95:.1f} / {p99:.1f}  ({stats.count})")
+        return "\n".join(lines)
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP bot_stage_seconds Time spent in each stage of the candle-to-order pipeline",
+            "# TYPE bot_stage_seconds histogram",
+        ]
+        for stage, stats in self.stages.items():
+            cumulative = np.cumsum(stats.buckets)
+            for bound, count in zip(BUCKETS, cumulative):
+                lines.append(f'bot_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'bot_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {stats.count}')
+            lines.append(f'bot_stage_seconds_sum{{stage="{stage}"}} {stats.total:.6f}')
+            lines.append(f'bot_stage_seconds_count{{stage="{stage}"}} {stats.count}')
+        lines.append("# HELP bot_stage_quantile_seconds Recent p50/p95/p99 per stage")
+        lines.append("# TYPE bot_stage_quantile_seconds gauge")
+        for stage, stats in self.stages.items():
+            for quantile, value in zip(("0.5", "0.95", "0.99"), stats.percentiles()):
+                lines.append(f'bot_stage_quantile_seconds{{stage="{stage}",quantile="{quantile}"}} {value:.6f}')
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, host='127.0.0.1', port=9108):
+        # Plain-text /metrics endpoint for Prometheus or curl; runs until cancelled
+        from aiohttp import web
+
+        async def metrics(request):
+            return web.Response(text=self.prometheus_text(), content_type='text/plain', charset='utf-8')
+
+        app = web.Application()
+        app.router.add_get('/metrics', metrics)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        logging.info(f"Latency metrics on http://{host}:{port}/metrics")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+NULL_SPAN = contextlib.nullcontext()
+NULL_RECORDER = LatencyRecorder(enabled=False)
@@ -0,0 +1,118 @@
+# logger.py
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import math
+import os
+import queue
+import shutil
+import time
+
+DEFAULT_LOG_FILE = 'logs/trading-bot-logs.txt'
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+# Attributes every LogRecord has; anything else on a record came from extra= and goes into the JSON as a field
+RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = [None]
+
+def gzip_namer(name):
+    return name + '.gz'
+
+def gzip_rotator(source, dest):
+    with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, plus any extra= fields."""
+
+    def format(self, record):
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in RECORD_FIELDS)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class LogFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Rotates when the file would pass max_bytes or every interval seconds,
+    whichever comes first, keeping backups old files (gzipped if compress).
+    0 turns either trigger off.
+    """
+
+    def __init__(self, filename, max_bytes=0, backups=10, interval=0, compress=True):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backups, encoding='utf-8', delay=True)
+        self.interval = interval
+        self.rollover_at = time.time() + interval if interval else math.inf
+        if compress:
+            self.namer = gzip_namer
+            self.rotator = gzip_rotator
+
+    def shouldRollover(self, record):
+        return time.time() >= self.rollover_at or super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        if self.interval:
+            self.rollover_at = time.time() + self.interval
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    # The stock prepare() formats the message on the caller's thread; here msg % args is left to the listener.
+    # Arguments are therefore rendered a moment later, so log values rather than objects that are still being mutated.
+    def prepare(self, record):
+        return record
+
+def setup_logging(path=DEFAULT_LOG_FILE, level='INFO', max_mb=10, backups=10, rotate_hours=24, compress=True, json_format=True, console=True):
+    """
+    Route all logging through a queue: callers only enqueue the record, and a
+    listener thread formats it and writes the rotating log file (and console).
+    Use %-style arguments (logging.info("... %s", value)) on hot paths, so
+    nothing is formatted when the level is disabled. Safe to call again to
+    apply new settings.
+    """
+    stop_logging()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    file_handler = LogFileHandler(path, int(max_mb * 1024 * 1024), backups, int(rotate_hours * 3600), compress)
+    file_handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+    handlers = [file_handler]
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        handlers.append(console_handler)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(LazyQueueHandler(log_queue))
+    root.setLevel(level)
+    # httpx logs every Telegram long-poll request at INFO
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _listener[0] = listener
+    return listener
+
+def stop_logging():
+    # Drain the queue and close the files; registered at exit so the last records are not lost
+    listener = _listener[0]
+    if listener is None:
+        return
+    _listener[0] = None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+atexit.register(stop_logging)
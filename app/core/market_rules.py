@@ -0,0 +1,80 @@
+# market_rules.py
+import math
+from snapshot import normalize_symbol
+
+def step_decimals(step):
+    # Decimal places of a step such as '0.00100000' -> 3
+    text = f"{float(step):.10f}".rstrip('0')
+    return len(text.split('.')[1]) if '.' in text else 0
+
+def binance_filters(market):
+    return {f.get('filterType'): f for f in (market.get('info') or {}).get('filters', [])}
+
+class MarketRules:
+    """
+    Order filters of one futures market (lot size, tick size, min notional,
+    PERCENT_PRICE band), read once from load_markets, so quantities and prices
+    can be made exchange-valid locally. templates holds the raw order request
+    for each side, ready for a quantity, so an order skips ccxt's per-call
+    market lookup and conversions.
+    """
+
+    def __init__(self, market):
+        filters = binance_filters(market)
+        limits = market.get('limits') or {}
+        precision = market.get('precision') or {}
+        lot = filters.get('MARKET_LOT_SIZE') or filters.get('LOT_SIZE') or {}
+        self.market = market
+        self.symbol = market['symbol']
+        self.market_id = market['id']
+        self.step = float(lot.get('stepSize') or precision.get('amount') or 0.001)
+        self.min_qty = float(lot.get('minQty') or (limits.get('amount') or {}).get('min') or self.step)
+        self.max_qty = float(lot.get('maxQty') or (limits.get('amount') or {}).get('max') or math.inf)
+        self.tick = float(filters.get('PRICE_FILTER', {}).get('tickSize') or precision.get('price') or 0.01)
+        self.min_notional = float(filters.get('MIN_NOTIONAL', {}).get('notional') or (limits.get('cost') or {}).get('min') or 0)
+        percent = filters.get('PERCENT_PRICE', {})
+        self.price_up = float(percent.get('multiplierUp') or math.inf)
+        self.price_down = float(percent.get('multiplierDown') or 0)
+        self.amount_decimals = step_decimals(self.step)
+        self.price_decimals = step_decimals(self.tick)
+        self.templates = {
+            side: {'symbol': self.market_id, 'side': side, 'type': 'MARKET', 'newOrderRespType': 'RESULT'}
+            for side in ('BUY', 'SELL')
+        }
+
+    def floor_amount(self, amount):
+        return round(math.floor(amount / self.step + 1e-9) * self.step, self.amount_decimals)
+
+    def ceil_amount(self, amount):
+        return round(math.ceil(amount / self.step - 1e-9) * self.step, self.amount_decimals)
+
+    def format_amount(self, amount):
+        return f"{self.floor_amount(amount):.{self.amount_decimals}f}"
+
+    def format_price(self, price, side='BUY'):
+        # Buys round down and sells round up, so the rounded price never crosses further than asked
+        steps = price / self.tick
+        steps = math.floor(steps + 1e-9) if side == 'BUY' else math.ceil(steps - 1e-9)
+        return f"{steps * self.tick:.{self.price_decimals}f}"
+
+    def size(self, notional, price, buffer=0.01):
+        """
+        Quantity for about notional USDT at price, floored to the lot step and
+        raised to the minimum quantity and minimum notional (plus buffer, as
+        the fill price may be below price). Capped to the maximum quantity.
+        """
+        amount = self.floor_amount(notional / price)
+        minimum = max(self.min_qty, self.ceil_amount(self.min_notional * (1 + buffer) / price))
+        return min(max(amount, minimum), self.floor_amount(self.max_qty))
+
+    def band_price(self, price, reference):
+        # Clamp a limit price into the PERCENT_PRICE band around reference (the mark or last price)
+        return min(max(price, reference * self.price_down), reference * self.price_up)
+
+def index_markets(markets):
+    # normalized symbol -> MarketRules for the USDT-margined perpetuals the bot trades
+    return {
+        normalize_symbol(market['symbol']): MarketRules(market)
+        for market in markets.values()
+        if market.get('swap') and market.get('linear') and market.get('active', True) is not False
+    }
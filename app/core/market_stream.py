@@ -0,0 +1,259 @@
+# market_stream.py
+import asyncio
+import json
+import logging
+import time
+from time_utils import candle_duration_ms
+
+BINANCE_FUTURES_STREAM_URL = "wss://fstream.binance.com/stream?streams="
+
+def stream_symbol(symbol):
+    # 'BTC/USDT' or 'BTC/USDT:USDT' -> 'btcusdt'
+    return symbol.split(':')[0].replace('/', '').lower()
+
+class AiohttpTransport:
+    """Websocket transport on aiohttp, which ccxt.async_support already depends on."""
+
+    def __init__(self, heartbeat=30):
+        self.heartbeat = heartbeat
+        self._session = None
+        self._ws = None
+
+    async def connect(self, url):
+        import aiohttp
+        self._session = aiohttp.ClientSession()
+        self._ws = await self._session.ws_connect(url, heartbeat=self.heartbeat)
+
+    async def recv(self):
+        import aiohttp
+        msg = await self._ws.receive()
+        if msg.type == aiohttp.WSMsgType.TEXT:
+            return msg.data
+        raise ConnectionError(f"Websocket closed: {msg.type}")
+
+    async def close(self):
+        if self._ws is not None:
+            await self._ws.close()
+        if self._session is not None:
+            await self._session.close()
+        self._ws = self._session = None
+
+class ReplayTransport:
+    """Replays recorded frames (one raw message per line) instead of a live socket."""
+
+    def __init__(self, frames, delay=0.0):
+        if isinstance(frames, str):
+            with open(frames, 'r') as f:
+                frames = [line.rstrip('\n') for line in f if line.strip()]
+        self.frames = list(frames)
+        self.delay = delay
+        self.url = None
+        self._position = 0
+
+    async def connect(self, url):
+        self.url = url
+
+    async def recv(self):
+        if self._position >= len(self.frames):
+            raise EOFError("Replay finished")
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        frame = self.frames[self._position]
+        self._position += 1
+        return frame
+
+    async def close(self):
+        pass
+
+async def serve_replay(frames, host='127.0.0.1', port=8765, delay=0.0):
+    """
+    Local stand-in for the Binance stream endpoint: every client that connects
+    gets the recorded frames replayed. Returns the aiohttp runner to clean up.
+    """
+    from aiohttp import web
+    frames = ReplayTransport(frames).frames
+
+    async def handler(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        for frame in frames:
+            await ws.send_str(frame)
+            if delay:
+                await asyncio.sleep(delay)
+        await ws.close()
+        return ws
+
+    app = web.Application()
+    app.router.add_get('/{tail:.*}', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info(f"Replaying {len(frames)} frames on ws://{host}:{port}")
+    return runner
+
+class MarketStream:
+    """
+    Kline and trade streams for Binance futures. Closed and forming klines are
+    merged into the shared candle cache, trades keep the last price per symbol,
+    and consumers wait on events instead of polling REST.
+    """
+
+    def __init__(self, symbols, timeframe, candle_cache=None, transport=None, url=BINANCE_FUTURES_STREAM_URL, record_path=None):
+        self.symbols = list(symbols)
+        self.timeframe = timeframe
+        self.candle_cache = candle_cache if candle_cache is not None else {}
+        self.transport = transport or AiohttpTransport()
+        self.url = url
+        self.record_path = record_path
+        self.connected = False
+        self.last_prices = {}  # symbol -> (price, event time ms)
+        self.last_kline_time = {}  # symbol -> local monotonic time of the last kline event
+        self._by_stream_symbol = {}
+        self._price_waiters = {}
+        self._close_waiter = None
+        self._kline_waiter = None
+        self._last_close_time = 0
+        self._stopped = False
+        self._resubscribing = False
+
+    def _stream_url(self):
+        self._by_stream_symbol = {stream_symbol(symbol): symbol for symbol in self.symbols}
+        streams = []
+        for name in self._by_stream_symbol:
+            streams.append(f"{name}@kline_{self.timeframe}")
+            streams.append(f"{name}@aggTrade")
+        return self.url + '/'.join(streams)
+
+    async def run(self):
+        backoff = 1
+        record = open(self.record_path, 'a') if self.record_path else None
+        try:
+            while not self._stopped:
+                try:
+                    await self.transport.connect(self._stream_url())
+                    self.connected = True
+                    backoff = 1
+                    logging.info(f"Market stream connected for {len(self.symbols)} symbols on {self.timeframe}")
+                    while not self._stopped:
+                        frame = await self.transport.recv()
+                        if record:
+                            record.write(frame + '\n')
+                        self.handle_frame(frame)
+                except EOFError:
+                    logging.info("Market stream ended")
+                    return
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    if self._resubscribing:
+                        logging.info(f"Market stream resubscribing to {self.timeframe}")
+                        self._resubscribing = False
+                        backoff = 0
+                    elif not self._stopped:
+                        logging.error(f"Market stream error: {e}. Reconnecting in {backoff}s")
+                finally:
+                    self.connected = False
+                    await self.transport.close()
+                if not self._stopped:
+                    await asyncio.sleep(backoff)
+                    backoff = min(max(backoff, 0.5) * 2, 30)
+        finally:
+            if record:
+                record.close()
+
+    async def resubscribe(self, symbols, timeframe):
+        self.symbols = list(symbols)
+        self.timeframe = timeframe
+        self._resubscribing = True
+        await self.transport.close()  # run() reconnects with the new stream list
+
+    async def stop(self):
+        self._stopped = True
+        await self.transport.close()
+
+    def handle_frame(self, frame):
+        message = json.loads(frame)
+        data = message.get('data', message)
+        event = data.get('e')
+        symbol = self._by_stream_symbol.get(data.get('s', '').lower())
+        if symbol is None:
+            return
+        if event == 'kline':
+            self._handle_kline(symbol, data)
+        elif event == 'aggTrade':
+            self._set_price(symbol, float(data['p']), data['T'])
+
+    def _handle_kline(self, symbol, data):
+        k = data['k']
+        if k['i'] != self.timeframe:
+            return
+        cache = self.candle_cache.get((symbol, self.timeframe))
+        if cache is not None and len(cache):
+            row = [k['t'], float(k['o']), float(k['h']), float(k['l']), float(k['c']), float(k['v'])]
+            if cache.merge([row], candle_duration_ms(self.timeframe, cache.last_timestamp)):
+                self.last_kline_time[symbol] = time.monotonic()
+                if self._kline_waiter is not None and not self._kline_waiter.done():
+                    self._kline_waiter.set_result(symbol)
+        self._set_price(symbol, float(k['c']), data['E'])
+        if k['x'] and k['T'] > self._last_close_time:
+            self._last_close_time = k['T']
+            if self._close_waiter is not None and not self._close_waiter.done():
+                self._close_waiter.set_result(k['t'])
+
+    def _set_price(self, symbol, price, event_time):
+        previous = self.last_prices.get(symbol)
+        if previous is not None and event_time < previous[1]:
+            return
+        self.last_prices[symbol] = (price, event_time)
+        waiter = self._price_waiters.pop(symbol, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(price)
+
+    def last_price(self, symbol):
+        price = self.last_prices.get(symbol)
+        return price[0] if self.connected and price else None
+
+    def is_live(self, symbol, max_age=None):
+        # Fresh enough to serve candles from the cache without a REST call
+        seen = self.last_kline_time.get(symbol)
+        cache = self.candle_cache.get((symbol, self.timeframe))
+        if not self.connected or seen is None or cache is None or not len(cache):
+            return False
+        return time.monotonic() - seen <= (max_age or 10)
+
+    async def wait_for_price(self, symbol, timeout):
+        waiter = self._price_waiters.get(symbol)
+        if waiter is None or waiter.done():
+            waiter = self._price_waiters[symbol] = asyncio.get_running_loop().create_future()
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def wait_for_open(self, symbols, open_ms, timeout):
+        """
+        After a close, wait until every live symbol's cache holds the candle
+        that opened at open_ms (its first kline follows the close within
+        moments). Returns the live symbols still missing it at the timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            missing = [symbol for symbol in symbols if self.is_live(symbol) and self.candle_cache[(symbol, self.timeframe)].last_timestamp < open_ms]
+            remaining = deadline - time.monotonic()
+            if not missing or remaining <= 0:
+                return missing
+            if self._kline_waiter is None or self._kline_waiter.done():
+                self._kline_waiter = asyncio.get_running_loop().create_future()
+            try:
+                await asyncio.wait_for(asyncio.shield(self._kline_waiter), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def wait_for_candle_close(self, timeout):
+        if self._close_waiter is None or self._close_waiter.done():
+            self._close_waiter = asyncio.get_running_loop().create_future()
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._close_waiter), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"No closed {self.timeframe} kline within {timeout:.0f}s, scanning anyway")
+            return None
@@ -0,0 +1,261 @@
+# mock_exchange.py
+import asyncio
+import itertools
+import time
+
+try:
+    from ccxt.base.errors import InsufficientFunds, InvalidOrder, OrderNotFound
+except ImportError:
+    class OrderNotFound(Exception):
+        pass
+
+    class InsufficientFunds(Exception):
+        pass
+
+    class InvalidOrder(Exception):
+        pass
+
+ORDER_STATUSES = {'NEW': 'open', 'PARTIALLY_FILLED': 'open', 'FILLED': 'closed', 'CANCELED': 'canceled', 'EXPIRED': 'expired', 'REJECTED': 'rejected'}
+
+class MockExchange:
+    """
+    In-memory stand-in for the ccxt Binance futures client, covering the calls
+    the bot makes. Prices move with set_price(); resting TAKE_PROFIT_MARKET and
+    STOP_MARKET orders trigger against it, so the order flow can run offline.
+    Like Binance futures, orders carry no fee; it is on the account trades
+    (fetch_my_trades), charged at fee_rate of the fill's notional. Open
+    positions hold notional / leverage of the balance as used margin, and buys
+    beyond the free margin fail with -2019. Markets
+    carry Binance filters (step, tick, min_notional, PERCENT_PRICE band),
+    enforced on raw fapiPrivatePostOrder requests; symbols in
+    reject_market_sells answer market sells with -4131 like a thin book.
+    """
+
+    def __init__(self, prices=None, balance=1000.0, latency=0.0, fee_rate=0.0005, step=0.001, tick=0.01, min_notional=5.0, percent_price=(1.05, 0.95)):
+        self.prices = dict(prices or {})
+        self.balance = balance
+        self.latency = latency
+        self.fee_rate = fee_rate
+        self.step = step
+        self.tick = tick
+        self.min_notional = min_notional
+        self.percent_price = percent_price  # (multiplierUp, multiplierDown)
+        self.order_books = {}  # symbol -> {'bids', 'asks'}, else one level at the price
+        self.reject_market_sells = set()
+        self.positions = {}  # symbol -> {'contracts': float, 'entryPrice': float}
+        self.orders = {}
+        self.trades = []  # account trades (fills), as fetch_my_trades returns them
+        self.ohlcv = {}  # (symbol, timeframe) -> list of candles
+        self.leverage = {}
+        self.margin_mode = {}
+        self.calls = []
+        self._ids = itertools.count(1)
+
+    async def _call(self, name, *args):
+        self.calls.append((name,) + args)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    @staticmethod
+    def parse_timeframe(timeframe):
+        units = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800, 'M': 2592000}
+        return int(timeframe[:-1]) * units[timeframe[-1]]
+
+    def price_to_precision(self, symbol, price):
+        return f"{price:.8f}".rstrip('0').rstrip('.')
+
+    def amount_to_precision(self, symbol, amount):
+        return f"{amount:.8f}".rstrip('0').rstrip('.')
+
+    def set_price(self, symbol, price):
+        self.prices[symbol] = price
+        for order in list(self.orders.values()):
+            if order['symbol'] != symbol or order['status'] != 'open':
+                continue
+            stop = float(order['stopPrice'])
+            if (order['type'] == 'TAKE_PROFIT_MARKET' and price >= stop) or (order['type'] == 'STOP_MARKET' and price <= stop):
+                self._fill(order, price)
+
+    def close_position(self, symbol, price=None):
+        # A close the bot did not send (manual, liquidation); resting orders are left as they are
+        position = self.positions.get(symbol)
+        if position and position['contracts'] > 0:
+            self.balance += ((price or self.prices[symbol]) - position['entryPrice']) * position['contracts']
+            position['contracts'] = 0.0
+
+    def set_ohlcv(self, symbol, timeframe, candles):
+        self.ohlcv[(symbol, timeframe)] = [list(candle) for candle in candles]
+
+    def _fill(self, order, price):
+        position = self.positions.get(order['symbol'], {'contracts': 0.0, 'entryPrice': 0.0})
+        amount = order['amount']
+        if order['side'] == 'buy':
+            total = position['contracts'] + amount
+            position['entryPrice'] = (position['entryPrice'] * position['contracts'] + price * amount) / total
+            position['contracts'] = total
+        else:
+            if order.get('reduceOnly'):
+                amount = min(amount, position['contracts'])
+            self.balance += (price - position['entryPrice']) * amount
+            position['contracts'] -= amount
+        self.positions[order['symbol']] = position
+        order.update({'status': 'closed', 'filled': amount, 'average': price, 'price': price})
+        self.trades.append({
+            'id': str(len(self.trades) + 1), 'order': order['id'], 'symbol': order['symbol'], 'side': order['side'],
+            'amount': amount, 'price': price, 'timestamp': int(time.time() * 1000),
+            'fee': {'cost': price * amount * self.fee_rate, 'currency': 'USDT'},
+        })
+
+    def market(self, symbol):
+        return {
+            'id': symbol.split(':')[0].replace('/', ''), 'symbol': symbol, 'swap': True, 'linear': True, 'active': True,
+            'precision': {'amount': self.step, 'price': self.tick},
+            'limits': {'amount': {'min': self.step}, 'cost': {'min': self.min_notional}},
+            'info': {'filters': [
+                {'filterType': 'PRICE_FILTER', 'tickSize': str(self.tick)},
+                {'filterType': 'LOT_SIZE', 'stepSize': str(self.step), 'minQty': str(self.step), 'maxQty': '1000000'},
+                {'filterType': 'MARKET_LOT_SIZE', 'stepSize': str(self.step), 'minQty': str(self.step), 'maxQty': '100000'},
+                {'filterType': 'MIN_NOTIONAL', 'notional': str(self.min_notional)},
+                {'filterType': 'PERCENT_PRICE', 'multiplierUp': str(self.percent_price[0]), 'multiplierDown': str(self.percent_price[1])},
+            ]},
+        }
+
+    async def load_markets(self):
+        await self._call('load_markets')
+        return {symbol: self.market(symbol) for symbol in self.prices}
+
+    async def fetch_time(self):
+        await self._call('fetch_time')
+        return int(time.time() * 1000)
+
+    def used_margin(self):
+        return sum(position['contracts'] * position['entryPrice'] / self.leverage.get(symbol, 1) for symbol, position in self.positions.items())
+
+    async def fetch_balance(self):
+        await self._call('fetch_balance')
+        used = self.used_margin()
+        return {'free': {'USDT': self.balance - used}, 'used': {'USDT': used}, 'total': {'USDT': self.balance}}
+
+    async def fetch_ticker(self, symbol):
+        await self._call('fetch_ticker', symbol)
+        return {'symbol': symbol, 'last': self.prices[symbol]}
+
+    async def fetch_tickers(self, symbols=None):
+        await self._call('fetch_tickers', symbols)
+        return {symbol: {'symbol': symbol, 'last': price} for symbol, price in self.prices.items() if symbols is None or symbol in symbols}
+
+    async def fetch_positions(self, symbols=None):
+        await self._call('fetch_positions', symbols)
+        return [
+            {'symbol': f"{symbol}:USDT", 'side': 'long', 'contracts': position['contracts'], 'entryPrice': position['entryPrice']}
+            for symbol, position in self.positions.items()
+            if position['contracts'] > 0 and (symbols is None or symbol in symbols)
+        ]
+
+    async def fetch_ohlcv(self, symbol, timeframe, since=None, limit=500):
+        await self._call('fetch_ohlcv', symbol, timeframe, since, limit)
+        candles = self.ohlcv.get((symbol, timeframe), [])
+        if since is not None:
+            return [candle for candle in candles if candle[0] >= since][:limit]
+        return candles[-limit:]
+
+    async def fetch_order_book(self, symbol):
+        await self._call('fetch_order_book', symbol)
+        if symbol in self.order_books:
+            return self.order_books[symbol]
+        price = self.prices[symbol]
+        return {'bids': [[price, 1.0]], 'asks': [[price, 1.0]]}
+
+    async def set_margin_mode(self, mode, symbol):
+        await self._call('set_margin_mode', mode, symbol)
+        self.margin_mode[symbol] = mode
+
+    async def set_leverage(self, leverage, symbol):
+        await self._call('set_leverage', leverage, symbol)
+        self.leverage[symbol] = leverage
+        return {'leverage': leverage, 'symbol': symbol}
+
+    async def create_order(self, symbol, type, side, amount, price=None, params=None):
+        await self._call('create_order', symbol, type, side, amount, price, params)
+        params = params or {}
+        if type == 'market' and side == 'sell' and symbol in self.reject_market_sells:
+            raise InvalidOrder('binance {"code":-4131,"msg":"The counterparty\'s best price does not meet the PERCENT_PRICE filter limit."}')
+        if side == 'buy' and not params.get('reduceOnly') and float(amount) * self.prices[symbol] / self.leverage.get(symbol, 1) > self.balance - self.used_margin():
+            raise InsufficientFunds('binance {"code":-2019,"msg":"Margin is insufficient."}')
+        if type == 'limit':
+            up, down = self.percent_price
+            if not self.prices[symbol] * down <= float(price) <= self.prices[symbol] * up:
+                raise InvalidOrder(f'binance {{"code":-4016,"msg":"Limit price can\'t be higher or lower than the PERCENT_PRICE band."}}')
+        order = {
+            'id': str(next(self._ids)), 'symbol': symbol, 'type': type, 'side': side, 'amount': float(amount),
+            'price': price, 'stopPrice': params.get('stopPrice'), 'reduceOnly': params.get('reduceOnly', False),
+            'status': 'open', 'filled': 0.0, 'average': None,
+        }
+        self.orders[order['id']] = order
+        if type in ('market', 'limit'):
+            self._fill(order, self.prices[symbol] if type == 'market' else float(price))
+        return dict(order)
+
+    async def create_market_order(self, symbol, side, amount, price=None, params=None):
+        return await self.create_order(symbol, 'market', side, amount, None, params)
+
+    async def create_market_buy_order(self, symbol, amount, params=None):
+        return await self.create_order(symbol, 'market', 'buy', amount, None, params)
+
+    async def create_market_sell_order(self, symbol, amount, params=None):
+        return await self.create_order(symbol, 'market', 'sell', amount, None, params)
+
+    async def create_limit_sell_order(self, symbol, amount, price, params=None):
+        return await self.create_order(symbol, 'limit', 'sell', amount, price, params)
+
+    async def fapiPrivatePostOrder(self, request):
+        # Raw POST /fapi/v1/order as send_market_order builds it; answers in Binance's own shape
+        symbol = next(symbol for symbol in self.prices if self.market(symbol)['id'] == request['symbol'])
+        quantity = request['quantity']
+        steps = float(quantity) / self.step
+        if abs(steps - round(steps)) > 1e-9 or float(quantity) <= 0:
+            raise InvalidOrder(f'binance {{"code":-1111,"msg":"Precision is over the maximum defined for this asset: {quantity}"}}')
+        reduce_only = request.get('reduceOnly') == 'true'
+        if not reduce_only and float(quantity) * self.prices[symbol] < self.min_notional:
+            raise InvalidOrder(f'binance {{"code":-4164,"msg":"Order\'s notional must be no smaller than {self.min_notional}"}}')
+        order = await self.create_order(symbol, request['type'].lower(), request['side'].lower(), float(quantity), None, {'reduceOnly': reduce_only})
+        return {
+            'orderId': int(order['id']), 'symbol': request['symbol'], 'status': 'FILLED' if order['status'] == 'closed' else 'NEW',
+            'side': request['side'], 'type': request['type'], 'origQty': quantity, 'executedQty': str(order['filled']),
+            'avgPrice': str(order['average'] or 0), 'reduceOnly': reduce_only, 'updateTime': int(time.time() * 1000),
+        }
+
+    def parse_order(self, response, market=None):
+        return {
+            'id': str(response['orderId']), 'symbol': market['symbol'] if market else response['symbol'],
+            'type': response['type'].lower(), 'side': response['side'].lower(), 'status': ORDER_STATUSES[response['status']],
+            'amount': float(response['origQty']), 'filled': float(response['executedQty']),
+            'average': float(response['avgPrice']) or None, 'reduceOnly': response['reduceOnly'],
+            'timestamp': response['updateTime'], 'info': response,
+        }
+
+    async def fetch_order(self, id, symbol=None):
+        await self._call('fetch_order', id, symbol)
+        if id not in self.orders:
+            raise OrderNotFound(id)
+        return dict(self.orders[id])
+
+    async def fetch_my_trades(self, symbol=None, since=None, limit=None, params=None):
+        await self._call('fetch_my_trades', symbol, since, limit, params)
+        order_id = (params or {}).get('orderId')
+        return [dict(trade) for trade in self.trades if (symbol is None or trade['symbol'] == symbol) and (order_id is None or trade['order'] == str(order_id))]
+
+    async def fetch_open_orders(self, symbol=None):
+        await self._call('fetch_open_orders', symbol)
+        return [dict(order) for order in self.orders.values() if order['status'] == 'open' and (symbol is None or order['symbol'] == symbol)]
+
+    async def cancel_order(self, id, symbol=None):
+        await self._call('cancel_order', id, symbol)
+        order = self.orders.get(id)
+        if order is None or order['status'] != 'open':
+            raise OrderNotFound(id)
+        order['status'] = 'canceled'
+        return dict(order)
+
+    async def close(self):
+        pass
@@ -0,0 +1,114 @@
+# notifier.py
+import asyncio
+import logging
+import time
+from collections import deque
+from latency import NULL_RECORDER
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+def retry_after_seconds(error):
+    # telegram.error.RetryAfter carries retry_after as int seconds or a timedelta
+    retry_after = getattr(error, 'retry_after', None)
+    if retry_after is None:
+        return None
+    return retry_after.total_seconds() if hasattr(retry_after, 'total_seconds') else float(retry_after)
+
+class NotificationQueue:
+    """
+    Outbound Telegram messages. post() only appends to an in-memory queue, so
+    the trading path never waits on Telegram; run() sends in the background,
+    joining messages that arrive within coalesce_window into one, spacing
+    sends by min_interval and at most max_per_minute, and honouring flood
+    control (RetryAfter) from the Bot API. Each Bot API call is timed under
+    the latency stage "send_signal".
+    """
+
+    def __init__(self, bot, chat_id, coalesce_window=0.5, min_interval=1.0, max_per_minute=20, retries=3, retry_delay=5, max_queue=500, latency=NULL_RECORDER):
+        self.bot = bot
+        self.latency = latency
+        self.chat_id = chat_id
+        self.coalesce_window = coalesce_window
+        self.min_interval = min_interval
+        self.max_per_minute = max_per_minute
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.pending = deque(maxlen=max_queue)
+        self.sent_at = deque()
+        self.dropped = 0
+        self._ready = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def post(self, message):
+        if len(self.pending) == self.pending.maxlen:
+            self.dropped += 1
+            logging.warning(f"Notification queue full, dropping oldest message ({self.dropped} dropped)")
+        self.pending.append(message)
+        self._idle.clear()
+        self._ready.set()
+
+    async def send(self, message):
+        # Drop-in for the awaited send_signal callbacks; returns as soon as the message is queued
+        self.post(message)
+
+    def _take_batch(self):
+        parts = [self.pending.popleft()]
+        length = len(parts[0])
+        while self.pending and length + 2 + len(self.pending[0]) <= TELEGRAM_MESSAGE_LIMIT:
+            parts.append(self.pending.popleft())
+            length += 2 + len(parts[-1])
+        text = "\n\n".join(part.strip() for part in parts)
+        # A single message over the limit is split rather than rejected by Telegram
+        return [text[i:i + TELEGRAM_MESSAGE_LIMIT] for i in range(0, len(text), TELEGRAM_MESSAGE_LIMIT)], len(parts)
+
+    async def _wait_for_slot(self):
+        now = time.monotonic()
+        while self.sent_at and now - self.sent_at[0] >= 60:
+            self.sent_at.popleft()
+        delay = 0.0
+        if self.sent_at:
+            delay = max(delay, self.sent_at[-1] + self.min_interval - now)
+        if len(self.sent_at) >= self.max_per_minute:
+            delay = max(delay, self.sent_at[0] + 60 - now)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _deliver(self, text):
+        for attempt in range(self.retries):
+            await self._wait_for_slot()
+            try:
+                with self.latency.span("send_signal"):
+                    await self.bot.send_message(chat_id=self.chat_id, text=text)
+                self.sent_at.append(time.monotonic())
+                return True
+            except Exception as e:
+                wait = retry_after_seconds(e)
+                if wait is not None:
+                    logging.warning(f"Telegram flood control, retrying in {wait:.0f}s")
+                else:
+                    wait = self.retry_delay * 2 ** attempt
+                    logging.error(f"Error sending signal on attempt {attempt + 1}/{self.retries}: {e}")
+                if attempt < self.retries - 1:
+                    await asyncio.sleep(wait)
+        logging.error(f"Failed to send signal after {self.retries} attempts: {text}")
+        return False
+
+    async def run(self):
+        while True:
+            if not self.pending:
+                self._idle.set()
+                self._ready.clear()
+                await self._ready.wait()
+            # Give a burst (e.g. several trades closing on one candle) time to arrive and go out as one message
+            await asyncio.sleep(self.coalesce_window)
+            chunks, count = self._take_batch()
+            for chunk in chunks:
+                if await self._deliver(chunk):
+                    logging.info("Signal sent (%d queued messages, %d characters)", count, len(chunk))
+
+    async def flush(self, timeout=10):
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"{len(self.pending)} notifications still queued after {timeout}s")
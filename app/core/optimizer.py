@@ -0,0 +1,190 @@
+# optimizer.py
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from indicators import calculate_ema_matrix
+from backtest import load_ohlcv, run_backtest, summarize
+from config_store import ConfigStore
+from candle_store import CandleStore
+
+# Per-worker views of the shared arrays, attached once by _init_worker
+_shared = {}
+
+def parse_values(text, cast):
+    return [cast(value) for value in text.split(',') if value.strip()]
+
+def build_grid(ema1, ema2, ema3, tp, sl, exitmin, samples=None, seed=0):
+    combos = [
+        {'ema1': a, 'ema2': b, 'ema3': c, 'tp': t, 'sl': s, 'exitmin': m}
+        for a, b, c, t, s, m in itertools.product(ema1, ema2, ema3, tp, sl, exitmin)
+        if a < b < c
+    ]
+    if samples and samples < len(combos):
+        combos = random.Random(seed).sample(combos, samples)
+    return combos
+
+def _share(array):
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+    return shm
+
+def _init_worker(layout):
+    for symbol, (ohlcv_name, ohlcv_shape, ema_name, ema_shape, period_index) in layout.items():
+        ohlcv_shm = shared_memory.SharedMemory(name=ohlcv_name)
+        ema_shm = shared_memory.SharedMemory(name=ema_name)
+        _shared[symbol] = (
+            ohlcv_shm, ema_shm,
+            np.ndarray(ohlcv_shape, dtype=np.float64, buffer=ohlcv_shm.buf),
+            np.ndarray(ema_shape, dtype=np.float64, buffer=ema_shm.buf),
+            period_index,
+        )
+
+def _evaluate(combos, use_exitmin, leverage, fee_pct):
+    results = []
+    for combo in combos:
+        per_symbol = []
+        for symbol, (_, _, ohlcv, emas, period_index) in _shared.items():
+            trades, equity = run_backtest(
+                ohlcv, emas[period_index[combo['ema1']]], emas[period_index[combo['ema2']]], emas[period_index[combo['ema3']]],
+                combo['tp'], combo['sl'], combo['exitmin'], use_exitmin, leverage, fee_pct,
+            )
+            per_symbol.append(summarize(trades, equity))
+        total_trades = sum(stats['trades'] for stats in per_symbol)
+        results.append({
+            **combo,
+            'trades': total_trades,
+            'win_rate': sum(stats['win_rate'] * stats['trades'] for stats in per_symbol) / total_trades if total_trades else 0.0,
+            'return_pct': float(np.mean([stats['return_pct'] for stats in per_symbol])),
+            'max_drawdown_pct': min(stats['max_drawdown_pct'] for stats in per_symbol),
+        })
+    return results
+
+def run_sweep(data, combos, use_exitmin=True, leverage=1, fee_pct=0.0, workers=None):
+    """
+    data maps symbol -> OHLCV array. EMAs for every period in the grid are
+    computed once per symbol and, like the candles, placed in shared memory so
+    worker processes read them without pickling per task.
+    """
+    if not combos:
+        return []
+    periods = sorted({combo[key] for combo in combos for key in ('ema1', 'ema2', 'ema3')})
+    period_index = {period: i for i, period in enumerate(periods)}
+    segments, layout = [], {}
+    try:
+        for symbol, ohlcv in data.items():
+            ohlcv = np.ascontiguousarray(ohlcv, dtype=np.float64)
+            emas = np.ascontiguousarray(calculate_ema_matrix(ohlcv[:, 4], periods).T)
+            ohlcv_shm, ema_shm = _share(ohlcv), _share(emas)
+            segments += [ohlcv_shm, ema_shm]
+            layout[symbol] = (ohlcv_shm.name, ohlcv.shape, ema_shm.name, emas.shape, period_index)
+
+        workers = workers or os.cpu_count() or 1
+        chunk = max(1, len(combos) // (workers * 4))
+        batches = [combos[i:i + chunk] for i in range(0, len(combos), chunk)]
+        results = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(layout,)) as pool:
+            evaluate = partial(_evaluate, use_exitmin=use_exitmin, leverage=leverage, fee_pct=fee_pct)
+            for batch_results in pool.map(evaluate, batches):
+                results.extend(batch_results)
+        return results
+    finally:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+
+def write_parameters(config_path, best):
+    # Same layout load_config reads: only the strategy keys under "parameters" change
+    store = ConfigStore(config_path)
+    config = store.load()
+    params = config.get('parameters', {})
+    for key in ('ema1', 'ema2', 'ema3', 'tp', 'sl', 'exitmin'):
+        value = best[key]
+        params[key] = int(value) if key.startswith('ema') or key == 'exitmin' else float(value)
+    config['parameters'] = params
+    store.save(config)
+
+def find_data_file(data_dir, symbol):
+    name = symbol.split(':')[0].replace('/', '')
+    for ext in ('.npy', '.csv'):
+        path = os.path.join(data_dir, name + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Parameter sweep for the EMA crossover strategy")
+    parser.add_argument('data', nargs='*', help="OHLCV files; defaults to selected_coins found in --data-dir")
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--store', help="Read candles for the symbols (or selected_coins) from this candle store")
+    parser.add_argument('--timeframe', default='1m', help="Timeframe to read from --store")
+    parser.add_argument('--ema1', default='9,14,21,30')
+    parser.add_argument('--ema2', default='40,50,60,80')
+    parser.add_argument('--ema3', default='200,300,365')
+    parser.add_argument('--tp', default='0.3,0.5,1.0')
+    parser.add_argument('--sl', default='1,2,3')
+    parser.add_argument('--exitmin', default='2,5,15')
+    parser.add_argument('--no-exitmin', action='store_true')
+    parser.add_argument('--random', type=int, help="Evaluate this many random combinations from the grid")
+    parser.add_argument('--leverage', type=int, default=1)
+    parser.add_argument('--fee', type=float, default=0.04, help="Fee per side in percent")
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--sort', default='return_pct')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--out', default='optimizer_results.csv')
+    parser.add_argument('--write-config', action='store_true', help="Save the best combination into --config")
+    args = parser.parse_args()
+
+    paths = {os.path.splitext(os.path.basename(path))[0]: path for path in args.data}
+    if args.store:
+        symbols = args.data
+        if not symbols:
+            with open(args.config, 'r') as f:
+                symbols = json.load(f).get('selected_coins', [])
+        store = CandleStore(args.store)
+        data = {symbol: store.read_ohlcv(symbol, args.timeframe) for symbol in symbols}
+        data = {symbol: ohlcv for symbol, ohlcv in data.items() if len(ohlcv)}
+        paths = dict.fromkeys(data)
+    elif not paths:
+        with open(args.config, 'r') as f:
+            selected_coins = json.load(f).get('selected_coins', [])
+        for symbol in selected_coins:
+            path = find_data_file(args.data_dir, symbol)
+            if path:
+                paths[symbol] = path
+            else:
+                print(f"No data for {symbol} in {args.data_dir}, skipping")
+    if not paths:
+        parser.error("no OHLCV data to optimize on")
+
+    combos = build_grid(
+        parse_values(args.ema1, int), parse_values(args.ema2, int), parse_values(args.ema3, int),
+        parse_values(args.tp, float), parse_values(args.sl, float), parse_values(args.exitmin, int),
+        samples=args.random,
+    )
+    if not combos:
+        print("No parameter combinations left (every one needs ema1 < ema2 < ema3), nothing to evaluate")
+        return
+    if not args.store:
+        data = {symbol: load_ohlcv(path) for symbol, path in paths.items()}
+    started = time.perf_counter()
+    results = run_sweep(data, combos, not args.no_exitmin, args.leverage, args.fee, args.workers)
+    print(f"Evaluated {len(combos)} combinations on {len(data)} symbols in {time.perf_counter() - started:.1f}s")
+
+    table = pd.DataFrame(results).sort_values(args.sort, ascending=False).reset_index(drop=True)
+    table.to_csv(args.out, index=False)
+    print(table.head(args.top).to_string())
+    if args.write_config and len(table):
+        write_parameters(args.config, table.iloc[0])
+        print(f"Wrote best parameters to {args.config}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# positions.py
+import logging
+import time
+
+class PositionManager:
+    """
+    Open trades keyed by symbol, each with its own exit_state and monitoring
+    task. Entries are limited by max_positions and by total USDT notional
+    (0 disables the limit), counting entry orders still in flight as well.
+    """
+
+    def __init__(self, max_positions=1, max_total_exposure=0):
+        self.max_positions = max_positions
+        self.max_total_exposure = max_total_exposure
+        self.open_trades = {}  # symbol -> trade dict
+        self.pending = {}  # symbol -> notional of an entry order not filled yet
+        self.last_opened_at = None  # monotonic time of the last open, for balance freshness
+
+    def __len__(self):
+        return len(self.open_trades)
+
+    def __contains__(self, symbol):
+        return symbol in self.open_trades
+
+    def symbols(self):
+        return list(self.open_trades)
+
+    def is_full(self):
+        return len(self.open_trades) >= self.max_positions
+
+    def free_slots(self):
+        return max(0, self.max_positions - len(self.open_trades))
+
+    def blocking_trade(self, symbol):
+        # What check_strategy sees as the active trade when evaluating symbol
+        if symbol in self.open_trades:
+            return symbol
+        if self.is_full():
+            return next(iter(self.open_trades))
+        return None
+
+    def exposure(self):
+        return sum(trade['notional'] for trade in self.open_trades.values()) + sum(self.pending.values())
+
+    def exposure_headroom(self):
+        if not self.max_total_exposure:
+            return float('inf')
+        return max(0.0, self.max_total_exposure - self.exposure())
+
+    def reserve(self, symbol, notional):
+        # Held from sizing until the entry order fills (open) or fails (unreserve), so concurrent entries see it
+        self.pending[symbol] = notional
+
+    def unreserve(self, symbol):
+        self.pending.pop(symbol, None)
+
+    def pending_margin(self, leverage):
+        return sum(self.pending.values()) / leverage
+
+    def open(self, symbol, entry_price, notional, opened_at=None, order_id=None):
+        trade = {
+            'symbol': symbol,
+            'entry_price': entry_price,
+            'notional': notional,
+            'opened_at': opened_at or time.time(),
+            'order_id': order_id,  # entry order, whose fills (and fees) the journal attaches to the closed trade
+            'active_trade': [symbol],  # process_trade keeps monitoring while this holds the symbol
+            'exit_state': [None],
+            'task': None,
+        }
+        self.pending.pop(symbol, None)
+        self.open_trades[symbol] = trade
+        self.last_opened_at = time.monotonic()
+        logging.info(f"Opened {symbol} ({len(self.open_trades)}/{self.max_positions} positions, {self.exposure():.2f} USDT exposure)")
+        return trade
+
+    def close(self, symbol):
+        trade = self.open_trades.pop(symbol, None)
+        if trade is not None:
+            trade['active_trade'][0] = None
+            logging.info(f"Released {symbol} ({len(self.open_trades)}/{self.max_positions} positions)")
+        return trade
+
+    def clear(self):
+        for symbol in self.symbols():
+            self.close(symbol)
@@ -0,0 +1,112 @@
+# rate_limiter.py
+import asyncio
+import logging
+import random
+import time
+
+ORDER, ACCOUNT, MARKET_DATA = 0, 1, 2  # request priorities, highest first
+PRIORITY_NAMES = ('order', 'account', 'market_data')
+
+def backoff_delay(attempt, base=1.0, cap=30.0):
+    # Full-jitter exponential backoff: retries from many symbols spread out instead of firing together
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def request_priority(api, method, path):
+    # Order placement and cancels first, then other signed (account) calls, then public market data
+    if method != 'GET' and 'order' in path.lower():
+        return ORDER
+    if 'private' in str(api).lower():
+        return ACCOUNT
+    return MARKET_DATA
+
+class WeightLimiter:
+    """
+    Token bucket over Binance request weight: limit weight per window seconds,
+    refilled continuously. Lower priorities may not draw the bucket below
+    their reserve share of the limit and wait while a higher priority is
+    waiting, so orders still go out when market-data polling has used most of
+    the budget. observe() pulls the bucket down to the X-MBX-USED-WEIGHT-1M
+    the server reports, and a 429/418 blocks every caller for Retry-After.
+    """
+
+    def __init__(self, limit=2400, window=60, reserve=(0.0, 0.1, 0.2), header='x-mbx-used-weight-1m'):
+        self.limit = limit
+        self.window = window
+        self.rate = limit / window
+        self.reserve = reserve
+        self.header = header
+        self.tokens = float(limit)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.waiting = [0, 0, 0]
+        self.used = {}  # endpoint -> weight spent through this limiter
+        self.server_used = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.limit, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, cost=1, priority=MARKET_DATA, endpoint=None):
+        cost = min(cost, self.limit)
+        floor = self.limit * self.reserve[priority]
+        self.waiting[priority] += 1
+        try:
+            while True:
+                self._refill()
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                if not any(self.waiting[:priority]) and self.tokens - cost >= floor:
+                    self.tokens -= cost
+                    if endpoint is not None:
+                        self.used[endpoint] = self.used.get(endpoint, 0) + cost
+                    return
+                await asyncio.sleep(min(1.0, max(0.01, (cost + floor - self.tokens) / self.rate)))
+        finally:
+            self.waiting[priority] -= 1
+
+    def observe(self, status, headers):
+        headers = {key.lower(): value for key, value in (headers or {}).items()}
+        used = headers.get(self.header)
+        if used is not None:
+            self._refill()
+            self.server_used = int(used)
+            self.tokens = min(self.tokens, self.limit - self.server_used)
+        if status in (418, 429):
+            retry_after = float(headers.get('retry-after') or (120 if status == 418 else 10))
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            self.tokens = 0.0
+            logging.warning(f"Binance answered {status}, pausing requests for {retry_after:.0f}s (used weight {self.server_used})")
+
+    def stats(self):
+        self._refill()
+        return {'tokens': self.tokens, 'server_used': self.server_used, 'waiting': dict(zip(PRIORITY_NAMES, self.waiting)), 'used': dict(self.used)}
+
+def install(exchange, weights, orders=None):
+    """
+    Route every REST call of a ccxt exchange through weights (shared, since
+    Binance counts weight per IP) and, for order requests, orders (the
+    per-account order-count limit). Replaces ccxt's fixed-delay throttle.
+    """
+    fetch2 = exchange.fetch2
+    on_rest_response = exchange.on_rest_response
+
+    async def limited_fetch2(path, api='public', method='GET', params={}, headers=None, body=None, config={}):
+        priority = request_priority(api, method, path)
+        if priority == ORDER and orders is not None:
+            await orders.acquire(1, ORDER, path)
+        await weights.acquire(exchange.calculate_rate_limiter_cost(api, method, path, params, config), priority, path)
+        return await fetch2(path, api, method, params, headers, body, config)
+
+    def observing_on_rest_response(code, reason, url, method, response_headers, response_body, request_headers, request_body):
+        weights.observe(code, response_headers)
+        if orders is not None:
+            orders.observe(code, response_headers)
+        return on_rest_response(code, reason, url, method, response_headers, response_body, request_headers, request_body)
+
+    exchange.fetch2 = limited_fetch2
+    exchange.on_rest_response = observing_on_rest_response
+    exchange.enableRateLimit = False
+    return exchange
@@ -0,0 +1,181 @@
+# scanner.py
+import asyncio
+import logging
+import time
+from indicators import update_emas, fetch_binance_data
+from strategy import check_strategy
+from trading import place_market_buy_order, ensure_account_settings
+from snapshot import normalize_symbol
+from time_utils import candle_open_time
+from trade_journal import with_account_fills
+from latency import NULL_RECORDER
+
+class Scanner:
+    """
+    The per-candle hot path: fetch and evaluate every selected symbol
+    concurrently, then enter on signals in config order, sized from the
+    BalanceTracker, MarketRules and PositionManager limits. It takes its
+    exchange and collaborators, so main runs it on the live client and
+    benchmark.py on a MockExchange. Settings are main's single-element list
+    holders, read on every call so Telegram and config changes apply at once.
+    on_open(trade) is called for every position opened (main starts its
+    monitor there).
+    """
+
+    def __init__(self, exchange, positions, balance_tracker, clock, journal, market_rules, valid_symbols, timeframe, ema_periods, leverage, take_profit_pct, stop_loss_pct,
+                 scan_concurrency=None, is_running=None, candle_store=None, notify=None, on_open=None, latency=NULL_RECORDER):
+        self.exchange = exchange
+        self.positions = positions
+        self.balance_tracker = balance_tracker
+        self.clock = clock
+        self.journal = journal
+        self.market_rules = market_rules  # normalized symbol -> MarketRules
+        self.valid_symbols = valid_symbols  # set, refreshed in place from load_markets
+        self.timeframe = timeframe
+        self.ema_periods = ema_periods  # (ema_period1, ema_period2, ema_period3)
+        self.leverage = leverage
+        self.take_profit_pct = take_profit_pct
+        self.stop_loss_pct = stop_loss_pct
+        self.scan_concurrency = scan_concurrency or [10]
+        self.is_running = is_running or [True]
+        self.candle_store = candle_store or [None]
+        self.notify = notify or (lambda message: None)
+        self.on_open = on_open or (lambda trade: None)
+        self.latency = latency
+        self.market_stream = None  # set by main once the websocket feed exists
+        self.candle_cache = {}  # (symbol, timeframe) -> CandleCache
+        self.indicator_states = {}  # (symbol, timeframe, period) -> EmaState
+        self.checked_symbols_state = {}
+        self.account_settings = {}  # symbol -> leverage set with cross margin
+
+    async def fetch_candles(self, symbol, timeframe):
+        # Serve candles straight from the stream-fed cache while the websocket is live and has the candle that opened at the
+        # last close (strategies read the closed candle at -2); right after a close that kline may still be on its way
+        stream = self.market_stream
+        if stream is not None and stream.timeframe == timeframe and stream.is_live(symbol):
+            cache = self.candle_cache[(symbol, timeframe)]
+            if cache.last_timestamp >= candle_open_time(timeframe, self.clock.now_ms()):
+                return cache.to_frame()
+        return await fetch_binance_data(symbol, timeframe, self.exchange, candle_cache=self.candle_cache, candle_store=self.candle_store[0])
+
+    def last_candle_close(self):
+        # Server time (ms) at which the current candle opened, i.e. when the previous one closed
+        return candle_open_time(self.timeframe[0], self.clock.now_ms())
+
+    async def evaluate_symbol(self, symbol, semaphore):
+        if symbol not in self.valid_symbols:
+            logging.warning(f"Skipping {symbol}: not available on Binance")
+            return None
+        timeframe = self.timeframe[0]
+        try:
+            async with semaphore:
+                with self.latency.span("fetch_binance_data"):
+                    df = await self.fetch_candles(symbol, timeframe)
+            if df.empty:
+                return None
+            with self.latency.span("calculate_emas"):
+                df = update_emas(df, symbol, timeframe, *(period[0] for period in self.ema_periods), self.indicator_states)
+            with self.latency.span("check_strategy"):
+                return check_strategy(df, symbol, self.positions.blocking_trade(symbol), self.checked_symbols_state, self.is_running[0])
+        except Exception as e:
+            logging.error(f"Error evaluating {symbol}: {e}")
+            return None
+
+    async def enter_trade(self, symbol, order_info):
+        positions = self.positions
+        leverage = self.leverage[0]
+        try:
+            entry_price = order_info['price']
+            candle_close = self.last_candle_close()
+            with self.latency.span("fetch_balance"):
+                # Refetched when a position opened after the cached balance was requested, so its margin is not counted twice
+                usdt_free = await self.balance_tracker.get_free(sent_after=positions.last_opened_at)
+            # Entries still in flight hold margin the exchange balance does not show yet
+            usdt_free = max(0.0, usdt_free - positions.pending_margin(leverage))
+            # Free margin is split evenly over the position slots still open
+            margin = usdt_free * 0.99 / max(1, positions.free_slots())
+            notional_value = margin * leverage
+            headroom = positions.exposure_headroom()
+            if notional_value > headroom:
+                if headroom < 10:
+                    logging.warning(f"Exposure limit reached, skipping {symbol} ({positions.exposure():.2f} USDT open)")
+                    return
+                logging.info(f"Reducing {symbol} notional from {notional_value:.2f} to {headroom:.2f} USDT to stay within the exposure limit")
+                notional_value = headroom
+                margin = notional_value / leverage
+            rules = self.market_rules.get(normalize_symbol(symbol))
+            if rules is not None:
+                # Lot step, min quantity and min notional applied locally, so the order is valid on the first send
+                position_size = rules.size(notional_value, entry_price)
+                notional_value = position_size * entry_price
+                margin = notional_value / leverage
+            else:
+                position_size = notional_value / entry_price
+
+            if rules is None and notional_value < 10:
+                logging.warning(f"Notional value {notional_value:.2f} USDT for {symbol} below minimum 10 USDT")
+                position_size = 10 / entry_price
+                notional_value = 10
+                margin = notional_value / leverage
+
+            if margin > usdt_free:
+                logging.warning(f"Insufficient margin for {symbol}: Required {margin:.2f} USDT, Available {usdt_free:.2f} USDT")
+                self.notify(f"⚠️ Insufficient margin for {symbol}: Required {margin:.2f} USDT, Available {usdt_free:.2f} USDT")
+                return
+            positions.reserve(symbol, notional_value)
+
+            with self.latency.span("set_leverage"):
+                await ensure_account_settings(symbol, self.exchange, leverage, self.account_settings)
+
+            position_size_pct = (margin / usdt_free) * 100 if usdt_free > 0 else 0
+            tp_price = entry_price * (1 + self.take_profit_pct[0] / 100)
+            sl_price = entry_price * (1 - self.stop_loss_pct[0] / 100)
+            message = f"""
+🔺 LONG ENTRY ALERT 🔺  
+📈 Symbol: {symbol}  
+💰 Entry Price: {entry_price:.2f}  
+📊 Order Details:  
+   ├─ Amount: {position_size:.2f} {symbol.split('/')[0]}  
+   ├─ Notional: {notional_value:.2f} USDT  
+   ├─ Cost (Margin): {margin:.2f} USDT  
+🎯 TP: {tp_price:.3f} | SL: {sl_price:.3f}  
+📊 Position Size: {position_size_pct:.2f}% of Balance
+            """
+            self.notify(message)
+            with self.latency.span("create_market_buy_order"):
+                order = await place_market_buy_order(symbol, position_size, self.exchange, rules)
+            self.latency.record("candle_close_to_order", (self.clock.now_ms() - candle_close) / 1000)
+            if order:
+                trade = positions.open(symbol, entry_price, notional_value, order_id=order.get('id'))
+                self.balance_tracker.schedule_refresh()
+                logging.info("Successfully placed long order for %s: %.2f at %.2f", symbol, position_size, entry_price)
+                if 'fills' in order:
+                    for fill in order['fills']:
+                        logging.info("Fill: %.2f %s at %.2f", fill['amount'], symbol.split('/')[0], fill['price'])
+                self.on_open(trade)
+                try:
+                    self.journal.record_fill(symbol, 'buy', 'entry', await with_account_fills(self.exchange, symbol, order))
+                except Exception as e:
+                    logging.error(f"Error recording {symbol} entry in the journal: {e}")
+            else:
+                logging.error(f"Failed to place long order for {symbol}")
+        except Exception as e:
+            logging.error(f"Error processing {symbol}: {e}")
+        finally:
+            positions.unreserve(symbol)
+
+    async def scan_symbols(self, selected_coins):
+        # Fetch and evaluate every symbol concurrently, then act on signals in config order
+        positions = self.positions
+        scan_start = time.perf_counter()
+        semaphore = asyncio.Semaphore(max(1, int(self.scan_concurrency[0])))
+        results = await asyncio.gather(*(self.evaluate_symbol(symbol, semaphore) for symbol in selected_coins))
+        self.latency.record("scan", time.perf_counter() - scan_start)
+        signals = [(symbol, order_info) for symbol, order_info in zip(selected_coins, results) if order_info]
+        logging.info("Scanned %d symbols in %.0fms (%d signals)", len(selected_coins), (time.perf_counter() - scan_start) * 1000, len(signals))
+        for symbol, order_info in signals:
+            if positions.is_full():
+                logging.info(f"All {positions.max_positions} position slots in use ({', '.join(positions.symbols())}), skipping signal for {symbol}")
+                continue
+            await self.enter_trade(symbol, order_info)
+        return signals
@@ -0,0 +1,92 @@
+# snapshot.py
+import asyncio
+import logging
+import time
+
+def normalize_symbol(symbol):
+    # 'BTC/USDT', 'BTC/USDT:USDT' and 'BTCUSDT' all map to 'BTCUSDT'
+    return symbol.split(':')[0].replace('/', '')
+
+def find_open_position(positions, symbol):
+    normalized_symbol = normalize_symbol(symbol)
+    for pos in positions:
+        if normalize_symbol(pos['symbol']) == normalized_symbol and float(pos['contracts']) > 0:
+            return pos
+    return None
+
+class MarketSnapshot:
+    """
+    Open positions and last prices for every tracked symbol, fetched with one
+    fetch_positions and one price call per tick and indexed by normalized
+    symbol. Consumers read from the snapshot; reads in a new tick trigger a
+    single refresh that concurrent readers share.
+    """
+
+    def __init__(self, exchange, get_symbols, tick_interval=10):
+        self.exchange = exchange
+        self.get_symbols = get_symbols
+        self.tick_interval = tick_interval
+        self.positions = {}  # normalized symbol -> open position
+        self.prices = {}  # normalized symbol -> last price
+        self.symbols = set()  # normalized symbols covered by the last refresh
+        self.extra_symbols = set()  # symbols read by consumers but not returned by get_symbols
+        self.refreshed_tick = None
+        self._refreshing = None
+
+    def current_tick(self):
+        return int(time.monotonic() // self.tick_interval)
+
+    def invalidate(self):
+        # After an order the cached position is stale, the next read fetches again
+        self.refreshed_tick = None
+
+    def release(self, symbol):
+        # Stop fetching a symbol that was only read ad hoc, once its trade is over
+        normalized_symbol = normalize_symbol(symbol)
+        self.extra_symbols = {extra for extra in self.extra_symbols if normalize_symbol(extra) != normalized_symbol}
+
+    async def _fetch_prices(self, symbols):
+        # fetchLastPrices hits the lighter price-only endpoint where ccxt supports it
+        if getattr(self.exchange, 'has', {}).get('fetchLastPrices'):
+            prices = await self.exchange.fetch_last_prices(symbols)
+            return {symbol: ticker['price'] for symbol, ticker in prices.items()}
+        tickers = await self.exchange.fetch_tickers(symbols)
+        return {symbol: ticker['last'] for symbol, ticker in tickers.items()}
+
+    async def _fetch(self):
+        symbols = sorted(set(self.get_symbols()) | self.extra_symbols)
+        positions, prices = await asyncio.gather(self.exchange.fetch_positions(symbols), self._fetch_prices(symbols))
+        return symbols, positions, prices
+
+    async def refresh(self):
+        tick = self.current_tick()
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._fetch())
+        try:
+            symbols, positions, prices = await asyncio.shield(self._refreshing)
+        finally:
+            self._refreshing = None
+        self.symbols = {normalize_symbol(symbol) for symbol in symbols}
+        self.positions = {normalize_symbol(pos['symbol']): pos for pos in positions if float(pos['contracts']) > 0}
+        self.prices = {normalize_symbol(symbol): price for symbol, price in prices.items()}
+        self.refreshed_tick = tick
+        logging.debug("Refreshed snapshot: %d positions, %d prices", len(self.positions), len(self.prices))
+
+    async def _current(self, symbol, fresh):
+        if normalize_symbol(symbol) not in self.symbols:
+            self.extra_symbols.add(symbol)
+            fresh = True
+        if fresh or self.refreshed_tick != self.current_tick():
+            await self.refresh()
+
+    async def price(self, symbol, fresh=False):
+        await self._current(symbol, fresh)
+        return self.prices.get(normalize_symbol(symbol))
+
+    async def position(self, symbol, fresh=False):
+        await self._current(symbol, fresh)
+        return self.positions.get(normalize_symbol(symbol))
+
+    async def wait_tick(self):
+        # Sleep to the next tick boundary so every consumer wakes together and shares the refresh
+        await asyncio.sleep(self.tick_interval - time.monotonic() % self.tick_interval + 0.01)
@@ -24,7 +24,7 @@ def check_strategy(df, symbol, active_trade, checked_symbols_state, is_running):
     if is_running and not active_trade:
         if state['first_cross'] is None and (ema1_cross or ema2_cross):
             state['first_cross'] = 'EMA1' if ema1_cross else 'EMA2'
-            logging.info(f"[{symbol}] First crossover by {state['first_cross']} above EMA3 at {current['timestamp']}")
+            logging.info("[%s] First crossover by %s above EMA3 at %s", symbol, state['first_cross'], current['timestamp'])
             checked_symbols_state[symbol] = state
             return None
 
@@ -36,7 +36,7 @@ def check_strategy(df, symbol, active_trade, checked_symbols_state, is_running):
 
             if state['second_cross']:
                 state['stored_high'] = current['high']
-                logging.info(f"[{symbol}] Second crossover by {state['second_cross']} above EMA3. Stored high: {state['stored_high']}")
+                logging.info("[%s] Second crossover by %s above EMA3. Stored high: %s", symbol, state['second_cross'], state['stored_high'])
                 checked_symbols_state[symbol] = state
                 return None
 
@@ -0,0 +1,88 @@
+# supervisor.py
+import asyncio
+import logging
+
+async def run_to_completion(coro):
+    """
+    Await coro without letting a cancellation interrupt it halfway, e.g. between
+    sending a close order and recording the trade. If the caller is cancelled
+    meanwhile, coro still finishes and the cancellation is raised afterwards.
+    """
+    future = asyncio.ensure_future(coro)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await future
+        raise
+
+class TaskSupervisor:
+    """
+    Named background tasks that are restarted with exponential backoff when
+    they crash, up to max_restarts times. on_exit runs once the
+    task is finished for good: returned, gave up or was cancelled. When
+    on_give_up is given it runs instead of on_exit after the last crash, with
+    that exception, for tasks whose cleanup must not happen unsupervised.
+    """
+
+    def __init__(self, max_restarts=5, restart_delay=1, max_delay=30):
+        self.max_restarts = max_restarts
+        self.restart_delay = restart_delay
+        self.max_delay = max_delay
+        self.tasks = {}
+
+    def running(self, prefix=''):
+        return [name for name, task in self.tasks.items() if name.startswith(prefix) and not task.done()]
+
+    def start(self, name, factory, on_exit=None, on_give_up=None):
+        # factory is called again for every restart, so it must build a fresh coroutine
+        task = self.tasks.get(name)
+        if task is not None and not task.done():
+            logging.warning(f"Task {name} is already running")
+            return task
+        task = asyncio.create_task(self._supervise(name, factory, on_exit, on_give_up), name=name)
+        self.tasks[name] = task
+        return task
+
+    async def _supervise(self, name, factory, on_exit, on_give_up):
+        restarts = 0
+        gave_up = None
+        try:
+            while True:
+                try:
+                    return await factory()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    restarts += 1
+                    if restarts > self.max_restarts:
+                        logging.error(f"Task {name} crashed {restarts} times, giving up: {e}")
+                        gave_up = e
+                        return None
+                    delay = min(self.restart_delay * 2 ** (restarts - 1), self.max_delay)
+                    logging.error(f"Task {name} crashed: {e}. Restarting in {delay}s ({restarts}/{self.max_restarts})")
+                    await asyncio.sleep(delay)
+        finally:
+            if self.tasks.get(name) is asyncio.current_task():
+                del self.tasks[name]
+            try:
+                if gave_up is not None and on_give_up is not None:
+                    on_give_up(gave_up)
+                elif on_exit is not None:
+                    on_exit()
+            except Exception as e:
+                logging.error(f"Error cleaning up task {name}: {e}")
+
+    async def cancel(self, names, timeout=10):
+        tasks = [self.tasks[name] for name in names if name in self.tasks]
+        for task in tasks:
+            task.cancel()
+        if not tasks:
+            return
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            logging.error(f"Task {task.get_name()} did not stop within {timeout}s")
+
+    async def shutdown(self, timeout=10):
+        names = self.running()
+        logging.info(f"Stopping {len(names)} background tasks")
+        await self.cancel(names, timeout)
@@ -1,8 +1,17 @@
 # telegram_ui.py
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.error import TimedOut
 from telegram.ext import CallbackContext, CommandHandler, CallbackQueryHandler, MessageHandler, filters
+import ccxt.async_support as ccxt
+import asyncio
 import json
 import logging
+from datetime import datetime
+from config_store import ConfigStore
+from time_utils import BINANCE_TIMEFRAMES
+from trade_journal import parse_range
+
+config_store = ConfigStore('config.json')
 
 def get_main_menu():
     return InlineKeyboardMarkup([
@@ -69,12 +78,12 @@ async def handle_message(update: Update, context: CallbackContext, CHAT_ID):
     if update.message and update.message.chat and str(update.message.chat.id) == CHAT_ID:
         if update.message.text == "/menu":
             await update.message.reply_text("Main Menu:", reply_markup=get_main_menu())
-        elif update.message.text not in ["/start", "/stop", "/balance", "/status", "/showconfig", "/set", "/help"]:
+        elif update.message.text not in ["/start", "/stop", "/balance", "/status", "/showconfig", "/set", "/help", "/latency", "/trades"]:
             await update.message.reply_text("Unknown command! Use the menu below:", reply_markup=get_main_menu())
     else:
         logging.warning(f"Unauthorized access attempt from chat ID: {update.message.chat.id}")
 
-async def handle_callback(update: Update, context: CallbackContext, LEVERAGE, use_exitmin, timeframe, load_config, save_config, start_bot, stop_bot, send_balance, send_status, send_trades, send_help):
+async def handle_callback(update: Update, context: CallbackContext, LEVERAGE, use_exitmin, timeframe, load_config, save_config, start_bot, stop_bot, send_balance, send_status, send_trades, send_help, on_leverage_change=None):
     query = update.callback_query
     await query.answer()
     data = query.data
@@ -150,6 +159,8 @@ async def handle_callback(update: Update, context: CallbackContext, LEVERAGE, us
         elif param.startswith('leverage_'):
             leverage_value = int(param.split('_')[1])
             LEVERAGE[0] = leverage_value
+            if on_leverage_change:
+                on_leverage_change(leverage_value)
             await query.edit_message_text(f"Leverage set to {leverage_value}x", reply_markup=get_config_menu(LEVERAGE[0]))
         else:
             instruction = f"Use /set {param} <value> to change this parameter."
@@ -163,7 +174,7 @@ async def handle_callback(update: Update, context: CallbackContext, LEVERAGE, us
         if query.message.text != new_text or str(query.message.reply_markup) != str(new_markup):
             await query.edit_message_text(new_text, reply_markup=new_markup)
 
-async def start_bot(update: Update, context: CallbackContext, is_running, session_start_balance, init_from_config, sync_time, clear_mismatched_positions, get_balance, get_selected_coins, timeframe, ema_period1, ema_period2, ema_period3, exit_minutes, LEVERAGE, send_signal, get_current_ist_time, get_current_utc_time):
+async def start_bot(update: Update, context: CallbackContext, is_running, session_start_balance, start_session, init_from_config, sync_time, clear_mismatched_positions, get_balance, get_selected_coins, timeframe, ema_period1, ema_period2, ema_period3, exit_minutes, LEVERAGE, send_signal, get_current_ist_time, get_current_utc_time):
     if not is_running[0]:
         is_running[0] = True
         init_from_config()
@@ -171,6 +182,7 @@ async def start_bot(update: Update, context: CallbackContext, is_running, sessio
         await clear_mismatched_positions()
         usdt_balance = await get_balance('USDT')
         session_start_balance[0] = usdt_balance
+        start_session()
         start_message = f"""
 ✅ TRADING BOT ACTIVATED ✅
 
@@ -207,38 +219,38 @@ async def start_bot(update: Update, context: CallbackContext, is_running, sessio
         else:
             await update.message.reply_text("Bot is already running!", reply_markup=get_main_menu())
 
-async def stop_bot(update: Update, context: CallbackContext, is_running, active_trade, session_start_balance, trade_history, LEVERAGE, get_balance, sync_time, place_market_sell_order, reset_global_states, send_signal, get_current_ist_time, get_current_utc_time):
+async def stop_bot(update: Update, context: CallbackContext, is_running, positions, stop_monitoring, session_start_balance, journal, LEVERAGE, get_balance, sync_time, get_position, place_market_sell_order, reset_global_states, send_signal, get_current_ist_time, get_current_utc_time):
     if is_running[0]:
         start_balance = session_start_balance[0]
-        if active_trade[0]:
+        open_symbols = positions.symbols()
+        if open_symbols:
             await sync_time()
-            try:
-                positions = await exchange.fetch_positions([active_trade[0]])
-                normalized_symbol = active_trade[0].replace('/', '')
-                for pos in positions:
-                    pos_symbol_normalized = pos['symbol'].replace('/', '').replace(':USDT', '')
-                    if pos_symbol_normalized == normalized_symbol and pos['side'] == 'long' and float(pos['contracts']) > 0:
+            await stop_monitoring()  # Stop the monitoring tasks before closing underneath them
+            for symbol in open_symbols:
+                try:
+                    pos = await get_position(symbol)
+                    if pos is not None and pos['side'] == 'long':
                         amount = float(pos['contracts'])
-                        logging.info(f"Closing long position for {active_trade[0]}: {amount} contracts")
-                        order = await place_market_sell_order(active_trade[0], amount)
+                        logging.info(f"Closing long position for {symbol}: {amount} contracts")
+                        order = await place_market_sell_order(symbol, amount)
                         if order and order['status'] == 'closed':
-                            logging.info(f"Successfully closed long position for {active_trade[0]}: {amount} contracts")
-                            await send_signal(f"🔔 Closed long position for {active_trade[0]}: {amount} contracts on bot stop")
+                            logging.info(f"Successfully closed long position for {symbol}: {amount} contracts")
+                            await send_signal(f"🔔 Closed long position for {symbol}: {amount} contracts on bot stop")
                         else:
-                            logging.error(f"Failed to close long position for {active_trade[0]}")
-            except Exception as e:
-                logging.error(f"Error closing position for {active_trade[0]}: {e}")
-            active_trade[0] = None
+                            logging.error(f"Failed to close long position for {symbol}")
+                except Exception as e:
+                    logging.error(f"Error closing position for {symbol}: {e}")
         usdt_balance = await get_balance('USDT')
         net_pl_usdt = usdt_balance - start_balance
         net_pl_pct = (net_pl_usdt / start_balance) * 100 if start_balance > 0 else -100.00
+        session_trades = journal.stats(journal.session_started_at())['trades']
         stop_message = f"""
 🚫 BOT DEACTIVATED 🚫  
 📊 Session Report:  
    ├─ Start Balance: {start_balance:.2f} USDT  
    ├─ End Balance: {usdt_balance:.2f} USDT  
    ├─ Net P/L: {net_pl_pct:.2f}% ({net_pl_usdt:.2f} USDT)  
-   └─ Trades: {len(trade_history)}  
+   └─ Trades: {session_trades}  
 ⚙️ Leverage: {LEVERAGE[0]}x  
 📅 Date: {datetime.now().strftime("%Y-%m-%d")}  
 🕒 Time: {get_current_ist_time()} IST | {get_current_utc_time()} UTC  
@@ -258,7 +270,7 @@ async def stop_bot(update: Update, context: CallbackContext, is_running, active_
         else:
             await update.message.reply_text("Bot is already stopped!", reply_markup=get_main_menu())
 
-async def send_balance(update: Update, context: CallbackContext, exchange, timeframe, LEVERAGE, take_profit_pct, stop_loss_pct, active_trade, sync_time, get_current_ist_time, get_current_utc_time):
+async def send_balance(update: Update, context: CallbackContext, exchange, timeframe, LEVERAGE, take_profit_pct, stop_loss_pct, positions, sync_time, get_current_ist_time, get_current_utc_time):
     try:
         await sync_time()
         balance = await exchange.fetch_balance()
@@ -283,7 +295,7 @@ async def send_balance(update: Update, context: CallbackContext, exchange, timef
    └─ Stop-Loss: {stop_loss_pct[0]}%
 
 📊 Open Positions:
-   └─ {active_trade[0] if active_trade[0] else 'None'}
+   └─ {', '.join(positions.symbols()) or 'None'}
 
 📅 Date: {datetime.now().strftime("%Y-%m-%d")}
 🕒 Time: {get_current_ist_time()} IST | {get_current_utc_time()} UTC
@@ -316,14 +328,14 @@ async def send_balance(update: Update, context: CallbackContext, exchange, timef
         else:
             await update.message.reply_text(message, reply_markup=get_main_menu())
 
-async def send_status(update: Update, context: CallbackContext, is_running, timeframe, active_trade, get_current_ist_time, get_current_utc_time):
+async def send_status(update: Update, context: CallbackContext, is_running, timeframe, positions, get_current_ist_time, get_current_utc_time):
     status_message = f"""
 📡 BOT STATUS UPDATE 📡
 
 {'✅ Running' if is_running[0] else '❌ Stopped'}
 ⏰ Timeframe: {timeframe[0]}
 ⚖️ Margin Mode: cross
-📊 Active Trade: {active_trade[0] if active_trade[0] else 'None'}
+📊 Active Trades: {', '.join(positions.symbols()) or 'None'} ({len(positions)}/{positions.max_positions})
 📅 Date: {datetime.now().strftime("%Y-%m-%d")}
 🕒 Time: {get_current_ist_time()} IST | {get_current_utc_time()} UTC
 """
@@ -335,27 +347,32 @@ async def send_status(update: Update, context: CallbackContext, is_running, time
     else:
         await update.message.reply_text(status_message, reply_markup=get_main_menu())
 
-async def send_trades(update: Update, context: CallbackContext, trade_history, session_start_balance):
-    total_trades = len(trade_history)
-    winning_trades = sum(1 for trade in trade_history if trade['pl_pct'] > 0)
-    win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
-    avg_win = sum(trade['pl_pct'] for trade in trade_history if trade['pl_pct'] > 0) / winning_trades if winning_trades > 0 else 0
-    avg_loss = sum(trade['pl_pct'] for trade in trade_history if trade['pl_pct'] < 0) / (total_trades - winning_trades) if total_trades - winning_trades > 0 else 0
-    max_drawdown = min([0] + [trade['pl_pct'] for trade in trade_history]) if trade_history else 0
+async def send_trades(update: Update, context: CallbackContext, journal, session_start_balance):
+    # /trades [all | 24h | 7d | YYYY-MM-DD [YYYY-MM-DD]]; the menu button shows all trades
+    try:
+        start, end = parse_range(context.args)
+    except ValueError:
+        await update.message.reply_text("Usage: /trades [all | 24h | 7d | YYYY-MM-DD [YYYY-MM-DD]]", reply_markup=get_main_menu())
+        return
+    stats = journal.stats(start, end)
+    session = journal.stats(journal.session_started_at())
+    period = ' '.join(context.args) if context.args else 'all'
     start_balance = session_start_balance[0]
 
     message = f"""
-📊 Trade Statistics:
+📊 Trade Statistics ({period}):
 
-Total Trades: {total_trades}
-Winning Trades: {winning_trades}
-Win Rate: {win_rate:.1f}%
-Avg Win: {avg_win:.2f}%
-Avg Loss: {avg_loss:.2f}%
-Max Drawdown: {max_drawdown:.2f}%
+Total Trades: {stats['trades']}
+Winning Trades: {stats['wins']}
+Win Rate: {stats['win_rate']:.1f}%
+Avg Win: {stats['avg_win']:.2f}%
+Avg Loss: {stats['avg_loss']:.2f}%
+Net P/L: {stats['net_usdt']:.2f} USDT (fees {stats['fees']:.2f})
+Max Drawdown: {stats['max_drawdown']:.2f} USDT
 
 Current Session:
 Start Balance: {start_balance:.2f} USDT
+Trades: {session['trades']} | Net P/L: {session['net_usdt']:.2f} USDT
 """
     if update.callback_query:
         query = update.callback_query
@@ -420,7 +437,7 @@ async def set_parameter(update: Update, context: CallbackContext, ema_period1, e
                 await update.message.reply_text("Use 'on' or 'off' for use_exitmin")
                 return
         elif param == 'timeframe':
-            valid_timeframes = ['1m', '15m', '30m', '1h']
+            valid_timeframes = BINANCE_TIMEFRAMES
             if value in valid_timeframes:
                 if timeframe[0] != value:  # Only reset if timeframe changes
                     timeframe[0] = value
@@ -452,10 +469,17 @@ async def set_parameter(update: Update, context: CallbackContext, ema_period1, e
     except ValueError:
         await update.message.reply_text("Invalid value. Use appropriate format for each parameter.")
 
+async def send_latency(update: Update, context: CallbackContext, latency):
+    message = latency.report() if latency.enabled else "Latency metrics are disabled (latency_metrics in config)."
+    await update.message.reply_text(message, reply_markup=get_main_menu())
+
 async def send_help(update: Update, context: CallbackContext):
     help_message = """
 Basic Commands:
     /set <parameter> <value> - Changes configuration values
+    /latency - Stage timings from candle close to order (p50/p95/p99)
+    /trades [all | 24h | 7d | YYYY-MM-DD [YYYY-MM-DD]] - Trade statistics for a period
+        (constant time, except max drawdown for a period not starting at the first trade, which reads its trades)
 
 Strategy:
     📈 EMA Crossover (Long-Only): Configurable EMA1, EMA2, EMA3
@@ -468,7 +492,7 @@ Configuration Parameters:
     🛑 sl - Stop-loss %: (2)
     ⏳ exitmin - Max trade duration in minutes (default: 2)
     ✅ use_exitmin - Enable/disable time-based exit (on/off, default: on)
-    ⏰ timeframe - Chart timeframe (1m, 15m, 30m, 1h, default: 1m)
+    ⏰ timeframe - Chart timeframe (any Binance interval, 1m to 1M, default: 1m)
     🔧 leverage - Leverage value (e.g., 2, 10)
 """
     back_markup = InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Back", callback_data='menu')]])
@@ -497,9 +521,7 @@ async def send_signal(message, bot, CHAT_ID, retries=3, delay=5):
     logging.error(f"Failed to send signal after {retries} attempts: {message}")
 
 def load_config():
-    with open('config.json', 'r') as f:
-        return json.load(f)
+    return config_store.load()
 
 def save_config(config):
-    with open('config.json', 'w') as f:
-        json.dump(config, f, indent=4)
\ No newline at end of file
+    config_store.save(config)
\ No newline at end of file
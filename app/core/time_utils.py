@@ -2,6 +2,7 @@
 from datetime import datetime, timedelta, timezone
 import asyncio
 import logging
+import time
 
 def get_current_utc_time():
     return datetime.now(timezone.utc).strftime("%H:%M")
@@ -10,24 +11,120 @@ def get_current_ist_time():
     ist_timezone = timezone(timedelta(hours=5, minutes=30))
     return datetime.now(ist_timezone).strftime("%H:%M")
 
-async def wait_for_next_candle(timeframe):
-    now = datetime.now(timezone.utc)
-    timeframe_minutes = {'1m': 1, '15m': 15, '30m': 30, '1h': 60}
-    minutes = timeframe_minutes.get(timeframe, 1)
-    # Align to the next candle boundary
-    seconds_since_epoch = int(now.timestamp())
-    seconds_to_next_candle = minutes * 60 - (seconds_since_epoch % (minutes * 60))
-    next_candle_time = now + timedelta(seconds=seconds_to_next_candle)
-    wait_time = seconds_to_next_candle + 1  # Add 1-second buffer to ensure candle close
-    logging.info(f"Waiting {wait_time:.2f} seconds until the next {timeframe} candle close at {next_candle_time.strftime('%Y-%m-%d %H:%M:%S+00:00')}")
-    await asyncio.sleep(wait_time)
-
-async def sync_time(exchange):
-    try:
-        server_time = await exchange.fetch_time()
-        local_time = int(datetime.now(timezone.utc).timestamp() * 1000)
-        offset = server_time - local_time
-        exchange.nonce = lambda: int(datetime.now(timezone.utc).timestamp() * 1000) + offset
-        logging.info(f"Time synchronized with Binance server. Offset: {offset}ms")
-    except Exception as e:
-        logging.error(f"Error syncing time with Binance: {e}")
\ No newline at end of file
+BINANCE_TIMEFRAMES = ('1m', '3m', '5m', '15m', '30m', '1h', '2h', '4h', '6h', '8h', '12h', '1d', '3d', '1w', '1M')
+TIMEFRAME_MS = {'m': 60_000, 'h': 3_600_000, 'd': 86_400_000, 'w': 604_800_000}
+WEEK_OFFSET_MS = 4 * 86_400_000  # Weekly candles open on Monday 00:00 UTC; the epoch was a Thursday
+
+def candle_open_time(timeframe, now_ms):
+    """Open time (ms) of the timeframe candle that contains now_ms, on Binance's boundaries."""
+    if timeframe not in BINANCE_TIMEFRAMES:
+        raise ValueError(f"Unsupported timeframe {timeframe}, use one of {', '.join(BINANCE_TIMEFRAMES)}")
+    if timeframe == '1M':
+        now = datetime.fromtimestamp(now_ms / 1000, timezone.utc)
+        return int(datetime(now.year, now.month, 1, tzinfo=timezone.utc).timestamp() * 1000)
+    period = int(timeframe[:-1]) * TIMEFRAME_MS[timeframe[-1]]
+    offset = WEEK_OFFSET_MS if timeframe[-1] == 'w' else 0
+    return int((now_ms - offset) // period * period + offset)
+
+def next_candle_close(timeframe, now_ms):
+    open_ms = candle_open_time(timeframe, now_ms)
+    if timeframe == '1M':
+        opened = datetime.fromtimestamp(open_ms / 1000, timezone.utc)
+        year, month = divmod(opened.month, 12)
+        return int(datetime(opened.year + year, month + 1, 1, tzinfo=timezone.utc).timestamp() * 1000)
+    return open_ms + int(timeframe[:-1]) * TIMEFRAME_MS[timeframe[-1]]
+
+def candle_duration_ms(timeframe, open_ms):
+    # Length of the candle that opens at open_ms; 1M candles follow calendar months
+    return next_candle_close(timeframe, open_ms) - candle_open_time(timeframe, open_ms)
+
+class ServerClock:
+    """
+    Binance server time as local time plus an offset. sync() measures the
+    offset from the fetch_time sample with the shortest round trip; across
+    syncs the rate at which it changes (local clock drift) is tracked too, so
+    now_ms() stays corrected between refreshes. run() re-syncs in the
+    background. Also installs the corrected clock as exchange.nonce.
+    """
+
+    MAX_DRIFT = 0.5  # ms per second; anything larger is a clock step, not drift
+
+    def __init__(self, exchange, refresh_interval=300, samples=3):
+        self.exchange = exchange
+        self.refresh_interval = refresh_interval
+        self.samples = samples
+        self.offset_ms = 0.0
+        self.drift = 0.0
+        self.rtt_ms = None
+        self.synced_at = None  # monotonic time of the last sync
+
+    def offset(self):
+        if self.synced_at is None:
+            return 0.0
+        return self.offset_ms + self.drift * (time.monotonic() - self.synced_at)
+
+    def now_ms(self):
+        return time.time() * 1000 + self.offset()
+
+    async def sync(self):
+        try:
+            best = None
+            for _ in range(self.samples):
+                sent = time.time() * 1000
+                server_time = await self.exchange.fetch_time()
+                received = time.time() * 1000
+                if best is None or received - sent < best[0]:
+                    best = (received - sent, server_time - (sent + received) / 2)
+            rtt, offset = best
+            synced_at = time.monotonic()
+            if self.synced_at is not None and synced_at - self.synced_at >= 60:
+                measured = (offset - self.offset()) / (synced_at - self.synced_at) + self.drift
+                self.drift = max(-self.MAX_DRIFT, min(self.MAX_DRIFT, (self.drift + measured) / 2))
+            self.offset_ms, self.rtt_ms, self.synced_at = offset, rtt, synced_at
+            self.exchange.nonce = lambda: int(self.now_ms())
+            logging.info(f"Time synchronized with Binance server. Offset: {offset:.0f}ms (rtt {rtt:.0f}ms, drift {self.drift * 1000:.1f}ms/1000s)")
+            return offset
+        except Exception as e:
+            logging.error(f"Error syncing time with Binance: {e}")
+            return None
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.sync()
+
+    async def sleep_until(self, server_ms):
+        # Re-checked in steps so an offset refreshed mid-wait is picked up
+        while True:
+            remaining = (server_ms - self.now_ms()) / 1000
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(remaining, 30))
+
+async def candle_opened(exchange, symbol, timeframe, close_ms):
+    # A candle opening at close_ms means Binance has closed the previous one
+    ohlcv = await exchange.fetch_ohlcv(symbol, timeframe, limit=1)
+    return bool(ohlcv) and ohlcv[-1][0] >= close_ms
+
+async def wait_for_next_candle(timeframe, clock, is_closed=None, poll_interval=0.1, max_poll=3):
+    """
+    Sleep until the next timeframe close on the server clock, then, with an
+    is_closed(close_ms) coroutine, poll it until the closed candle is
+    available (at most max_poll seconds). Returns the close time in ms.
+    """
+    close_ms = next_candle_close(timeframe, clock.now_ms())
+    wait_time = (close_ms - clock.now_ms()) / 1000
+    logging.info(f"Waiting {wait_time:.2f} seconds until the next {timeframe} candle close at {datetime.fromtimestamp(close_ms / 1000, timezone.utc).strftime('%Y-%m-%d %H:%M:%S+00:00')}")
+    await clock.sleep_until(close_ms)
+    if is_closed is not None:
+        deadline = time.monotonic() + max_poll
+        while time.monotonic() < deadline:
+            try:
+                if await is_closed(close_ms):
+                    break
+            except Exception as e:
+                logging.warning(f"Error checking for the {timeframe} candle close: {e}")
+            await asyncio.sleep(poll_interval)
+        else:
+            logging.warning(f"{timeframe} candle closing at {close_ms} not seen after {max_poll}s, scanning anyway")
+    return close_ms
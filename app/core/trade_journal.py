@@ -0,0 +1,227 @@
+# trade_journal.py
+import logging
+import os
+import re
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fills (
+    id INTEGER PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    side TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    order_id TEXT,
+    amount REAL NOT NULL,
+    price REAL NOT NULL,
+    fee REAL NOT NULL DEFAULT 0,
+    fee_currency TEXT,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fills_ts ON fills (ts);
+CREATE INDEX IF NOT EXISTS fills_symbol_ts ON fills (symbol, ts);
+CREATE INDEX IF NOT EXISTS fills_order_id ON fills (order_id);
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    side TEXT NOT NULL,
+    amount REAL NOT NULL,
+    entry_price REAL NOT NULL,
+    exit_price REAL NOT NULL,
+    pl_pct REAL NOT NULL,
+    pl_usdt REAL NOT NULL,
+    fees REAL NOT NULL,
+    reason TEXT,
+    opened_at REAL NOT NULL,
+    closed_at REAL NOT NULL,
+    n INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    win_pct REAL NOT NULL,
+    loss_pct REAL NOT NULL,
+    net_usdt REAL NOT NULL,
+    fees_total REAL NOT NULL,
+    peak_usdt REAL NOT NULL,
+    max_drawdown REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trades_closed_at ON trades (closed_at);
+CREATE INDEX IF NOT EXISTS trades_symbol_closed_at ON trades (symbol, closed_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+# Running totals stored on every trade row, through that trade
+TOTALS = ('n', 'wins', 'win_pct', 'loss_pct', 'net_usdt', 'fees_total', 'peak_usdt', 'max_drawdown')
+EMPTY_TOTALS = dict.fromkeys(TOTALS, 0)
+RANGE_UNITS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+def parse_range(args, now=None):
+    """
+    (start, end) epoch seconds from /trades arguments: none or 'all' for all
+    time, a length such as '24h', '7d' or '2w' back from now, or one or two
+    dates (YYYY-MM-DD, end date inclusive). None means unbounded.
+    """
+    now = time.time() if now is None else now
+    if not args or args[0].lower() == 'all':
+        return None, None
+    match = re.fullmatch(r'(\d+)([mhdw])', args[0].lower())
+    if match:
+        return now - int(match.group(1)) * RANGE_UNITS[match.group(2)], None
+    start = time.mktime(time.strptime(args[0], '%Y-%m-%d'))
+    end = time.mktime(time.strptime(args[1], '%Y-%m-%d')) + 86400 if len(args) > 1 else None
+    return start, end
+
+async def with_account_fills(exchange, symbol, order):
+    """
+    The order with its account trades (userTrades) as 'trades'. Binance
+    futures order responses carry no commission, the account trades of the
+    order do. Falls back to the order as it is when they cannot be fetched.
+    """
+    if order.get('trades') or not order.get('id'):
+        return order
+    try:
+        trades = await exchange.fetch_my_trades(symbol, params={'orderId': order['id']})
+    except Exception as e:
+        logging.warning(f"Could not fetch fills of {symbol} order {order['id']}, recording it without fees: {e}")
+        return order
+    trades = [trade for trade in trades if str(trade.get('order')) == str(order['id'])]
+    return dict(order, trades=trades) if trades else order
+
+def fill_rows(order):
+    # (order_id, amount, price, fee, fee_currency, ts) per fill of a ccxt order; one row for the order when it lists no trades
+    ts = (order.get('timestamp') or time.time() * 1000) / 1000
+    fills = order.get('trades') or [order]
+    rows = []
+    for fill in fills:
+        fee = fill.get('fee') or {}
+        amount = float(fill.get('amount') or fill.get('filled') or 0)
+        price = float(fill.get('price') or fill.get('average') or 0)
+        rows.append((order.get('id'), amount, price, float(fee.get('cost') or 0), fee.get('currency'), (fill.get('timestamp') or ts * 1000) / 1000))
+    return rows
+
+class TradeJournal:
+    """
+    Append-only SQLite journal (WAL mode) of every fill and closed trade. Each
+    trade row also stores running totals through that trade (count, wins,
+    summed win/loss %, net P/L, fees, equity peak and max drawdown), so the
+    statistics of any time range are the difference of two rows found by the
+    closed_at index, whatever the number of trades. The one exception is the
+    max drawdown of a range that does not start at the first trade, which
+    scans the net P/L of the trades in the range.
+    """
+
+    def __init__(self, path='data/trades.db'):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")  # WAL stays consistent; only the last commits can be lost on power failure
+        self.db.executescript(SCHEMA)
+        last = self.db.execute("SELECT * FROM trades ORDER BY id DESC LIMIT 1").fetchone()
+        self.last = dict(last) if last else dict(EMPTY_TOTALS, closed_at=0.0)
+
+    def record_fill(self, symbol, side, kind, order):
+        # kind is 'entry' or 'exit'; side 'buy' or 'sell'
+        rows = [(symbol, side, kind, *row) for row in fill_rows(order)]
+        with self.db:
+            self.db.executemany("INSERT INTO fills (symbol, side, kind, order_id, amount, price, fee, fee_currency, ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return rows
+
+    def record_trade(self, symbol, side, amount, entry_price, exit_price, pl_pct, pl_usdt, reason, opened_at, closed_at=None, order_ids=()):
+        """
+        Add a closed trade and its running totals. Fees are those of the fills
+        recorded for order_ids (the entry and exit orders). closed_at never
+        goes back in time, so the index order matches the order the totals
+        build in.
+        """
+        closed_at = max(closed_at or time.time(), self.last['closed_at'])
+        order_ids = [str(order_id) for order_id in order_ids if order_id is not None]
+        fees = self.db.execute(f"SELECT COALESCE(SUM(fee), 0) FROM fills WHERE symbol = ? AND order_id IN ({', '.join('?' * len(order_ids))})", (symbol, *order_ids)).fetchone()[0] if order_ids else 0.0
+        last = self.last
+        net_usdt = last['net_usdt'] + pl_usdt
+        peak_usdt = max(last['peak_usdt'], net_usdt)
+        totals = {
+            'n': last['n'] + 1,
+            'wins': last['wins'] + (pl_pct > 0),
+            'win_pct': last['win_pct'] + max(pl_pct, 0),
+            'loss_pct': last['loss_pct'] + min(pl_pct, 0),
+            'net_usdt': net_usdt,
+            'fees_total': last['fees_total'] + fees,
+            'peak_usdt': peak_usdt,
+            'max_drawdown': max(last['max_drawdown'], peak_usdt - net_usdt),
+        }
+        trade = {
+            'symbol': symbol, 'side': side, 'amount': amount, 'entry_price': entry_price, 'exit_price': exit_price,
+            'pl_pct': pl_pct, 'pl_usdt': pl_usdt, 'fees': fees, 'reason': reason, 'opened_at': opened_at, 'closed_at': closed_at,
+            **totals,
+        }
+        with self.db:
+            cursor = self.db.execute(f"INSERT INTO trades ({', '.join(trade)}) VALUES ({', '.join('?' * len(trade))})", tuple(trade.values()))
+        self.last = dict(trade, id=cursor.lastrowid)
+        return self.last
+
+    def _totals_at(self, ts):
+        # Running totals of the last trade closed before ts
+        if ts is None:
+            return self.last
+        row = self.db.execute("SELECT * FROM trades WHERE closed_at < ? ORDER BY closed_at DESC, id DESC LIMIT 1", (ts,)).fetchone()
+        return dict(row) if row else dict(EMPTY_TOTALS, id=0)
+
+    def _drawdown(self, before, after):
+        # Peak-to-trough of net P/L inside the range; from the start of the journal it is already a running total
+        if not before.get('id'):
+            return after['max_drawdown']
+        peak, drawdown = before['net_usdt'], 0.0
+        for (net_usdt,) in self.db.execute("SELECT net_usdt FROM trades WHERE id > ? AND id <= ? ORDER BY id", (before['id'], after.get('id', 0))):
+            peak = max(peak, net_usdt)
+            drawdown = max(drawdown, peak - net_usdt)
+        return drawdown
+
+    def stats(self, start=None, end=None):
+        """Win rate, average win/loss %, net P/L, fees and max drawdown (USDT) of trades closed in [start, end)."""
+        before = self._totals_at(start) if start is not None else dict(EMPTY_TOTALS, id=0)
+        after = self._totals_at(end)
+        total = {key: after[key] - before[key] for key in ('n', 'wins', 'win_pct', 'loss_pct', 'net_usdt', 'fees_total')}
+        n, wins = total['n'], total['wins']
+        return {
+            'trades': n,
+            'wins': wins,
+            'win_rate': wins / n * 100 if n else 0.0,
+            'avg_win': total['win_pct'] / wins if wins else 0.0,
+            'avg_loss': total['loss_pct'] / (n - wins) if n - wins else 0.0,
+            'net_usdt': total['net_usdt'],
+            'fees': total['fees_total'],
+            'max_drawdown': self._drawdown(before, after) if n else 0.0,
+        }
+
+    def recent(self, limit=10, symbol=None):
+        if symbol is None:
+            rows = self.db.execute("SELECT * FROM trades ORDER BY closed_at DESC, id DESC LIMIT ?", (limit,))
+        else:
+            rows = self.db.execute("SELECT * FROM trades WHERE symbol = ? ORDER BY closed_at DESC, id DESC LIMIT ?", (symbol, limit))
+        return [dict(row) for row in rows]
+
+    def start_session(self, ts=None):
+        ts = time.time() if ts is None else ts
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('session_started_at', ?)", (str(ts),))
+        return ts
+
+    def session_started_at(self):
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'session_started_at'").fetchone()
+        return float(row[0]) if row else None
+
+    def import_history(self, trade_history):
+        # One-off import of the in-memory trade list older state files carried, into an empty journal only
+        if self.last['n']:
+            return
+        for trade in trade_history:
+            closed_at = time.mktime(time.strptime(trade['timestamp'], "%Y-%m-%d %H:%M IST"))
+            self.record_trade(trade['symbol'], 'long', 0.0, trade['entry_price'], trade['exit_price'], trade['pl_pct'], trade['pl_usdt'], trade['reason'], closed_at, closed_at)
+        if trade_history:
+            logging.info(f"Imported {len(trade_history)} trades from the saved trade history into {self.path}")
+
+    def close(self):
+        self.db.close()
@@ -2,24 +2,120 @@
 import ccxt.async_support as ccxt
 import logging
 import asyncio
+import time
 from datetime import datetime, timezone
+from snapshot import find_open_position, normalize_symbol
+from supervisor import run_to_completion
+from latency import NULL_RECORDER
+from rate_limiter import backoff_delay
+from trade_journal import with_account_fills
 
-async def process_trade(symbol, entry_price, exchange, timeframe, ema_period1, ema_period2, ema_period3, take_profit_pct, stop_loss_pct, exit_minutes, use_exitmin, trade_history, active_trade, exit_state, fetch_binance_data, calculate_emas, exitcondition, place_market_sell_order, place_market_buy_order, get_balance, send_signal, get_current_ist_time, get_current_utc_time, LEVERAGE):
-    trade_start_time = datetime.now(timezone.utc)
+EXTERNAL_CLOSE = "Closed externally"
+MISSING_POSITION_POLLS = 3  # polls without the position before it counts as closed outside the bot
+UNFILLED_STATUSES = ('canceled', 'expired', 'rejected')
 
-    while active_trade and active_trade == symbol:
+async def process_trade(symbol, entry_price, exchange, timeframe, ema_period1, ema_period2, ema_period3, take_profit_pct, stop_loss_pct, exit_minutes, use_exitmin, journal, active_trade, exit_state, fetch_binance_data, calculate_emas, exitcondition, place_market_sell_order, place_market_buy_order, get_balance, send_signal, get_current_ist_time, get_current_utc_time, LEVERAGE, market_stream=None, poll_interval=10, use_brackets=False, snapshot=None, started_at=None, latency=NULL_RECORDER, entry_order_id=None):
+    # With a market_stream, prices and candles arrive as events and only positions are polled over REST.
+    # With a snapshot (MarketSnapshot), prices and positions come from the batched per-tick fetch shared by all consumers.
+    # With use_brackets, take-profit and stop-loss live on the exchange and the loop only watches for fills.
+    # Closing orders run to completion even if the monitoring task is cancelled part way through.
+    # Each stage is timed under a trade_* name in latency (a LatencyRecorder).
+    trade_start_time = started_at or datetime.now(timezone.utc)
+    open_position = None
+    tracked_position = None  # last position seen on the exchange
+    missing_polls = 0
+    positions_checked_at = None
+    brackets = None
+    if exit_state[0] is None:
+        exit_state[0] = {'first_ema_crossed': False, 'second_ema_crossed': False, 'stored_low': None}
+
+    async def finish_trade(side, reason, exit_price, actual_entry_price, entry_amount, order):
+        with latency.span("trade_fetch_balance"):
+            usdt_balance = await get_balance('USDT', exchange)
+
+        if side == 'long':
+            profit_loss_pct = ((exit_price - actual_entry_price) / actual_entry_price) * 100 * LEVERAGE
+            profit_loss_usdt = (exit_price - actual_entry_price) * entry_amount * LEVERAGE
+        else:
+            profit_loss_pct = ((actual_entry_price - exit_price) / actual_entry_price) * 100 * LEVERAGE
+            profit_loss_usdt = (actual_entry_price - exit_price) * entry_amount * LEVERAGE
+
+        profit_loss_pct = round(profit_loss_pct, 2)
+        profit_loss_usdt = round(profit_loss_usdt, 2)
+
+        close_message = f"""
+🚨 TRADE CLOSED 🚨  
+📈 Symbol: {symbol} ({side.capitalize()})
+📉 Exit Reason: {reason}  
+💰 Exit Price: {exit_price:.4f}  
+📊 Performance:  
+   ├─ Entry: {actual_entry_price:.4f}  
+   ├─ P/L: {profit_loss_pct:.2f}% ({profit_loss_usdt:.2f} USDT)  
+   └─ Balance: {usdt_balance:.2f} USDT  
+⚙️ Leverage: {LEVERAGE}x  
+📅 Date: {datetime.now().strftime("%Y-%m-%d")}  
+🕒 Time: {get_current_ist_time()} IST | {get_current_utc_time()} UTC  
+        """
+
+        try:
+            if order is not None:
+                journal.record_fill(symbol, 'sell' if side == 'long' else 'buy', 'exit', await with_account_fills(exchange, symbol, order))
+            journal.record_trade(symbol, side, entry_amount, actual_entry_price, exit_price, profit_loss_pct, profit_loss_usdt, reason, trade_start_time.timestamp(), order_ids=(entry_order_id, order and order.get('id')))
+        except Exception as e:
+            logging.error(f"Error recording {symbol} trade in the journal: {e}")
+
+        await send_signal(close_message)
+        return order
+
+    async def close_trade(side, reason, amount, exit_price, actual_entry_price, entry_amount, brackets):
+        if brackets:
+            await cancel_bracket_orders(symbol, brackets, exchange)
+        with latency.span("trade_close_order"):
+            order = await (place_market_sell_order(symbol, amount, exchange) if side == "long" else place_market_buy_order(symbol, amount, exchange))
+        if snapshot is not None:
+            snapshot.invalidate()
+        if not order or order['status'] != 'closed':
+            logging.error(f"Failed to close {side} position for {symbol}")
+            return None
+        logging.info("Closed %s position for %s: %s contracts", side, symbol, amount)
+        return await finish_trade(side, reason, exit_price, actual_entry_price, entry_amount, order)
+
+    while active_trade[0] == symbol:
         try:
-            ticker = await exchange.fetch_ticker(symbol)
-            current_price = ticker['last']
-
-            positions = await exchange.fetch_positions([symbol])
-            open_position = None
-            normalized_symbol = symbol.replace('/', '')
-            for pos in positions:
-                pos_symbol_normalized = pos['symbol'].replace('/', '').replace(':USDT', '')
-                if pos_symbol_normalized == normalized_symbol and float(pos['contracts']) > 0:
-                    open_position = pos
-                    break
+            with latency.span("trade_price"):
+                current_price = market_stream.last_price(symbol) if market_stream else None
+                if current_price is None and snapshot is not None:
+                    current_price = await snapshot.price(symbol)
+                if current_price is None:
+                    ticker = await exchange.fetch_ticker(symbol)
+                    current_price = ticker['last']
+
+            if snapshot is not None or positions_checked_at is None or time.monotonic() - positions_checked_at >= poll_interval:
+                with latency.span("trade_position"):
+                    if snapshot is not None:
+                        open_position = await snapshot.position(symbol)
+                    else:
+                        open_position = find_open_position(await exchange.fetch_positions([symbol]), symbol)
+                positions_checked_at = time.monotonic()
+
+                if open_position is not None:
+                    tracked_position, missing_polls = open_position, 0
+                elif tracked_position is not None:
+                    # The position is gone: a bracket filled, or it was closed outside the bot (manually, by liquidation)
+                    missing_polls += 1
+                    reason, fill = await find_filled_bracket(symbol, brackets, exchange) if brackets else (None, None)
+                    entry = (tracked_position['side'].lower(), float(tracked_position['entryPrice']), float(tracked_position['contracts']))
+                    if fill is not None:
+                        exit_price = float(fill.get('average') or fill.get('price') or current_price)
+                        logging.info(f"{reason} bracket filled for {symbol} at {exit_price}")
+                        return await run_to_completion(finish_trade(entry[0], reason, exit_price, entry[1], entry[2], fill))
+                    if reason == EXTERNAL_CLOSE or missing_polls >= MISSING_POSITION_POLLS:
+                        logging.warning(f"{symbol} position closed outside the bot, finishing the trade at {current_price}")
+                        if brackets:
+                            await run_to_completion(cancel_bracket_orders(symbol, brackets, exchange))
+                        return await run_to_completion(finish_trade(entry[0], EXTERNAL_CLOSE, current_price, entry[1], entry[2], None))
+                    if brackets:
+                        open_position = tracked_position  # Not filled yet according to the exchange, check again next poll
 
             if open_position:
                 actual_entry_price = float(open_position['entryPrice'])
@@ -28,15 +124,27 @@ async def process_trade(symbol, entry_price, exchange, timeframe, ema_period1, e
                 take_profit_price = actual_entry_price * (1 + take_profit_pct / 100) if side == "long" else actual_entry_price * (1 - take_profit_pct / 100)
                 stop_loss_price = actual_entry_price * (1 - stop_loss_pct / 100) if side == "long" else actual_entry_price * (1 + stop_loss_pct / 100)
 
-                df = await fetch_binance_data(symbol, timeframe=timeframe)
+                if use_brackets and brackets is None and side == "long":
+                    brackets = await run_to_completion(place_bracket_orders(symbol, entry_amount, take_profit_price, stop_loss_price, exchange))
+                    if brackets is None:
+                        use_brackets = False  # Fall back to watching TP/SL here
+
+                with latency.span("trade_fetch_candles"):
+                    df = await fetch_binance_data(symbol, timeframe=timeframe)
                 if df.empty:
-                    return None
-                df = calculate_emas(df, ema_period1, ema_period2, ema_period3)
+                    # Keep watching the open position, the next poll may get candles again
+                    logging.warning(f"No candles for {symbol}, retrying exit checks")
+                    await asyncio.sleep(1)
+                    continue
+                with latency.span("trade_calculate_emas"):
+                    df = calculate_emas(df, ema_period1, ema_period2, ema_period3)
 
                 duration_minutes = (datetime.now(timezone.utc) - trade_start_time).total_seconds() / 60
 
                 reason = None
-                if side == "long" and current_price >= take_profit_price - 0.0001:
+                if brackets:
+                    pass  # Take-profit and stop-loss are handled by the exchange
+                elif side == "long" and current_price >= take_profit_price - 0.0001:
                     reason = "Take-profit"
                 elif side == "long" and current_price <= stop_loss_price:
                     reason = "Stop-loss"
@@ -44,120 +152,135 @@ async def process_trade(symbol, entry_price, exchange, timeframe, ema_period1, e
                     reason = "Take-profit"
                 elif side == "short" and current_price >= stop_loss_price:
                     reason = "Stop-loss"
-                elif await exitcondition(df, exit_state):
-                    reason = "EMA Crossover Exit"
-                elif use_exitmin and duration_minutes > exit_minutes:
-                    reason = f"⏳ Time-Based ({exit_minutes} min)"
+                if reason is None:
+                    with latency.span("trade_exitcondition"):
+                        exit_signal = await exitcondition(df, exit_state[0])
+                    if exit_signal:
+                        reason = "EMA Crossover Exit"
+                    elif use_exitmin and duration_minutes > exit_minutes:
+                        reason = f"⏳ Time-Based ({exit_minutes} min)"
 
                 if reason:
                     amount = float(open_position['contracts'])
                     if amount > 0.0001:
-                        order = await (place_market_sell_order(symbol, amount, exchange) if side == "long" else place_market_buy_order(symbol, amount, exchange))
-                        if order and order['status'] == 'closed':
-                            logging.info(f"Closed {side} position for {symbol}: {amount} contracts")
-                        else:
-                            logging.error(f"Failed to close {side} position for {symbol}")
+                        order = await run_to_completion(close_trade(side, reason, amount, current_price, actual_entry_price, entry_amount, brackets))
+                        if order is None:
+                            brackets = None  # Re-place them on the next pass if the position is still open
                             continue
-
-                        usdt_balance = await get_balance('USDT', exchange)
-
-                        if side == 'long':
-                            profit_loss_pct = ((current_price - actual_entry_price) / actual_entry_price) * 100 * LEVERAGE
-                            profit_loss_usdt = (current_price - actual_entry_price) * entry_amount * LEVERAGE
-                        else:
-                            profit_loss_pct = ((actual_entry_price - current_price) / actual_entry_price) * 100 * LEVERAGE
-                            profit_loss_usdt = (actual_entry_price - current_price) * entry_amount * LEVERAGE
-
-                        profit_loss_pct = round(profit_loss_pct, 2)
-                        profit_loss_usdt = round(profit_loss_usdt, 2)
-
-                        close_message = f"""
-🚨 TRADE CLOSED 🚨  
-📈 Symbol: {symbol} ({side.capitalize()})
-📉 Exit Reason: {reason}  
-💰 Exit Price: {current_price:.4f}  
-📊 Performance:  
-   ├─ Entry: {actual_entry_price:.4f}  
-   ├─ P/L: {profit_loss_pct:.2f}% ({profit_loss_usdt:.2f} USDT)  
-   └─ Balance: {usdt_balance:.2f} USDT  
-⚙️ Leverage: {LEVERAGE}x  
-📅 Date: {datetime.now().strftime("%Y-%m-%d")}  
-🕒 Time: {get_current_ist_time()} IST | {get_current_utc_time()} UTC  
-                        """
-
-                        trade_history.append({
-                            "symbol": symbol,
-                            "entry_price": actual_entry_price,
-                            "exit_price": current_price,
-                            "pl_pct": profit_loss_pct,
-                            "pl_usdt": profit_loss_usdt,
-                            "reason": reason,
-                            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M IST")
-                        })
-
-                        if len(trade_history) > 10:
-                            trade_history.pop(0)
-
-                        await send_signal(close_message)
                         return order
-            await asyncio.sleep(10)
+            if market_stream and market_stream.connected:
+                await market_stream.wait_for_price(symbol, timeout=poll_interval)
+            elif snapshot is not None:
+                await snapshot.wait_tick()
+            else:
+                await asyncio.sleep(poll_interval)
         except Exception as e:
             logging.error(f"Error processing trade for {symbol}: {e}")
+            await asyncio.sleep(1)
     return None
 
-async def place_market_buy_order(symbol, amount, exchange):
+async def place_bracket_orders(symbol, amount, take_profit_price, stop_loss_price, exchange):
+    # Reduce-only exits resting on the exchange, triggered by the last price like the client-side checks
+    params = {'reduceOnly': True, 'workingType': 'CONTRACT_PRICE'}
     try:
-        order = await exchange.create_market_buy_order(symbol, amount)
-        logging.info(f"Market buy order placed: {order}")
+        tp_order = await exchange.create_order(symbol, 'TAKE_PROFIT_MARKET', 'sell', amount, None, {**params, 'stopPrice': exchange.price_to_precision(symbol, take_profit_price)})
+        try:
+            sl_order = await exchange.create_order(symbol, 'STOP_MARKET', 'sell', amount, None, {**params, 'stopPrice': exchange.price_to_precision(symbol, stop_loss_price)})
+        except Exception:
+            await exchange.cancel_order(tp_order['id'], symbol)
+            raise
+        logging.info(f"Placed TP {take_profit_price:.4f} / SL {stop_loss_price:.4f} brackets for {symbol}")
+        return {'Take-profit': tp_order['id'], 'Stop-loss': sl_order['id']}
+    except Exception as e:
+        logging.error(f"Error placing bracket orders for {symbol}: {e}")
+        return None
+
+async def find_filled_bracket(symbol, brackets, exchange):
+    # Returns (reason, order) for the bracket that filled and cancels the other one, (None, None) while one may still fill,
+    # or (EXTERNAL_CLOSE, None) once every bracket ended unfilled (e.g. Binance cancels closePosition stops when the position goes)
+    filled = (None, None)
+    pending = 0
+    for reason, order_id in brackets.items():
+        order = await exchange.fetch_order(order_id, symbol)
+        if order['status'] == 'closed' and filled[1] is None:
+            filled = (reason, order)
+        elif order['status'] not in UNFILLED_STATUSES:
+            pending += 1
+    if filled[1] is not None:
+        await cancel_bracket_orders(symbol, {reason: order_id for reason, order_id in brackets.items() if reason != filled[0]}, exchange)
+        return filled
+    return filled if pending else (EXTERNAL_CLOSE, None)
+
+async def cancel_bracket_orders(symbol, brackets, exchange):
+    for reason, order_id in brackets.items():
+        try:
+            await exchange.cancel_order(order_id, symbol)
+        except ccxt.OrderNotFound:
+            pass
+        except Exception as e:
+            logging.error(f"Error cancelling {reason} bracket for {symbol}: {e}")
+
+async def send_market_order(exchange, rules, side, amount, reduce_only=False):
+    # Straight to POST /fapi/v1/order from the pre-built template; amount is floored to the lot step here
+    request = dict(rules.templates[side])
+    request['quantity'] = rules.format_amount(amount)
+    if reduce_only:
+        request['reduceOnly'] = 'true'
+    response = await exchange.fapiPrivatePostOrder(request)
+    return exchange.parse_order(response, rules.market)
+
+async def place_market_buy_order(symbol, amount, exchange, rules=None):
+    try:
+        if rules is not None:
+            order = await send_market_order(exchange, rules, 'BUY', amount)
+        else:
+            order = await exchange.create_market_buy_order(symbol, amount)
+        logging.info("Market buy order placed for %s: id %s, %s filled at %s", symbol, order.get('id'), order.get('filled'), order.get('average'))
         return order
     except Exception as e:
         logging.error(f"Error placing market buy order for {symbol}: {e}")
         return None
 
-async def place_market_sell_order(symbol, amount, exchange):
+async def place_market_sell_order(symbol, amount, exchange, snapshot=None, rules=None):
     try:
-        positions = await exchange.fetch_positions([symbol])
-        position_exists = False
-        
-        for pos in positions:
-            if pos['symbol'] == symbol and float(pos['contracts']) != 0:
-                position_exists = True
-                break
-        
-        if position_exists:
-            for pos in positions:
-                if pos['symbol'] == symbol and float(pos['contracts']) != 0:
-                    await close_position(symbol, pos, exchange)
-            await exchange.set_margin_mode('cross', symbol)
-            leverage_response = await exchange.set_leverage(LEVERAGE, symbol)
-            logging.info(f"Set cross mode and leverage {LEVERAGE}x for {symbol}: {leverage_response}")
+        # Sells only close the open long: capped to its size and reduce-only, so a stale or repeated close cannot open a short
+        if snapshot is not None:
+            position = await snapshot.position(symbol)
         else:
-            await exchange.set_margin_mode('cross', symbol)
-            leverage_response = await exchange.set_leverage(LEVERAGE, symbol)
-            logging.info(f"Margin mode set to cross and leverage set to {LEVERAGE}x for {symbol}: {leverage_response}")
+            position = find_open_position(await exchange.fetch_positions([symbol]), symbol)
+        if position is None or position['side'] != 'long':
+            logging.warning(f"No open long position for {symbol}, skipping sell")
+            return None
+        amount = min(amount, float(position['contracts']))
 
-        max_retries = 3
-        retry_delay = 1  # seconds
-        for attempt in range(max_retries):
-            try:
-                order = await exchange.create_market_sell_order(symbol, amount)
-                logging.info(f"Market sell order placed: {order}")
-                return order
-            except ccxt.BaseError as e:
-                if str(e).find('-4131') != -1 and attempt < max_retries - 1:
-                    logging.warning(f"PERCENT_PRICE filter error for {symbol} (attempt {attempt + 1}/{max_retries}). Retrying in {retry_delay} seconds...")
-                    await asyncio.sleep(retry_delay)
-                    continue
-                else:
-                    raise e
-        # Fallback to limit sell order after retries fail
+        try:
+            if rules is not None:
+                order = await send_market_order(exchange, rules, 'SELL', amount, reduce_only=True)
+            else:
+                order = await exchange.create_market_sell_order(symbol, amount, {'reduceOnly': True})
+            if snapshot is not None:
+                snapshot.invalidate()
+            logging.info("Market sell order placed for %s: id %s, %s filled at %s", symbol, order.get('id'), order.get('filled'), order.get('average'))
+            return order
+        except ccxt.BaseError as e:
+            if str(e).find('-4131') == -1:
+                raise e
+            # The book is too thin for a market order inside the PERCENT_PRICE band; resending it rarely helps
+            logging.warning(f"PERCENT_PRICE filter rejected the market sell for {symbol}, closing with a limit order")
         try:
             order_book = await exchange.fetch_order_book(symbol)
             best_bid = order_book['bids'][0][0] if order_book['bids'] else None
             if best_bid:
                 limit_price = best_bid * 0.999
-                order = await exchange.create_limit_sell_order(symbol, amount, limit_price)
-                logging.info(f"Limit sell order placed for {symbol} at {limit_price}: {order}")
+                if rules is not None:
+                    # The band is around the last/mark price, not the bid of the thin book that caused the rejection
+                    reference = await snapshot.price(symbol) if snapshot is not None else (await exchange.fetch_ticker(symbol))['last']
+                    reference = reference or best_bid
+                    limit_price = float(rules.format_price(rules.band_price(limit_price, reference), 'SELL'))
+                order = await exchange.create_limit_sell_order(symbol, amount, limit_price, {'reduceOnly': True})
+                if snapshot is not None:
+                    snapshot.invalidate()
+                logging.info("Limit sell order placed for %s at %s: id %s", symbol, limit_price, order.get('id'))
                 return order
             else:
                 logging.error(f"No bid price available in order book for {symbol}")
@@ -169,7 +292,7 @@ async def place_market_sell_order(symbol, amount, exchange):
         logging.error(f"Error placing market sell order for {symbol}: {e}")
         return None
 
-async def get_balance(symbol, exchange, retries=5, delay=5):
+async def get_balance(symbol, exchange, retries=5, delay=1):
     for attempt in range(retries):
         try:
             balance = await exchange.fetch_balance()
@@ -180,10 +303,75 @@ async def get_balance(symbol, exchange, retries=5, delay=5):
         except Exception as e:
             logging.error(f"Error fetching balance for {symbol} (attempt {attempt + 1}/{retries}): {e}")
             if attempt < retries - 1:
-                await asyncio.sleep(delay)
+                await asyncio.sleep(backoff_delay(attempt, delay))
             else:
                 return 0.0
 
+class BalanceTracker:
+    """
+    Latest balance for one currency, refreshed in the background so order sizing
+    reads it without a round trip. A refresh is forced when the cached value is
+    older than max_age seconds, or when it was requested before sent_after (e.g.
+    before the last position opened, so it still counts that margin as free).
+    """
+
+    def __init__(self, exchange, currency='USDT', refresh_interval=30, max_age=60):
+        self.exchange = exchange
+        self.currency = currency
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.free = None
+        self.total = None
+        self.updated_at = None
+        self.sent_at = None  # monotonic time the request behind the cached value was sent
+        self._refreshing = None  # (future, sent_at) of the fetch in flight
+
+    def age(self):
+        return time.monotonic() - self.updated_at if self.updated_at is not None else float('inf')
+
+    async def refresh(self, sent_after=None):
+        # Concurrent callers share one fetch_balance round trip, unless it was sent before sent_after
+        pending = self._refreshing
+        if pending is None or (sent_after is not None and pending[1] < sent_after):
+            pending = self._refreshing = (asyncio.ensure_future(self.exchange.fetch_balance()), time.monotonic())
+        try:
+            balance = await asyncio.shield(pending[0])
+        finally:
+            if self._refreshing is pending:
+                self._refreshing = None
+        # A slower, older response must not overwrite a newer one
+        if self.sent_at is None or pending[1] >= self.sent_at:
+            self.free = balance['free'].get(self.currency, 0.0)
+            self.total = balance['total'].get(self.currency, 0.0)
+            self.updated_at = time.monotonic()
+            self.sent_at = pending[1]
+        return self.free
+
+    def schedule_refresh(self):
+        async def refresh_quietly():
+            try:
+                await self.refresh()
+            except Exception as e:
+                logging.error(f"Error refreshing {self.currency} balance: {e}")
+        return asyncio.create_task(refresh_quietly())
+
+    async def get_free(self, max_age=None, sent_after=None):
+        if self.age() > (self.max_age if max_age is None else max_age):
+            logging.info(f"Cached {self.currency} balance is {self.age():.0f}s old, refreshing before sizing")
+            return await self.refresh(sent_after)
+        if sent_after is not None and self.sent_at < sent_after:
+            return await self.refresh(sent_after)
+        return self.free
+
+    async def run(self, active=lambda: True):
+        while True:
+            if active():
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    logging.error(f"Error refreshing {self.currency} balance: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
 async def close_position(symbol, position, exchange, send_signal):
     try:
         amount = abs(float(position['contracts']))
@@ -196,16 +384,43 @@ async def close_position(symbol, position, exchange, send_signal):
         logging.error(f"Error closing position for {symbol}: {e}")
         return None
 
-async def clear_mismatched_positions(exchange, get_selected_coins, LEVERAGE, send_signal):
+async def ensure_account_settings(symbol, exchange, LEVERAGE, account_settings):
+    # account_settings maps symbol -> leverage already applied with cross margin
+    if account_settings.get(symbol) == LEVERAGE:
+        return
+    try:
+        await exchange.set_margin_mode('cross', symbol)
+    except ccxt.BaseError as e:
+        if '-4046' not in str(e):  # "No need to change margin type"
+            raise
+    await exchange.set_leverage(LEVERAGE, symbol)
+    account_settings[symbol] = LEVERAGE
+    logging.info("Set cross mode and leverage %sx for %s", LEVERAGE, symbol)
+
+async def warm_account_settings(exchange, symbols, LEVERAGE, account_settings):
+    async def warm(symbol):
+        try:
+            await ensure_account_settings(symbol, exchange, LEVERAGE, account_settings)
+        except Exception as e:
+            logging.error(f"Error setting cross mode and leverage for {symbol}: {e}")
+    await asyncio.gather(*(warm(symbol) for symbol in symbols))
+
+async def clear_mismatched_positions(exchange, get_selected_coins, LEVERAGE, send_signal, account_settings, keep=()):
+    # Positions whose symbol is in keep (e.g. trades restored from a snapshot) are left open and returned
+    kept = []
     try:
         selected_coins = get_selected_coins()
-        positions = await exchange.fetch_positions(selected_coins)
+        symbols = selected_coins + [symbol for symbol in keep if symbol not in selected_coins]
+        keep = {normalize_symbol(symbol) for symbol in keep}
+        positions = await exchange.fetch_positions(symbols)
         for position in positions:
             symbol = position['symbol']
             if float(position['contracts']) != 0:
+                if normalize_symbol(symbol) in keep and position['side'] == 'long':
+                    kept.append(position)
+                    continue
                 await close_position(symbol, position, exchange, send_signal)
-                await exchange.set_margin_mode('cross', symbol)
-                leverage_response = await exchange.set_leverage(LEVERAGE, symbol)
-                logging.info(f"Set cross mode and leverage {LEVERAGE}x for {symbol}: {leverage_response}")
+        await warm_account_settings(exchange, selected_coins, LEVERAGE, account_settings)
     except Exception as e:
-        logging.error(f"Error clearing mismatched positions: {e}")
\ No newline at end of file
+        logging.error(f"Error clearing mismatched positions: {e}")
+    return kept
\ No newline at end of file
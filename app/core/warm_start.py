@@ -0,0 +1,66 @@
+# warm_start.py
+import asyncio
+import logging
+import os
+import pickle
+import tempfile
+import time
+from indicators import EmaState
+
+STATE_VERSION = 1
+
+def dump_ema_states(indicator_states):
+    return {key: (state.timestamps.copy(), state.values.copy()) for key, state in indicator_states.items() if len(state.values)}
+
+def load_ema_states(saved):
+    # saved maps (symbol, timeframe, period) -> (timestamps, values)
+    indicator_states = {}
+    for key, (timestamps, values) in saved.items():
+        state = EmaState(key[2])
+        state.grow(len(values))
+        state.load(timestamps, values)
+        indicator_states[key] = state
+    return indicator_states
+
+def save_state(path, state):
+    """
+    Pickle the state dict (plain containers and numpy arrays) to a temp file
+    and rename it over path, so a crash mid-write keeps the previous snapshot.
+    """
+    started = time.perf_counter()
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.state-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump({'version': STATE_VERSION, 'saved_at': time.time(), **state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    logging.debug(f"Saved state to {path} in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+def load_state(path):
+    if not os.path.exists(path):
+        return None
+    started = time.perf_counter()
+    try:
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+    except Exception as e:
+        logging.error(f"Error loading state from {path}: {e}")
+        return None
+    if state.get('version') != STATE_VERSION:
+        logging.warning(f"Ignoring state in {path}: version {state.get('version')}, expected {STATE_VERSION}")
+        return None
+    logging.info(f"Loaded state from {path} saved {time.time() - state['saved_at']:.0f}s ago in {(time.perf_counter() - started) * 1000:.1f}ms")
+    return state
+
+async def save_periodically(path, collect, interval=60):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            save_state(path, collect())
+        except Exception as e:
+            logging.error(f"Error saving state to {path}: {e}")
@@ -1,22 +1,34 @@
 # main.py
 import asyncio
 import platform
-import ccxt.async_support as ccxt
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters
-import json
 import logging
-from strategy import check_strategy, exitcondition
-from trading import process_trade, place_market_buy_order, place_market_sell_order, get_balance, close_position, clear_mismatched_positions
-from indicators import calculate_emas, fetch_binance_data
-from telegram_ui import handle_message, handle_callback, start_bot, stop_bot, send_balance, send_status, send_trades, show_config, set_parameter, send_help, send_signal, load_config, save_config, get_main_menu
-from time_utils import get_current_ist_time, get_current_utc_time, wait_for_next_candle, sync_time
+from datetime import datetime, timezone
+from strategy import exitcondition
+from trading import process_trade, place_market_buy_order, place_market_sell_order, get_balance, close_position, clear_mismatched_positions, warm_account_settings, BalanceTracker
+from indicators import update_emas
+from telegram_ui import handle_message, handle_callback, start_bot, stop_bot, send_balance, send_status, send_trades, send_latency, show_config, set_parameter, send_help, load_config, save_config, get_main_menu, config_store
+from time_utils import get_current_ist_time, get_current_utc_time, wait_for_next_candle, candle_opened, candle_duration_ms, next_candle_close, ServerClock
+from market_stream import MarketStream
+from positions import PositionManager
+from notifier import NotificationQueue
+from snapshot import MarketSnapshot, normalize_symbol
+from candle_store import CandleStore
+from warm_start import dump_ema_states, load_ema_states, save_state, load_state, save_periodically
+from supervisor import TaskSupervisor
+from exchange_manager import ExchangeManager
+from latency import LatencyRecorder
+from scanner import Scanner
+from market_rules import index_markets
+from trade_journal import TradeJournal
 from logger import setup_logging
 
 if platform.system() == "Windows":
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
 # Setup logging
-setup_logging()
+log_params = load_config().get("parameters", {})
+setup_logging(log_params.get("log_file", "logs/trading-bot-logs.txt"), log_params.get("log_level", "INFO"), log_params.get("log_max_mb", 10), log_params.get("log_backups", 10), log_params.get("log_rotate_hours", 24), json_format=log_params.get("log_json", True))
 
 # Configuration
 TELEGRAM_TOKEN = "YOUR_TELEGRAM_TOKEN"
@@ -25,8 +37,7 @@ LEVERAGE = [2]  # Using list to allow modification in callbacks
 
 def load_binance_config():
     try:
-        with open('config.json', 'r') as f:
-            config = json.load(f)
+        config = load_config()
         binance_config = config.get('binance', {})
         if not binance_config.get('api_key') or not binance_config.get('api_secret'):
             raise ValueError("Missing api_key or api_secret in config.json")
@@ -37,26 +48,28 @@ def load_binance_config():
 
 binance_config = load_binance_config()
 
-exchange = ccxt.binance({
-    'apiKey': binance_config['api_key'],
-    'secret': binance_config['api_secret'],
-    'enableRateLimit': True,
-    'options': {'defaultType': 'future'}
-})
-exchange.set_sandbox_mode(False)
+exchange_manager = ExchangeManager(weight_limit=load_config().get("parameters", {}).get("weight_limit", 2400))
+exchange = exchange_manager.add_account('default', binance_config['api_key'], binance_config['api_secret'])
+# Extra accounts share the connection pool and weight budget; trading itself only uses 'default'
+try:
+    exchange_manager.add_accounts(load_config().get("accounts", {}))
+except Exception as e:
+    logging.error(f"Error adding accounts from config: {e}")
+clock = ServerClock(exchange)
 
 application = Application.builder().token(TELEGRAM_TOKEN).build()
 bot = application.bot
 
 # Global variables
-checked_symbols_state = {}
+market_stream = None
 is_running = [False]
-active_trade = [None]
-exit_state = [None]
 valid_symbols = set()
+market_rules = {}  # normalized symbol -> MarketRules, from load_markets
 use_exitmin = [True]
-trade_history = []
 session_start_balance = [0.0]
+restored_trades = {}  # symbol -> trade from the warm-start snapshot, until its position is resumed
+shutting_down = [False]
+resume_on_boot = [False]
 
 config = load_config()
 params = config.get("parameters", {})
@@ -68,11 +81,36 @@ stop_loss_pct = [params.get("sl", 2)]
 exit_minutes = [params.get("exitmin", 2)]
 use_exitmin = [params.get("use_exitmin", True)]
 timeframe = [params.get("timeframe", "1m")]
+scan_concurrency = [params.get("scan_concurrency", 10)]
+use_websocket = [params.get("use_websocket", True)]
+use_brackets = [params.get("use_brackets", False)]
+balance_tracker = BalanceTracker(exchange, 'USDT', params.get("balance_refresh", 30), params.get("balance_max_age", 60))
+supervisor = TaskSupervisor()
+positions = PositionManager(params.get("max_positions", 1), params.get("max_total_exposure", 0))
+snapshot = MarketSnapshot(exchange, lambda: positions.symbols())
+state_file = [params.get("state_file", "bot_state.pkl")]
+state_interval = [params.get("state_interval", 60)]
+candle_store = [CandleStore(params.get("candle_store", "data/ohlcv")) if params.get("candle_store", "data/ohlcv") else None]
+journal = TradeJournal(params.get("trade_journal", "data/trades.db"))
+latency = LatencyRecorder(params.get("latency_metrics", True))
+notifier = NotificationQueue(bot, CHAT_ID, latency=latency)
+scanner = Scanner(exchange, positions, balance_tracker, clock, journal, market_rules, valid_symbols, timeframe, (ema_period1, ema_period2, ema_period3), LEVERAGE, take_profit_pct, stop_loss_pct,
+                  scan_concurrency, is_running, candle_store, notifier.post, lambda trade: (start_monitor(trade), save_state_now()), latency)
+checked_symbols_state = scanner.checked_symbols_state
+indicator_states = scanner.indicator_states  # (symbol, timeframe, period) -> EmaState
+candle_cache = scanner.candle_cache  # (symbol, timeframe) -> CandleCache
+account_settings = scanner.account_settings  # symbol -> leverage set with cross margin
+metrics_port = [params.get("metrics_port", 0)]
+clock.refresh_interval = params.get("time_sync_interval", 300)
+exchange_manager.pool_size = params.get("http_pool_size", 100)
+exchange_manager.keepalive = params.get("http_keepalive", 60)
 margin_mode = "cross"
 
-def init_from_config():
-    config = load_config()
+def apply_config(config):
+    # Called by config_store whenever config.json is saved or changes on disk
     params = config.get("parameters", {})
+    if timeframe[0] != params.get("timeframe", "1m"):
+        checked_symbols_state.clear()
     ema_period1[0] = params.get("ema1", 21)
     ema_period2[0] = params.get("ema2", 60)
     ema_period3[0] = params.get("ema3", 365)
@@ -81,27 +119,100 @@ def init_from_config():
     exit_minutes[0] = params.get("exitmin", 2)
     use_exitmin[0] = params.get("use_exitmin", True)
     timeframe[0] = params.get("timeframe", "1m")
+    scan_concurrency[0] = params.get("scan_concurrency", 10)
+    use_websocket[0] = params.get("use_websocket", True)
+    use_brackets[0] = params.get("use_brackets", False)
+    balance_tracker.refresh_interval = params.get("balance_refresh", 30)
+    balance_tracker.max_age = params.get("balance_max_age", 60)
+    positions.max_positions = params.get("max_positions", 1)
+    positions.max_total_exposure = params.get("max_total_exposure", 0)
+    state_file[0] = params.get("state_file", "bot_state.pkl")
+    state_interval[0] = params.get("state_interval", 60)
+    store_root = params.get("candle_store", "data/ohlcv")
+    if (candle_store[0].root if candle_store[0] else "") != store_root:
+        candle_store[0] = CandleStore(store_root) if store_root else None
+    latency.enabled = params.get("latency_metrics", True)
+    metrics_port[0] = params.get("metrics_port", 0)
+    clock.refresh_interval = params.get("time_sync_interval", 300)
+
+def init_from_config():
+    apply_config(load_config())
+
+config_store.subscribe(apply_config)
 
 def get_selected_coins():
-    config = load_config()
-    return config.get("selected_coins", [])
+    return list(config_store.get("selected_coins", []))
 
-def has_active_trade():
-    return active_trade[0] is not None
+def on_leverage_change(leverage):
+    account_settings.clear()
+    if is_running[0]:
+        asyncio.create_task(warm_account_settings(exchange, get_selected_coins(), leverage, account_settings))
 
 async def reset_global_states():
     checked_symbols_state.clear()
-    active_trade[0] = None
+    indicator_states.clear()
+    positions.clear()
+    restored_trades.clear()
     is_running[0] = False
-    exit_state[0] = None
+    save_state_now()
     logging.info("Global states have been reset.")
 
+def collect_state():
+    open_trades = [
+        {'symbol': trade['symbol'], 'entry_price': trade['entry_price'], 'notional': trade['notional'], 'opened_at': trade['opened_at'], 'order_id': trade['order_id'], 'exit_state': trade['exit_state'][0]}
+        for trade in positions.open_trades.values()
+    ]
+    return {
+        'is_running': is_running[0],
+        'session_start_balance': session_start_balance[0],
+        'checked_symbols_state': {symbol: dict(state) for symbol, state in checked_symbols_state.items()},
+        'ema_states': dump_ema_states(indicator_states),
+        'open_trades': open_trades + list(restored_trades.values()),
+    }
+
+def save_state_now():
+    # Skipped during shutdown: the snapshot taken before the tasks were cancelled still lists the open trades
+    if state_file[0] and not shutting_down[0]:
+        try:
+            save_state(state_file[0], collect_state())
+        except Exception as e:
+            logging.error(f"Error saving state to {state_file[0]}: {e}")
+
+def restore_state():
+    # Returns True when the bot was running when the snapshot was taken
+    state = load_state(state_file[0]) if state_file[0] else None
+    if state is None:
+        return False
+    checked_symbols_state.update(state['checked_symbols_state'])
+    indicator_states.update(load_ema_states(state['ema_states']))
+    journal.import_history(state.get('trade_history', []))
+    session_start_balance[0] = state['session_start_balance']
+    restored_trades.update({trade['symbol']: trade for trade in state['open_trades']})
+    logging.info(f"Restored {len(checked_symbols_state)} signal states, {len(indicator_states)} EMA states and {len(restored_trades)} open trades")
+    return state['is_running']
+
+async def resume_positions():
+    # Replaces a plain clear_mismatched_positions: restored trades that are still open are monitored again, anything else is closed
+    kept = await clear_mismatched_positions(exchange, get_selected_coins, LEVERAGE[0], notifier.send, account_settings, keep=list(restored_trades))
+    saved_trades = {normalize_symbol(symbol): saved for symbol, saved in restored_trades.items()}
+    for position in kept:
+        saved = saved_trades[normalize_symbol(position['symbol'])]
+        trade = positions.open(saved['symbol'], saved['entry_price'], saved['notional'], opened_at=saved['opened_at'], order_id=saved.get('order_id'))
+        trade['exit_state'][0] = saved['exit_state']
+        start_monitor(trade)
+        logging.info(f"Resumed {saved['symbol']} opened at {datetime.fromtimestamp(saved['opened_at'])}, {float(position['contracts'])} contracts")
+        notifier.post(f"♻️ Resumed monitoring {saved['symbol']}: {float(position['contracts'])} contracts, entry {float(position['entryPrice']):.4f}")
+    restored_trades.clear()
+    save_state_now()
+
 async def load_valid_symbols():
-    global valid_symbols
     try:
-        await sync_time(exchange)
+        await clock.sync()
         markets = await exchange.load_markets()
-        valid_symbols = set(markets.keys())
+        valid_symbols.clear()
+        valid_symbols.update(markets.keys())
+        market_rules.clear()
+        market_rules.update(index_markets(markets))
         logging.info(f"Loaded {len(valid_symbols)} valid symbols from Binance")
         selected_coins = [coin for coin in get_selected_coins() if coin in valid_symbols]
         config = load_config()
@@ -110,115 +221,125 @@ async def load_valid_symbols():
         logging.info(f"Updated config with valid coins: {selected_coins}")
     except Exception as e:
         logging.error(f"Error loading valid symbols: {e}")
-        valid_symbols = set(get_selected_coins())
+        valid_symbols.clear()
+        valid_symbols.update(get_selected_coins())
 
-async def process_symbol(symbol):
-    if symbol not in valid_symbols:
-        logging.warning(f"Skipping {symbol}: not available on Binance")
-        return
-    try:
-        if not has_active_trade():
-            df = await fetch_binance_data(symbol, timeframe[0], exchange)
-            if df.empty:
-                return
-            df = calculate_emas(df, ema_period1[0], ema_period2[0], ema_period3[0])
-            order_info = await check_strategy(df, symbol, active_trade[0], checked_symbols_state, is_running[0])
-            if order_info:
-                entry_price = order_info['price']
-                balance = await exchange.fetch_balance()
-                usdt_free = balance['free'].get('USDT', 0.0)
-                margin = usdt_free * 0.99
-                notional_value = margin * LEVERAGE[0]
-                position_size = notional_value / entry_price
-
-                if notional_value < 10:
-                    logging.warning(f"Notional value {notional_value:.2f} USDT for {symbol} below minimum 10 USDT")
-                    position_size = 10 / entry_price
-                    notional_value = 10
-                    margin = notional_value / LEVERAGE[0]
-                
-                if margin > usdt_free:
-                    logging.warning(f"Insufficient margin for {symbol}: Required {margin:.2f} USDT, Available {usdt_free:.2f} USDT")
-                    await send_signal(f"⚠️ Insufficient margin for {symbol}: Required {margin:.2f} USDT, Available {usdt_free:.2f} USDT", bot, CHAT_ID)
-                    return
-                
-                await exchange.set_margin_mode('cross', symbol)
-                leverage_response = await exchange.set_leverage(LEVERAGE[0], symbol)
-                logging.info(f"Set cross mode and leverage {LEVERAGE[0]}x for {symbol}: {leverage_response}")
-
-                position_size_pct = (margin / usdt_free) * 100 if usdt_free > 0 else 0
-                tp_price = entry_price * (1 + take_profit_pct[0] / 100)
-                sl_price = entry_price * (1 - stop_loss_pct[0] / 100)
-                message = f"""
-🔺 LONG ENTRY ALERT 🔺  
-📈 Symbol: {symbol}  
-💰 Entry Price: {entry_price:.2f}  
-📊 Order Details:  
-   ├─ Amount: {position_size:.2f} {symbol.split('/')[0]}  
-   ├─ Notional: {notional_value:.2f} USDT  
-   ├─ Cost (Margin): {margin:.2f} USDT  
-🎯 TP: {tp_price:.3f} | SL: {sl_price:.3f}  
-📊 Position Size: {position_size_pct:.2f}% of Balance
-                """
-                await send_signal(message, bot, CHAT_ID)
-                order = await place_market_buy_order(symbol, position_size, exchange)
-                if order:
-                    active_trade[0] = symbol
-                    logging.info(f"Successfully placed long order for {symbol}: {position_size:.2f} at {entry_price:.2f}")
-                    if 'fills' in order:
-                        for fill in order['fills']:
-                            logging.info(f"Fill: {fill['amount']:.2f} {symbol.split('/')[0]} at {fill['price']:.2f}")
-                    await process_trade(symbol, entry_price, exchange, timeframe[0], ema_period1[0], ema_period2[0], ema_period3[0], take_profit_pct[0], stop_loss_pct[0], exit_minutes[0], use_exitmin[0], trade_history, active_trade, exit_state, fetch_binance_data, calculate_emas, exitcondition, place_market_sell_order, place_market_buy_order, get_balance, send_signal, get_current_ist_time, get_current_utc_time, LEVERAGE[0])
-                else:
-                    logging.error(f"Failed to place long order for {symbol}")
-                    active_trade[0] = None
-    except Exception as e:
-        logging.error(f"Error processing {symbol}: {e}")
+def start_monitor(trade):
+    trade['task'] = supervisor.start(f"trade:{trade['symbol']}", lambda: monitor_trade(trade), on_exit=lambda: release_trade(trade), on_give_up=lambda error: abandon_trade(trade, error))
+
+async def monitor_trade(trade):
+    # Runs as a supervised task so other symbols keep being scanned while this position is open;
+    # a crash restarts monitoring with the same exit_state and trade start time
+    symbol = trade['symbol']
+    await process_trade(symbol, trade['entry_price'], exchange, timeframe[0], ema_period1[0], ema_period2[0], ema_period3[0], take_profit_pct[0], stop_loss_pct[0], exit_minutes[0], use_exitmin[0], journal, trade['active_trade'], trade['exit_state'], scanner.fetch_candles, lambda df, p1, p2, p3: update_emas(df, symbol, timeframe[0], p1, p2, p3, indicator_states), exitcondition, lambda symbol, amount, exchange: place_market_sell_order(symbol, amount, exchange, snapshot, market_rules.get(normalize_symbol(symbol))), lambda symbol, amount, exchange: place_market_buy_order(symbol, amount, exchange, market_rules.get(normalize_symbol(symbol))), get_balance, notifier.send, get_current_ist_time, get_current_utc_time, LEVERAGE[0], market_stream=market_stream, use_brackets=use_brackets[0], snapshot=snapshot, started_at=datetime.fromtimestamp(trade['opened_at'], timezone.utc), latency=latency, entry_order_id=trade['order_id'])
+
+def release_trade(trade):
+    if positions.open_trades.get(trade['symbol']) is trade:
+        positions.close(trade['symbol'])
+    snapshot.release(trade['symbol'])
+    balance_tracker.schedule_refresh()
+    save_state_now()
+
+def abandon_trade(trade, error):
+    # Monitoring gave up but the position is still open on the exchange: keep it counted in positions and in the saved
+    # state (a restart resumes it), and ask for it to be handled by hand
+    trade['task'] = None
+    save_state_now()
+    notifier.post(f"🚨 Stopped monitoring {trade['symbol']} after repeated errors: {error}\nThe position is still open without TP/SL handling, close it manually or restart the bot to resume monitoring.")
+
+async def stop_trade_monitors():
+    # Let in-flight closing orders finish, then free the slots so stop_bot can close what is left
+    await supervisor.cancel(supervisor.running("trade:"))
+    positions.clear()
+    snapshot.invalidate()
+
+async def wait_for_candle(selected_coins):
+    # Woken by the closed kline on the stream, otherwise at the server-time close once a REST poll shows the candle closed
+    if market_stream is not None and market_stream.connected:
+        timeout = (next_candle_close(timeframe[0], clock.now_ms()) - clock.now_ms()) / 1000 + 5
+        closed_open = await market_stream.wait_for_candle_close(timeout=timeout)
+        if closed_open is not None:
+            # Let the first kline of the new candle reach the cache, so the scan reads live symbols without REST
+            await market_stream.wait_for_open(selected_coins, closed_open + candle_duration_ms(timeframe[0], closed_open), 1)
+    else:
+        probe = selected_coins[0] if selected_coins else None
+        await wait_for_next_candle(timeframe[0], clock, is_closed=(lambda close_ms: candle_opened(exchange, probe, timeframe[0], close_ms)) if probe else None)
+    latency.record("candle_close_to_scan", (clock.now_ms() - scanner.last_candle_close()) / 1000)
 
 async def main_loop():
-    try:
-        await load_valid_symbols()
-        selected_coins = [coin for coin in get_selected_coins() if coin in valid_symbols]
-        logging.info(f"Processing symbols: {selected_coins}")
-        while True:
+    # Only waits for candles and scans; trade monitoring runs in supervised tasks so it never delays the schedule
+    global market_stream
+    await load_valid_symbols()
+    selected_coins = [coin for coin in get_selected_coins() if coin in valid_symbols]
+    logging.info(f"Processing symbols: {selected_coins}")
+    if resume_on_boot[0]:
+        resume_on_boot[0] = False
+        is_running[0] = True
+        await resume_positions()
+        notifier.post(f"♻️ Bot resumed after restart with {len(positions)} open trades")
+    if state_file[0]:
+        supervisor.start("state", lambda: save_periodically(state_file[0], collect_state, state_interval[0]))
+    supervisor.start("balance", lambda: balance_tracker.run(active=lambda: is_running[0]))
+    supervisor.start("clock", clock.run)
+    supervisor.start("connections", exchange_manager.run)
+    if metrics_port[0]:
+        supervisor.start("metrics", lambda: latency.serve(port=metrics_port[0]))
+    if use_websocket[0] and market_stream is None:
+        market_stream = MarketStream(selected_coins, timeframe[0], candle_cache=candle_cache)
+        scanner.market_stream = market_stream
+    if market_stream is not None:
+        supervisor.start("market_stream", market_stream.run)
+    while True:
+        try:
             if is_running[0]:
-                await wait_for_next_candle(timeframe[0])
-                for symbol in selected_coins:
-                    if has_active_trade():
-                        logging.info(f"Active trade ({active_trade[0]}) in progress, skipping other symbols")
-                        break
-                    await process_symbol(symbol)
-                await asyncio.sleep(1)
+                if market_stream is not None and market_stream.timeframe != timeframe[0]:
+                    await market_stream.resubscribe(selected_coins, timeframe[0])
+                await wait_for_candle(selected_coins)
+                if positions.is_full():
+                    logging.info(f"All {positions.max_positions} position slots in use ({', '.join(positions.symbols())}), skipping scan")
+                else:
+                    await scanner.scan_symbols(selected_coins)
             else:
                 logging.info("Bot is stopped. Waiting for restart...")
                 await asyncio.sleep(5)
-    except Exception as e:
-        logging.error(f"Unexpected error in main loop: {e}")
+        except Exception as e:
+            logging.error(f"Unexpected error in main loop: {e}")
+            await asyncio.sleep(1)
 
 async def start():
     try:
+        await exchange_manager.start()
         await application.initialize()
         await application.start()
         await application.updater.start_polling()
         
-        application.add_handler(CommandHandler("start", lambda update, context: start_bot(update, context, is_running, session_start_balance, init_from_config, sync_time, lambda: clear_mismatched_positions(exchange, get_selected_coins, LEVERAGE[0], lambda msg: send_signal(msg, bot, CHAT_ID)), lambda symbol: get_balance(symbol, exchange), get_selected_coins, timeframe, ema_period1, ema_period2, ema_period3, exit_minutes, LEVERAGE, lambda msg: send_signal(msg, bot, CHAT_ID), get_current_ist_time, get_current_utc_time)))
+        application.add_handler(CommandHandler("start", lambda update, context: start_bot(update, context, is_running, session_start_balance, journal.start_session, init_from_config, clock.sync, resume_positions, lambda symbol: get_balance(symbol, exchange), get_selected_coins, timeframe, ema_period1, ema_period2, ema_period3, exit_minutes, LEVERAGE, notifier.send, get_current_ist_time, get_current_utc_time)))
         application.add_handler(CommandHandler("menu", lambda update, context: update.message.reply_text("Main Menu:", reply_markup=get_main_menu())))
-        application.add_handler(CommandHandler("stop", lambda update, context: stop_bot(update, context, is_running, active_trade, session_start_balance, trade_history, LEVERAGE, lambda symbol: get_balance(symbol, exchange), lambda: sync_time(exchange), lambda symbol, amount: place_market_sell_order(symbol, amount, exchange), reset_global_states, lambda msg: send_signal(msg, bot, CHAT_ID), get_current_ist_time, get_current_utc_time)))
-        application.add_handler(CommandHandler("balance", lambda update, context: send_balance(update, context, exchange, timeframe, LEVERAGE, take_profit_pct, stop_loss_pct, active_trade, lambda: sync_time(exchange), get_current_ist_time, get_current_utc_time)))
-        application.add_handler(CommandHandler("status", lambda update, context: send_status(update, context, is_running, timeframe, active_trade, get_current_ist_time, get_current_utc_time)))
+        application.add_handler(CommandHandler("stop", lambda update, context: stop_bot(update, context, is_running, positions, stop_trade_monitors, session_start_balance, journal, LEVERAGE, lambda symbol: get_balance(symbol, exchange), clock.sync, lambda symbol: snapshot.position(symbol), lambda symbol, amount: place_market_sell_order(symbol, amount, exchange, snapshot, market_rules.get(normalize_symbol(symbol))), reset_global_states, notifier.send, get_current_ist_time, get_current_utc_time)))
+        application.add_handler(CommandHandler("balance", lambda update, context: send_balance(update, context, exchange, timeframe, LEVERAGE, take_profit_pct, stop_loss_pct, positions, clock.sync, get_current_ist_time, get_current_utc_time)))
+        application.add_handler(CommandHandler("status", lambda update, context: send_status(update, context, is_running, timeframe, positions, get_current_ist_time, get_current_utc_time)))
+        application.add_handler(CommandHandler("trades", lambda update, context: send_trades(update, context, journal, session_start_balance)))
+        application.add_handler(CommandHandler("latency", lambda update, context: send_latency(update, context, latency)))
         application.add_handler(CommandHandler("showconfig", lambda update, context: show_config(update, context, load_config)))
         application.add_handler(CommandHandler("set", lambda update, context: set_parameter(update, context, ema_period1, ema_period2, ema_period3, exit_minutes, use_exitmin, timeframe, take_profit_pct, stop_loss_pct, checked_symbols_state, load_config, save_config)))
         application.add_handler(CommandHandler("help", send_help))
         application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, lambda update, context: handle_message(update, context, CHAT_ID)))
-        application.add_handler(CallbackQueryHandler(lambda update, context: handle_callback(update, context, LEVERAGE, use_exitmin, timeframe, load_config, save_config, lambda update, context: start_bot(update, context, is_running, session_start_balance, init_from_config, sync_time, lambda: clear_mismatched_positions(exchange, get_selected_coins, LEVERAGE[0], lambda msg: send_signal(msg, bot, CHAT_ID)), lambda symbol: get_balance(symbol, exchange), get_selected_coins, timeframe, ema_period1, ema_period2, ema_period3, exit_minutes, LEVERAGE, lambda msg: send_signal(msg, bot, CHAT_ID), get_current_ist_time, get_current_utc_time), lambda update, context: stop_bot(update, context, is_running, active_trade, session_start_balance, trade_history, LEVERAGE, lambda symbol: get_balance(symbol, exchange), lambda: sync_time(exchange), lambda symbol, amount: place_market_sell_order(symbol, amount, exchange), reset_global_states, lambda msg: send_signal(msg, bot, CHAT_ID), get_current_ist_time, get_current_utc_time), lambda update, context: send_balance(update, context, exchange, timeframe, LEVERAGE, take_profit_pct, stop_loss_pct, active_trade, lambda: sync_time(exchange), get_current_ist_time, get_current_utc_time), lambda update, context: send_status(update, context, is_running, timeframe, active_trade, get_current_ist_time, get_current_utc_time), lambda update, context: send_trades(update, context, trade_history, session_start_balance), send_help)))
+        application.add_handler(CallbackQueryHandler(lambda update, context: handle_callback(update, context, LEVERAGE, use_exitmin, timeframe, load_config, save_config, lambda update, context: start_bot(update, context, is_running, session_start_balance, journal.start_session, init_from_config, clock.sync, resume_positions, lambda symbol: get_balance(symbol, exchange), get_selected_coins, timeframe, ema_period1, ema_period2, ema_period3, exit_minutes, LEVERAGE, notifier.send, get_current_ist_time, get_current_utc_time), lambda update, context: stop_bot(update, context, is_running, positions, stop_trade_monitors, session_start_balance, journal, LEVERAGE, lambda symbol: get_balance(symbol, exchange), clock.sync, lambda symbol: snapshot.position(symbol), lambda symbol, amount: place_market_sell_order(symbol, amount, exchange, snapshot, market_rules.get(normalize_symbol(symbol))), reset_global_states, notifier.send, get_current_ist_time, get_current_utc_time), lambda update, context: send_balance(update, context, exchange, timeframe, LEVERAGE, take_profit_pct, stop_loss_pct, positions, clock.sync, get_current_ist_time, get_current_utc_time), lambda update, context: send_status(update, context, is_running, timeframe, positions, get_current_ist_time, get_current_utc_time), lambda update, context: send_trades(update, context, journal, session_start_balance), send_help, on_leverage_change)))
         
-        asyncio.create_task(main_loop())
+        supervisor.start("notifier", notifier.run)
+        resume_on_boot[0] = restore_state()
+        supervisor.start("main_loop", main_loop)
         
         await asyncio.Event().wait()
     except Exception as e:
         logging.error(f"Unexpected error in bot loop: {e}")
     finally:
-        await exchange.close()
+        save_state_now()
+        shutting_down[0] = True
+        await notifier.flush(timeout=5)
+        await supervisor.shutdown()
+        await exchange_manager.close()
+        journal.close()
         await application.updater.stop()
         await application.stop()
         await application.shutdown()
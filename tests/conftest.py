@@ -0,0 +1,6 @@
+# conftest.py
+import os
+import sys
+
+# The bot's modules import each other by bare name (as when run from app/core)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app', 'core'))
@@ -0,0 +1,105 @@
+# test_balance_tracker.py
+import asyncio
+import time
+from trading import BalanceTracker
+
+class FakeBalanceExchange:
+    """fetch_balance answers with the next queued free balance once release() lets it through."""
+
+    def __init__(self, *free):
+        self.free = list(free)
+        self.calls = 0
+        self.gates = []
+        self.hold = False
+
+    async def fetch_balance(self):
+        self.calls += 1
+        free = self.free[self.calls - 1]
+        if isinstance(free, Exception):
+            raise free
+        if self.hold:
+            gate = asyncio.get_running_loop().create_future()
+            self.gates.append(gate)
+            await gate
+        return {'free': {'USDT': free}, 'total': {'USDT': free + 1}}
+
+    async def release(self, index):
+        while len(self.gates) <= index:
+            await asyncio.sleep(0)
+        self.gates[index].set_result(None)
+
+def test_cached_balance_is_used_until_it_is_older_than_max_age():
+    exchange = FakeBalanceExchange(100.0, 80.0)
+    tracker = BalanceTracker(exchange, max_age=60)
+
+    async def scenario():
+        first = await tracker.get_free()
+        cached = await tracker.get_free()
+        tracker.updated_at = time.monotonic() - 61
+        return first, cached, await tracker.get_free()
+
+    assert asyncio.run(scenario()) == (100.0, 100.0, 80.0)
+    assert exchange.calls == 2
+    assert tracker.total == 81.0
+    assert tracker.age() < 1
+
+def test_concurrent_refreshes_share_one_request():
+    exchange = FakeBalanceExchange(100.0)
+    exchange.hold = True
+    tracker = BalanceTracker(exchange)
+
+    async def scenario():
+        waiting = asyncio.gather(tracker.refresh(), tracker.get_free(), tracker.refresh())
+        await asyncio.sleep(0)
+        await exchange.release(0)
+        return await waiting
+
+    assert asyncio.run(scenario()) == [100.0, 100.0, 100.0]
+    assert exchange.calls == 1
+
+def test_sent_after_skips_an_older_request_and_its_late_answer():
+    exchange = FakeBalanceExchange(100.0, 40.0)
+    exchange.hold = True
+    tracker = BalanceTracker(exchange)
+
+    async def scenario():
+        stale = asyncio.ensure_future(tracker.refresh())
+        await asyncio.sleep(0)
+        # A position opened after the first request was sent, so its answer still counts that margin as free
+        fresh = asyncio.ensure_future(tracker.get_free(sent_after=time.monotonic()))
+        await asyncio.sleep(0)
+        await exchange.release(1)
+        fresh_free = await fresh
+        await exchange.release(0)
+        await stale
+        return fresh_free
+
+    assert asyncio.run(scenario()) == 40.0
+    assert exchange.calls == 2
+    assert tracker.free == 40.0
+
+def test_get_free_refreshes_when_the_cache_predates_sent_after():
+    exchange = FakeBalanceExchange(100.0, 40.0)
+    tracker = BalanceTracker(exchange)
+
+    async def scenario():
+        await tracker.refresh()
+        unchanged = await tracker.get_free(sent_after=tracker.sent_at)
+        return unchanged, await tracker.get_free(sent_after=time.monotonic())
+
+    assert asyncio.run(scenario()) == (100.0, 40.0)
+    assert exchange.calls == 2
+
+def test_schedule_refresh_updates_in_the_background_and_logs_errors():
+    exchange = FakeBalanceExchange(100.0, ConnectionError("timeout"))
+    tracker = BalanceTracker(exchange)
+
+    async def scenario():
+        await tracker.schedule_refresh()
+        updated = tracker.free
+        await tracker.schedule_refresh()
+        return updated
+
+    assert asyncio.run(scenario()) == 100.0
+    assert tracker.free == 100.0
+    assert exchange.calls == 2
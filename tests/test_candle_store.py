@@ -0,0 +1,58 @@
+# test_candle_store.py
+import asyncio
+from datetime import datetime, timezone
+import numpy as np
+from candle_store import CandleStore, count_candles
+from indicators import CandleCache, store_closed_candles
+
+MINUTE = 60_000
+START = 1_704_067_200_000
+
+def candles(first, count):
+    return np.array([[START + i * MINUTE, 100, 101, 99, 100 + i, 1] for i in range(first, first + count)], dtype=np.float64)
+
+def test_append_skips_stored_rows_without_touching_files(tmp_path, monkeypatch):
+    store = CandleStore(str(tmp_path))
+    assert store.append('BTC/USDT', '1m', candles(0, 3)) == 3
+    assert store.append('BTC/USDT:USDT', '1m', candles(1, 3)) == 1
+
+    def no_io(*args):
+        raise AssertionError("append read the files")
+    monkeypatch.setattr(store, 'length', no_io)
+    assert store.append('BTC/USDT', '1m', candles(0, 4)) == 0
+    monkeypatch.undo()
+    assert store.read_ohlcv('BTC/USDT', '1m')[:, 0].tolist() == candles(0, 4)[:, 0].tolist()
+
+def test_rewrite_updates_the_last_stored_timestamp(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.append('BTC/USDT', '1m', candles(0, 5))
+    store.rewrite('BTC/USDT', '1m', candles(0, 2))
+    assert store.append('BTC/USDT', '1m', candles(0, 5)) == 3
+    assert store.length('BTC/USDT', '1m') == 5
+
+def test_store_closed_candles_leaves_the_forming_candle(tmp_path):
+    store = CandleStore(str(tmp_path))
+    cache = CandleCache(10)
+    cache.replace(candles(0, 4))
+    asyncio.run(store_closed_candles(store, 'BTC/USDT', '1m', cache))
+    asyncio.run(store_closed_candles(store, 'BTC/USDT', '1m', cache))
+    assert store.length('BTC/USDT', '1m') == 3
+    assert store.is_stored('BTC/USDT', '1m', START + 2 * MINUTE)
+    assert not store.is_stored('BTC/USDT', '1m', START + 3 * MINUTE)
+
+def month_start(year, month):
+    return int(datetime(year, month, 1, tzinfo=timezone.utc).timestamp() * 1000)
+
+def test_find_gaps_follows_calendar_months_on_1M(tmp_path):
+    store = CandleStore(str(tmp_path))
+    # Jan, Feb and Mar 2024 are 31, 29 and 31 days long; a fixed 30-day step would flag gaps between them
+    opens = [month_start(2024, 1), month_start(2024, 2), month_start(2024, 3), month_start(2024, 6)]
+    store.append('BTC/USDT', '1M', np.array([[t, 100, 101, 99, 100, 1] for t in opens], dtype=np.float64))
+    assert store.find_gaps('BTC/USDT', '1M') == [(month_start(2024, 4), month_start(2024, 6))]
+    assert count_candles('1M', month_start(2024, 4), month_start(2024, 6)) == 2
+
+def test_find_gaps_on_fixed_timeframes(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.append('BTC/USDT', '1m', np.concatenate([candles(0, 3), candles(6, 2)]))
+    assert store.find_gaps('BTC/USDT', '1m') == [(START + 3 * MINUTE, START + 6 * MINUTE)]
+    assert count_candles('1m', START + 3 * MINUTE, START + 6 * MINUTE) == 3
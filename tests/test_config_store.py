@@ -0,0 +1,56 @@
+# test_config_store.py
+import json
+import os
+import pytest
+import config_store
+from config_store import ConfigStore
+
+def write(path, config):
+    with open(path, 'w') as f:
+        json.dump(config, f)
+
+def test_load_is_cached_until_the_file_changes(tmp_path):
+    path = tmp_path / 'config.json'
+    write(path, {'timeframe': '1m'})
+    store = ConfigStore(str(path))
+    seen = []
+    store.subscribe(seen.append)
+    assert store.load() == {'timeframe': '1m'}
+    assert store.load() is store.load()
+    write(path, {'timeframe': '5m', 'leverage': 10})
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+    assert store.get('timeframe') == '5m'
+    assert seen == [{'timeframe': '1m'}, {'timeframe': '5m', 'leverage': 10}]
+
+def test_save_replaces_the_file_and_notifies(tmp_path):
+    path = tmp_path / 'config.json'
+    write(path, {'parameters': {'ema1': 9}})
+    store = ConfigStore(str(path))
+    seen = []
+    store.subscribe(seen.append)
+    config = store.load()
+    config['parameters']['ema1'] = 21
+    store.save(config)
+    with open(path) as f:
+        assert json.load(f) == {'parameters': {'ema1': 21}}
+    assert store.load() == {'parameters': {'ema1': 21}}
+    assert seen[-1] == {'parameters': {'ema1': 21}}
+    assert [name for name in os.listdir(tmp_path)] == ['config.json']
+
+def test_failed_save_keeps_the_file_and_restores_the_cache(tmp_path, monkeypatch):
+    path = tmp_path / 'config.json'
+    write(path, {'parameters': {'ema1': 9}})
+    store = ConfigStore(str(path))
+    config = store.load()
+    config['parameters']['ema1'] = 21
+
+    def failing_replace(src, dst):
+        raise OSError("disk full")
+    monkeypatch.setattr(config_store.os, 'replace', failing_replace)
+    with pytest.raises(OSError):
+        store.save(config)
+    monkeypatch.undo()
+    with open(path) as f:
+        assert json.load(f) == {'parameters': {'ema1': 9}}
+    assert store.load() == {'parameters': {'ema1': 9}}
+    assert [name for name in os.listdir(tmp_path)] == ['config.json']
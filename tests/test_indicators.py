@@ -0,0 +1,87 @@
+# test_indicators.py
+import numpy as np
+import pandas as pd
+import pytest
+from indicators import calculate_ema, calculate_emas, calculate_ema_iterative, calculate_ema_matrix, EMA_BLOCK_SIZE, EmaState, update_emas
+
+def random_closes(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.01, n))), name='close')
+
+@pytest.mark.parametrize('n', [1, 2, EMA_BLOCK_SIZE - 1, EMA_BLOCK_SIZE, EMA_BLOCK_SIZE + 1, 500, 1537])
+@pytest.mark.parametrize('period', [1, 21, 60, 365])
+def test_calculate_ema_matches_iterative(n, period):
+    closes = random_closes(n, seed=n + period)
+    expected = calculate_ema_iterative(closes, period)
+    result = calculate_ema(closes, period)
+    np.testing.assert_allclose(result.to_numpy(), expected.to_numpy(), rtol=1e-12, atol=0)
+    assert result.index.equals(closes.index)
+    assert result.name == closes.name
+
+def test_calculate_emas_matches_iterative():
+    closes = random_closes(1000)
+    df = calculate_emas(pd.DataFrame({'close': closes}), 21, 60, 365)
+    for column, period in (('EMA1', 21), ('EMA2', 60), ('EMA3', 365)):
+        np.testing.assert_allclose(df[column].to_numpy(), calculate_ema_iterative(closes, period).to_numpy(), rtol=1e-12, atol=0)
+
+def test_calculate_emas_empty_frame():
+    df = pd.DataFrame({'close': pd.Series([], dtype=np.float64)})
+    assert calculate_emas(df, 21, 60, 365).empty
+
+def test_block_size_does_not_change_result():
+    closes = random_closes(700).to_numpy()
+    np.testing.assert_allclose(calculate_ema_matrix(closes, [21, 365], block_size=7), calculate_ema_matrix(closes, [21, 365]), rtol=1e-12, atol=0)
+
+MINUTE = 60_000
+
+def candle_frame(closes, first=0):
+    timestamps = pd.to_datetime((np.arange(len(closes)) + first) * MINUTE, unit='ms')
+    return pd.DataFrame({'timestamp': timestamps, 'close': np.asarray(closes, dtype=np.float64)})
+
+def test_ema_state_incremental_matches_full_recompute():
+    closes = random_closes(700).to_numpy()
+    timestamps = np.arange(700, dtype=np.int64) * MINUTE
+    state = EmaState(21, window=300)
+    for end in range(300, 701):
+        # The frame slides one candle at a time, as each new candle opens
+        result = state.update(timestamps[end - 300:end], closes[end - 300:end])
+    expected = calculate_ema_matrix(closes[400:700], [21])[:, 0]
+    # The incremental EMA is seeded earlier in the series, so it has converged where a recompute over the frame is still warming up
+    np.testing.assert_allclose(result[-50:], expected[-50:], rtol=1e-9)
+    np.testing.assert_allclose(state.values, calculate_ema_matrix(closes[:699], [21])[-300:, 0], rtol=1e-12)
+
+def test_ema_state_rebuilds_after_a_gap():
+    closes = random_closes(400).to_numpy()
+    timestamps = np.arange(400, dtype=np.int64) * MINUTE
+    state = EmaState(21, window=100)
+    state.update(timestamps[:100], closes[:100])
+    # Candles 100..249 were never seen, so the stored EMA cannot be advanced onto this frame
+    result = state.update(timestamps[250:350], closes[250:350])
+    np.testing.assert_allclose(result[:-1], calculate_ema_matrix(closes[250:349], [21])[:, 0], rtol=1e-12)
+    assert state.timestamps[0] == timestamps[250]
+
+def test_ema_state_grows_for_frames_longer_than_the_window():
+    closes = random_closes(800).to_numpy()
+    timestamps = np.arange(800, dtype=np.int64) * MINUTE
+    state = EmaState(21, window=500)
+    result = state.update(timestamps, closes)
+    assert state.window == 799
+    np.testing.assert_allclose(result[:-1], calculate_ema_matrix(closes[:799], [21])[:, 0], rtol=1e-12)
+    longer = np.append(closes, closes[-1] * 1.01)
+    result = state.update(np.arange(801, dtype=np.int64) * MINUTE, longer)
+    np.testing.assert_allclose(result[:-1], calculate_ema_matrix(longer[:800], [21])[:, 0], rtol=1e-12)
+
+def test_update_emas_handles_frames_longer_than_the_default_window():
+    df = candle_frame(random_closes(800).to_numpy())
+    result = update_emas(df.copy(), 'BTC/USDT', '1m', 21, 60, 365, {})
+    expected = calculate_emas(df.copy(), 21, 60, 365)
+    for column in ('EMA1', 'EMA2', 'EMA3'):
+        np.testing.assert_allclose(result[column].to_numpy()[:-1], expected[column].to_numpy()[:-1], rtol=1e-12)
+
+def test_update_emas_drops_states_when_a_period_changes():
+    df = candle_frame(random_closes(300).to_numpy())
+    states = {}
+    update_emas(df.copy(), 'BTC/USDT', '1m', 21, 60, 365, states)
+    result = update_emas(df.copy(), 'BTC/USDT', '1m', 21, 50, 365, states)
+    assert sorted(key[2] for key in states) == [21, 50, 365]
+    np.testing.assert_allclose(result['EMA2'].to_numpy()[:-1], calculate_ema_matrix(df['close'].to_numpy()[:-1], [50])[:, 0], rtol=1e-12)
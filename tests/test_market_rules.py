@@ -0,0 +1,73 @@
+# test_market_rules.py
+import asyncio
+from mock_exchange import MockExchange
+from market_rules import index_markets
+from trading import place_market_buy_order, place_market_sell_order
+
+SYMBOL = 'BTC/USDT'
+
+def setup(price=100.0, **options):
+    exchange = MockExchange(prices={SYMBOL: price}, **options)
+    rules = index_markets({SYMBOL: exchange.market(SYMBOL)})
+    return exchange, rules['BTCUSDT']
+
+def test_size_floors_to_the_lot_step():
+    _, rules = setup(price=30000.0, step=0.001)
+    assert rules.size(100, 30000.0) == 0.003
+    assert rules.format_amount(0.0039999) == '0.003'
+
+def test_size_raises_to_min_notional_with_buffer():
+    _, rules = setup(step=0.01, min_notional=5.0)
+    # 5 USDT * 1.01 / 100 = 0.0505, ceiled to the 0.01 step
+    assert rules.size(1, 100.0) == 0.06
+
+def test_prices_round_away_from_crossing_and_stay_in_band():
+    _, rules = setup(tick=0.1)
+    assert rules.format_price(100.07, 'BUY') == '100.0'
+    assert rules.format_price(100.01, 'SELL') == '100.1'
+    assert rules.band_price(80.0, 100.0) == 95.0
+    assert rules.band_price(120.0, 100.0) == 105.0
+    assert rules.band_price(99.0, 100.0) == 99.0
+
+def test_market_order_goes_through_the_raw_endpoint():
+    async def scenario():
+        exchange, rules = setup(step=0.01)
+        order = await place_market_buy_order(SYMBOL, 0.0567, exchange, rules)
+        try:
+            await exchange.fapiPrivatePostOrder(dict(rules.templates['BUY'], quantity='0.0567'))
+        except Exception as e:
+            unrounded = str(e)
+        return exchange, order, unrounded
+
+    exchange, order, unrounded = asyncio.run(scenario())
+    assert order['status'] == 'closed' and order['amount'] == 0.05 and order['symbol'] == SYMBOL
+    assert exchange.positions[SYMBOL]['contracts'] == 0.05
+    assert '-1111' in unrounded
+
+def test_below_min_notional_is_rejected_unless_reduce_only():
+    async def scenario():
+        exchange, rules = setup(step=0.01, min_notional=5.0)
+        rejected = await place_market_buy_order(SYMBOL, 0.01, exchange, rules)
+        await place_market_buy_order(SYMBOL, rules.size(1, 100.0), exchange, rules)
+        closed = await place_market_sell_order(SYMBOL, 0.01, exchange, rules=rules)
+        return rejected, closed
+
+    rejected, closed = asyncio.run(scenario())
+    assert rejected is None
+    assert closed['status'] == 'closed' and closed['reduceOnly']
+
+def test_percent_price_rejection_falls_back_to_a_banded_limit_sell():
+    async def scenario(with_rules):
+        exchange, rules = setup()
+        await place_market_buy_order(SYMBOL, 1.0, exchange, rules)
+        exchange.reject_market_sells.add(SYMBOL)
+        exchange.order_books[SYMBOL] = {'bids': [[90.0, 1.0]], 'asks': [[110.0, 1.0]]}
+        order = await place_market_sell_order(SYMBOL, 1.0, exchange, rules=rules if with_rules else None)
+        return exchange, order
+
+    exchange, order = asyncio.run(scenario(True))
+    # 90 * 0.999 is below the 95 band floor, so the limit is clamped up to it
+    assert order['type'] == 'limit' and order['price'] == 95.0 and order['reduceOnly']
+    assert exchange.positions[SYMBOL]['contracts'] == 0
+    _, unbanded = asyncio.run(scenario(False))
+    assert unbanded is None
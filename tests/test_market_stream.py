@@ -0,0 +1,167 @@
+# test_market_stream.py
+import asyncio
+import json
+import pytest
+from indicators import CandleCache
+from market_stream import MarketStream, ReplayTransport, AiohttpTransport, serve_replay
+
+MINUTE = 60_000
+START = 1_704_067_200_000  # 2024-01-01 00:00 UTC
+
+def kline(symbol, open_ms, close, closed=False, interval='1m', event_ms=None):
+    return json.dumps({'stream': f"{symbol.lower()}@kline_{interval}", 'data': {
+        'e': 'kline', 'E': event_ms or open_ms + MINUTE - 1, 's': symbol,
+        'k': {'t': open_ms, 'T': open_ms + MINUTE - 1, 'i': interval, 'o': str(close), 'h': str(close + 1), 'l': str(close - 1), 'c': str(close), 'v': '5', 'x': closed},
+    }})
+
+def agg_trade(symbol, price, trade_ms):
+    return json.dumps({'stream': f"{symbol.lower()}@aggTrade", 'data': {'e': 'aggTrade', 'E': trade_ms, 's': symbol, 'p': str(price), 'T': trade_ms}})
+
+def seeded_cache(bars=3):
+    cache = CandleCache(10)
+    cache.replace([[START + i * MINUTE, 100, 101, 99, 100 + i, 1] for i in range(bars)])
+    return cache
+
+class QueueTransport:
+    """Frames pushed by the test; close() or a pushed exception ends the current connection."""
+
+    def __init__(self):
+        self.urls = []
+        self.frames = asyncio.Queue()
+
+    async def connect(self, url):
+        self.urls.append(url)
+
+    async def recv(self):
+        frame = await self.frames.get()
+        if isinstance(frame, Exception):
+            raise frame
+        return frame
+
+    async def close(self):
+        if self.frames.empty():
+            self.frames.put_nowait(ConnectionError("closed"))
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    sleep = asyncio.sleep
+    monkeypatch.setattr(asyncio, 'sleep', lambda delay, *args: sleep(0, *args))
+
+def test_replay_merges_klines_into_cache():
+    cache = seeded_cache()
+    frames = [
+        kline('BTCUSDT', START + 2 * MINUTE, 110.0, closed=True),  # replaces the last cached bar
+        kline('BTCUSDT', START + 3 * MINUTE, 111.0),  # next, still forming bar
+        kline('BTCUSDT', START + 9 * MINUTE, 150.0),  # does not connect, left for REST
+    ]
+    stream = MarketStream(['BTC/USDT'], '1m', {('BTC/USDT', '1m'): cache}, transport=ReplayTransport(frames))
+    asyncio.run(stream.run())
+    assert stream.transport.url.endswith('btcusdt@kline_1m/btcusdt@aggTrade')
+    assert cache.rows[:, 0].tolist() == [START, START + MINUTE, START + 2 * MINUTE, START + 3 * MINUTE]
+    assert cache.rows[-2:, 4].tolist() == [110.0, 111.0]
+    assert stream.last_prices['BTC/USDT'][0] == 150.0
+    assert not stream.connected
+
+def test_trade_prices_ignore_older_events():
+    stream = MarketStream(['ETH/USDT:USDT'], '1m', transport=ReplayTransport([]))
+    stream._stream_url()
+    stream.connected = True
+    stream.handle_frame(agg_trade('ETHUSDT', 2000.0, START + 2))
+    stream.handle_frame(agg_trade('ETHUSDT', 1990.0, START + 1))
+    stream.handle_frame(agg_trade('XRPUSDT', 1.0, START + 3))
+    assert stream.last_price('ETH/USDT:USDT') == 2000.0
+    assert 'XRP/USDT' not in stream.last_prices
+
+def test_reconnects_after_error_and_keeps_merging(no_backoff):
+    async def scenario():
+        cache = seeded_cache()
+        transport = QueueTransport()
+        stream = MarketStream(['BTC/USDT'], '1m', {('BTC/USDT', '1m'): cache}, transport=transport)
+        task = asyncio.create_task(stream.run())
+        transport.frames.put_nowait(kline('BTCUSDT', START + 2 * MINUTE, 105.0))
+        transport.frames.put_nowait(ConnectionError("reset by peer"))
+        transport.frames.put_nowait(kline('BTCUSDT', START + 3 * MINUTE, 106.0))
+        while len(cache) < 4:
+            await asyncio.sleep(0)
+        assert len(transport.urls) == 2
+        assert stream.connected and stream.is_live('BTC/USDT')
+        await stream.stop()
+        await asyncio.wait_for(task, 1)
+        return cache
+
+    cache = asyncio.run(scenario())
+    assert cache.rows[-2:, 4].tolist() == [105.0, 106.0]
+
+def test_resubscribe_reconnects_with_new_streams(no_backoff):
+    async def scenario():
+        transport = QueueTransport()
+        stream = MarketStream(['BTC/USDT'], '1m', transport=transport)
+        task = asyncio.create_task(stream.run())
+        while not stream.connected:
+            await asyncio.sleep(0)
+        await stream.resubscribe(['ETH/USDT'], '5m')
+        while len(transport.urls) < 2:
+            await asyncio.sleep(0)
+        transport.frames.put_nowait(agg_trade('ETHUSDT', 2500.0, START))
+        price = await stream.wait_for_price('ETH/USDT', 1)
+        await stream.stop()
+        await asyncio.wait_for(task, 1)
+        return transport.urls, price
+
+    urls, price = asyncio.run(scenario())
+    assert urls[1].endswith('ethusdt@kline_5m/ethusdt@aggTrade')
+    assert price == 2500.0
+
+def test_wait_for_candle_close():
+    async def scenario():
+        stream = MarketStream(['BTC/USDT'], '1m', transport=ReplayTransport([]))
+        stream._stream_url()
+        waiter = asyncio.create_task(stream.wait_for_candle_close(1))
+        await asyncio.sleep(0)
+        stream.handle_frame(kline('BTCUSDT', START, 100.0))
+        stream.handle_frame(kline('BTCUSDT', START, 101.0, interval='5m', closed=True))
+        assert not waiter.done()
+        stream.handle_frame(kline('BTCUSDT', START, 102.0, closed=True))
+        return await waiter, await stream.wait_for_candle_close(0.01)
+
+    assert asyncio.run(scenario()) == (START, None)
+
+def test_wait_for_open_until_live_symbols_have_the_new_candle():
+    async def scenario():
+        caches = {('BTC/USDT', '1m'): seeded_cache(), ('ETH/USDT', '1m'): seeded_cache()}
+        stream = MarketStream(['BTC/USDT', 'ETH/USDT', 'XRP/USDT'], '1m', caches, transport=ReplayTransport([]))
+        stream._stream_url()
+        stream.connected = True
+        stream.handle_frame(kline('BTCUSDT', START + 2 * MINUTE, 102.0, closed=True))
+        stream.handle_frame(kline('ETHUSDT', START + 2 * MINUTE, 102.0, closed=True))
+        waiter = asyncio.create_task(stream.wait_for_open(stream.symbols, START + 3 * MINUTE, 1))
+        await asyncio.sleep(0)
+        stream.handle_frame(kline('BTCUSDT', START + 3 * MINUTE, 103.0))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        stream.handle_frame(kline('ETHUSDT', START + 3 * MINUTE, 103.0))
+        # XRP/USDT has no cache, so it is left to REST rather than waited for
+        return await waiter, await stream.wait_for_open(['BTC/USDT'], START + 4 * MINUTE, 0.01)
+
+    assert asyncio.run(scenario()) == ([], ['BTC/USDT'])
+
+def test_serve_replay_over_websocket():
+    async def scenario():
+        frames = [agg_trade('BTCUSDT', 42000.0 + i, START + i) for i in range(3)]
+        runner = await serve_replay(frames, port=0)
+        port = runner.addresses[0][1]
+        stream = MarketStream(['BTC/USDT'], '1m', transport=AiohttpTransport(), url=f"ws://127.0.0.1:{port}/stream?streams=")
+        task = asyncio.create_task(stream.run())
+        try:
+            for _ in range(200):
+                if stream.last_prices.get('BTC/USDT', (None,))[0] == 42002.0:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await stream.stop()
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await runner.cleanup()
+        return stream.last_prices['BTC/USDT'][0]
+
+    assert asyncio.run(scenario()) == 42002.0
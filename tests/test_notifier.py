@@ -0,0 +1,78 @@
+# test_notifier.py
+import asyncio
+import logging
+from telegram import Bot
+from fake_telegram import FakeBotAPI
+from latency import LatencyRecorder
+from notifier import NotificationQueue
+
+CHAT_ID = '42'
+
+async def start(api, **options):
+    runner = await api.serve(port=0)
+    port = runner.addresses[0][1]
+    bot = Bot('123:fake', base_url=f"http://127.0.0.1:{port}/bot")
+    await bot.initialize()
+    queue = NotificationQueue(bot, CHAT_ID, **options)
+    task = asyncio.create_task(queue.run())
+    return runner, bot, queue, task
+
+async def stop(runner, bot, task):
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await bot.shutdown()
+    await runner.cleanup()
+
+def test_burst_is_coalesced_into_one_message():
+    async def scenario():
+        api = FakeBotAPI()
+        latency = LatencyRecorder()
+        runner, bot, queue, task = await start(api, coalesce_window=0.05, min_interval=0, latency=latency)
+        try:
+            for i in range(3):
+                queue.post(f"trade {i}\n")
+            await queue.flush(timeout=5)
+        finally:
+            await stop(runner, bot, task)
+        return api, latency
+
+    api, latency = asyncio.run(scenario())
+    assert [(chat_id, text) for _, chat_id, text in api.messages] == [(CHAT_ID, "trade 0\n\ntrade 1\n\ntrade 2")]
+    assert latency.stages['send_signal'].count == 1
+
+def test_flood_control_is_retried_after_retry_after():
+    async def scenario():
+        api = FakeBotAPI(flood_limit=1, retry_after=1)
+        runner, bot, queue, task = await start(api, coalesce_window=0, min_interval=0)
+        try:
+            queue.post("first")
+            while not api.messages:
+                await asyncio.sleep(0.01)
+            queue.post("second")
+            await queue.flush(timeout=5)
+        finally:
+            await stop(runner, bot, task)
+        return api
+
+    api = asyncio.run(scenario())
+    assert [text for _, _, text in api.messages] == ["first", "second"]
+    assert api.rejected == 1
+    assert api.messages[1][0] - api.messages[0][0] >= 1
+
+def test_flush_gives_up_after_timeout(caplog):
+    async def scenario():
+        api = FakeBotAPI(latency=0.5)
+        runner, bot, queue, task = await start(api, coalesce_window=0, min_interval=0)
+        try:
+            queue.post("slow")
+            await queue.flush(timeout=0.05)
+            flushed_early = not api.messages
+            await queue.flush(timeout=5)
+        finally:
+            await stop(runner, bot, task)
+        return api, flushed_early
+
+    with caplog.at_level(logging.WARNING):
+        api, flushed_early = asyncio.run(scenario())
+    assert flushed_early and "still queued after 0.05s" in caplog.text
+    assert [text for _, _, text in api.messages] == ["slow"]
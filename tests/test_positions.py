@@ -0,0 +1,18 @@
+# test_positions.py
+from positions import PositionManager
+
+def test_pending_entries_count_against_total_exposure():
+    positions = PositionManager(max_positions=3, max_total_exposure=100)
+    positions.reserve('BTC/USDT', 60)
+    assert positions.exposure_headroom() == 40
+    positions.open('BTC/USDT', 100.0, 60)
+    assert positions.pending == {} and positions.exposure() == 60
+    positions.reserve('ETH/USDT', 50)
+    assert positions.exposure_headroom() == 0
+    positions.unreserve('ETH/USDT')
+    assert positions.exposure_headroom() == 40
+
+def test_no_limit_when_zero():
+    positions = PositionManager(max_positions=2)
+    positions.reserve('BTC/USDT', 1e9)
+    assert positions.exposure_headroom() == float('inf')
@@ -0,0 +1,119 @@
+# test_rate_limiter.py
+import asyncio
+import pytest
+import rate_limiter
+from rate_limiter import WeightLimiter, install, ORDER, ACCOUNT, MARKET_DATA
+
+class FakeTime:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def fake_time(monkeypatch):
+    clock = FakeTime()
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay):
+        clock.now += delay
+        await real_sleep(0)
+    monkeypatch.setattr(rate_limiter, 'time', clock)
+    monkeypatch.setattr(rate_limiter.asyncio, 'sleep', fake_sleep)
+    return clock
+
+def test_acquire_spends_weight_and_refills_over_the_window(fake_time):
+    limiter = WeightLimiter(limit=100, window=100)
+    asyncio.run(limiter.acquire(30, ORDER, 'order'))
+    asyncio.run(limiter.acquire(5, MARKET_DATA, 'klines'))
+    assert limiter.tokens == 65
+    assert limiter.used == {'order': 30, 'klines': 5}
+    fake_time.now += 10
+    assert limiter.stats()['tokens'] == 75
+
+def test_lower_priorities_keep_their_reserve_free(fake_time):
+    limiter = WeightLimiter(limit=100, window=100, reserve=(0.0, 0.1, 0.2))
+    limiter.tokens = 20.0
+    started = fake_time.now
+    asyncio.run(limiter.acquire(1, MARKET_DATA))
+    # Market data had to wait for the bucket to refill above its 20 weight reserve
+    assert fake_time.now - started >= 1
+    asyncio.run(limiter.acquire(20, ORDER))
+    assert limiter.tokens == pytest.approx(0, abs=1e-6)
+
+def test_waiting_order_goes_before_market_data(fake_time):
+    limiter = WeightLimiter(limit=100, window=100, reserve=(0.0, 0.1, 0.2))
+    limiter.tokens = 0.0
+    finished = []
+
+    async def request(cost, priority, name):
+        await limiter.acquire(cost, priority)
+        finished.append(name)
+
+    async def scenario():
+        # Market data alone would be let through at 21 tokens, long before the order has its 50
+        await asyncio.gather(request(1, MARKET_DATA, 'klines'), request(50, ORDER, 'order'))
+    asyncio.run(scenario())
+    assert finished == ['order', 'klines']
+
+def test_used_weight_header_pulls_the_bucket_down(fake_time):
+    limiter = WeightLimiter(limit=2400)
+    limiter.observe(200, {'X-MBX-USED-WEIGHT-1M': '2000'})
+    assert limiter.server_used == 2000
+    assert limiter.tokens == 400
+    # The server count never raises the local bucket
+    limiter.observe(200, {'X-MBX-USED-WEIGHT-1M': '10'})
+    assert limiter.tokens == 400
+
+@pytest.mark.parametrize('status, headers, blocked', [(429, {'Retry-After': '7'}, 7), (429, {}, 10), (418, {}, 120)])
+def test_rate_limit_answer_blocks_every_caller(fake_time, status, headers, blocked):
+    limiter = WeightLimiter(limit=2400)
+    started = fake_time.now
+    limiter.observe(status, headers)
+    assert limiter.tokens == 0
+    asyncio.run(limiter.acquire(1, ORDER))
+    assert fake_time.now - started >= blocked
+
+class FakeExchange:
+    enableRateLimit = True
+
+    def __init__(self):
+        self.calls = []
+        self.responses = []
+
+    def calculate_rate_limiter_cost(self, api, method, path, params, config):
+        return config.get('cost', 1)
+
+    async def fetch2(self, path, api='public', method='GET', params={}, headers=None, body=None, config={}):
+        self.calls.append((path, api, method))
+        return {'path': path}
+
+    def on_rest_response(self, code, reason, url, method, response_headers, response_body, request_headers, request_body):
+        self.responses.append(code)
+        return response_body
+
+def test_install_routes_requests_through_the_limiters(fake_time):
+    exchange = FakeExchange()
+    weights = WeightLimiter(limit=2400)
+    orders = WeightLimiter(limit=300)
+    install(exchange, weights, orders)
+    assert exchange.enableRateLimit is False
+
+    async def scenario():
+        await exchange.fetch2('order', 'fapiPrivate', 'POST', config={'cost': 1})
+        await exchange.fetch2('klines', 'fapiPublic', 'GET', config={'cost': 5})
+    asyncio.run(scenario())
+    assert exchange.calls == [('order', 'fapiPrivate', 'POST'), ('klines', 'fapiPublic', 'GET')]
+    assert weights.used == {'order': 1, 'klines': 5}
+    assert orders.used == {'order': 1}
+
+    assert exchange.on_rest_response(200, 'OK', 'url', 'GET', {'x-mbx-used-weight-1m': '100'}, 'body', {}, None) == 'body'
+    assert exchange.responses == [200]
+    assert weights.server_used == 100
+
+def test_request_priority():
+    assert rate_limiter.request_priority('fapiPrivate', 'POST', 'order') == ORDER
+    assert rate_limiter.request_priority('fapiPrivate', 'DELETE', 'allOpenOrders') == ORDER
+    assert rate_limiter.request_priority('fapiPrivateV2', 'GET', 'positionRisk') == ACCOUNT
+    assert rate_limiter.request_priority('fapiPublic', 'GET', 'klines') == MARKET_DATA
@@ -0,0 +1,56 @@
+# test_scanner.py
+import asyncio
+from mock_exchange import MockExchange
+from market_rules import index_markets
+from positions import PositionManager
+from scanner import Scanner
+from time_utils import ServerClock
+from trade_journal import TradeJournal
+from trading import BalanceTracker
+
+SYMBOLS = ['BTC/USDT', 'ETH/USDT']
+
+def make_scanner(exchange, max_positions=2, leverage=2):
+    positions = PositionManager(max_positions)
+    balance_tracker = BalanceTracker(exchange)
+    opened = []
+    scanner = Scanner(
+        exchange, positions, balance_tracker, ServerClock(exchange), TradeJournal(':memory:'),
+        index_markets({symbol: exchange.market(symbol) for symbol in SYMBOLS}), set(SYMBOLS), ['1m'], ([21], [60], [365]),
+        [leverage], [0.5], [2], on_open=opened.append,
+    )
+    return scanner, opened
+
+def with_signals(scanner, signals):
+    async def evaluate_symbol(symbol, semaphore):
+        return signals.get(symbol)
+    scanner.evaluate_symbol = evaluate_symbol
+
+def test_two_signals_in_one_scan_both_fit_the_free_margin():
+    async def scenario():
+        exchange = MockExchange(prices={symbol: 100.0 for symbol in SYMBOLS}, balance=1000.0)
+        scanner, opened = make_scanner(exchange)
+        await scanner.balance_tracker.refresh()  # cached before the scan, as the background refresher leaves it
+        with_signals(scanner, {symbol: {'price': 100.0} for symbol in SYMBOLS})
+        await scanner.scan_symbols(SYMBOLS)
+        return exchange, scanner, opened
+
+    exchange, scanner, opened = asyncio.run(scenario())
+    assert [trade['symbol'] for trade in opened] == SYMBOLS
+    # The first entry takes half the free margin; the second is sized from what is left, not from the pre-trade balance
+    assert exchange.positions['BTC/USDT']['contracts'] == 9.9
+    assert 0 < exchange.used_margin() <= 1000.0
+    assert exchange.positions['ETH/USDT']['contracts'] == 9.999  # 505 free * 0.99 * 2x / 100
+
+def test_in_flight_entries_hold_their_margin():
+    async def scenario():
+        exchange = MockExchange(prices={symbol: 100.0 for symbol in SYMBOLS}, balance=1000.0)
+        scanner, _ = make_scanner(exchange)
+        await scanner.balance_tracker.refresh()
+        scanner.positions.reserve('BTC/USDT', 1000.0)  # 500 USDT margin at 2x, not yet filled
+        await scanner.enter_trade('ETH/USDT', {'price': 100.0})
+        return exchange
+
+    exchange = asyncio.run(scenario())
+    # 500 free after the reservation, split over the two open slots: 247.5 margin, 495 notional
+    assert exchange.positions['ETH/USDT']['contracts'] == 4.95
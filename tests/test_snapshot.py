@@ -0,0 +1,18 @@
+# test_snapshot.py
+import asyncio
+from mock_exchange import MockExchange
+from snapshot import MarketSnapshot
+
+def test_released_symbols_are_no_longer_fetched():
+    async def scenario():
+        exchange = MockExchange(prices={'BTC/USDT': 100.0, 'ETH/USDT': 2000.0})
+        snapshot = MarketSnapshot(exchange, lambda: ['BTC/USDT'])
+        assert await snapshot.price('ETH/USDT') == 2000.0
+        assert snapshot.extra_symbols == {'ETH/USDT'}
+        snapshot.release('ETH/USDT:USDT')
+        await snapshot.refresh()
+        return snapshot
+
+    snapshot = asyncio.run(scenario())
+    assert snapshot.extra_symbols == set()
+    assert snapshot.symbols == {'BTCUSDT'}
@@ -0,0 +1,94 @@
+# test_supervisor.py
+import asyncio
+import supervisor
+from supervisor import TaskSupervisor
+
+def crashing(times, result='done'):
+    # Factory whose coroutine raises for the first `times` calls, then returns result
+    calls = [0]
+
+    async def run():
+        calls[0] += 1
+        if calls[0] <= times:
+            raise RuntimeError(f"crash {calls[0]}")
+        return result
+    return run, calls
+
+def record_sleeps(monkeypatch):
+    delays = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+        await real_sleep(0)
+    monkeypatch.setattr(supervisor.asyncio, 'sleep', fake_sleep)
+    return delays
+
+def test_crashed_task_is_restarted_until_it_returns(monkeypatch):
+    record_sleeps(monkeypatch)
+    factory, calls = crashing(2)
+    exits = []
+
+    async def scenario():
+        tasks = TaskSupervisor(max_restarts=5)
+        result = await tasks.start("job", factory, on_exit=lambda: exits.append('exit'))
+        return result, tasks.running()
+
+    result, running = asyncio.run(scenario())
+    assert result == 'done'
+    assert calls[0] == 3
+    assert exits == ['exit']
+    assert running == []
+
+def test_restart_delay_backs_off_exponentially_up_to_the_cap(monkeypatch):
+    delays = record_sleeps(monkeypatch)
+    factory, calls = crashing(5)
+
+    async def scenario():
+        await TaskSupervisor(max_restarts=5, restart_delay=1, max_delay=5).start("job", factory)
+
+    asyncio.run(scenario())
+    assert delays == [1, 2, 4, 5, 5]
+
+def test_give_up_runs_on_give_up_instead_of_on_exit(monkeypatch):
+    record_sleeps(monkeypatch)
+    factory, calls = crashing(10)
+    exits, give_ups = [], []
+
+    async def scenario():
+        tasks = TaskSupervisor(max_restarts=2)
+        return await tasks.start("job", factory, on_exit=lambda: exits.append('exit'), on_give_up=give_ups.append)
+
+    assert asyncio.run(scenario()) is None
+    assert calls[0] == 3
+    assert exits == []
+    assert [str(error) for error in give_ups] == ["crash 3"]
+
+def test_give_up_without_on_give_up_runs_on_exit(monkeypatch):
+    record_sleeps(monkeypatch)
+    factory, calls = crashing(10)
+    exits = []
+
+    async def scenario():
+        await TaskSupervisor(max_restarts=1).start("job", factory, on_exit=lambda: exits.append('exit'))
+
+    asyncio.run(scenario())
+    assert calls[0] == 2
+    assert exits == ['exit']
+
+def test_cancel_runs_on_exit():
+    exits, give_ups = [], []
+
+    async def forever():
+        await asyncio.Event().wait()
+
+    async def scenario():
+        tasks = TaskSupervisor()
+        tasks.start("job", forever, on_exit=lambda: exits.append('exit'), on_give_up=give_ups.append)
+        await asyncio.sleep(0)
+        await tasks.cancel(["job"])
+        return tasks.running()
+
+    assert asyncio.run(scenario()) == []
+    assert exits == ['exit']
+    assert give_ups == []
@@ -0,0 +1,128 @@
+# test_time_utils.py
+import asyncio
+import pytest
+import time_utils
+from time_utils import ServerClock, wait_for_next_candle, next_candle_close
+
+START = 1_704_067_230.0  # 2024-01-01 00:00:30 UTC, in seconds
+
+class FakeTime:
+    """Stands in for the time module: time() and monotonic() move only when advanced."""
+
+    def __init__(self, now=START):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+class FakeServer:
+    """fetch_time with a true offset (ms), drifting drift ms per second, and per-call (up, down) network delays in ms."""
+
+    def __init__(self, clock, offset_ms, delays=None, drift=0.0):
+        self.clock = clock
+        self.offset_ms = offset_ms
+        self.drift = drift
+        self.delays = list(delays or [])
+        self.started = clock.now
+
+    def true_offset(self):
+        return self.offset_ms + self.drift * (self.clock.now - self.started)
+
+    async def fetch_time(self):
+        up, down = self.delays.pop(0) if self.delays else (5, 5)
+        self.clock.advance(up / 1000)
+        server_time = self.clock.now * 1000 + self.true_offset()
+        self.clock.advance(down / 1000)
+        return server_time
+
+@pytest.fixture
+def fake_time(monkeypatch):
+    clock = FakeTime()
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay):
+        clock.advance(delay)
+        await real_sleep(0)
+    monkeypatch.setattr(time_utils, 'time', clock)
+    monkeypatch.setattr(time_utils.asyncio, 'sleep', fake_sleep)
+    return clock
+
+def test_sync_takes_the_offset_from_the_shortest_round_trip(fake_time):
+    # Asymmetric delays skew the midpoint estimate; the 10ms symmetric sample is exact
+    server = FakeServer(fake_time, 1500, delays=[(40, 0), (5, 5), (0, 30)])
+    clock = ServerClock(server, samples=3)
+    assert asyncio.run(clock.sync()) == pytest.approx(1500)
+    assert clock.rtt_ms == pytest.approx(10, abs=0.01)
+    assert clock.now_ms() == pytest.approx(fake_time.now * 1000 + 1500)
+    assert server.nonce() == int(clock.now_ms())
+
+def test_drift_is_tracked_across_syncs(fake_time):
+    server = FakeServer(fake_time, 1000, drift=0.2)
+    clock = ServerClock(server, samples=1)
+
+    async def scenario():
+        await clock.sync()
+        for _ in range(3):
+            fake_time.advance(100)
+            await clock.sync()
+    asyncio.run(scenario())
+    assert 0.1 < clock.drift <= 0.2
+    # Between syncs the offset keeps moving at the tracked rate
+    fake_time.advance(100)
+    assert abs(clock.offset() - server.true_offset()) < abs(clock.offset_ms - server.true_offset())
+
+def test_drift_is_capped_on_a_clock_step(fake_time):
+    server = FakeServer(fake_time, 0)
+    clock = ServerClock(server, samples=1)
+
+    async def scenario():
+        await clock.sync()
+        fake_time.advance(60)
+        server.offset_ms = 60_000
+        await clock.sync()
+    asyncio.run(scenario())
+    assert clock.drift == ServerClock.MAX_DRIFT
+    assert clock.offset_ms == pytest.approx(60_000)
+
+def test_failed_sync_keeps_the_previous_offset(fake_time):
+    server = FakeServer(fake_time, 250)
+    clock = ServerClock(server, samples=1)
+    asyncio.run(clock.sync())
+
+    async def unreachable():
+        raise ConnectionError("timeout")
+    server.fetch_time = unreachable
+    assert asyncio.run(clock.sync()) is None
+    assert clock.offset_ms == pytest.approx(250)
+
+def test_wait_for_next_candle_wakes_at_the_server_close(fake_time):
+    server = FakeServer(fake_time, 2000)
+    clock = ServerClock(server, samples=1)
+    asyncio.run(clock.sync())
+    expected = next_candle_close('1m', clock.now_ms())
+    checks = []
+
+    async def is_closed(close_ms):
+        checks.append(clock.now_ms())
+        return len(checks) == 3
+
+    assert asyncio.run(wait_for_next_candle('1m', clock, is_closed=is_closed, poll_interval=0.1)) == expected
+    # Woken on the server clock (2s ahead of local time), then polled until the closed candle showed up
+    assert expected <= checks[0] < expected + 30
+    assert len(checks) == 3
+
+def test_wait_for_next_candle_gives_up_polling_after_max_poll(fake_time):
+    clock = ServerClock(FakeServer(fake_time, 0))
+
+    async def never_closed(close_ms):
+        return False
+
+    close_ms = asyncio.run(wait_for_next_candle('1m', clock, is_closed=never_closed, poll_interval=0.5, max_poll=3))
+    assert close_ms == next_candle_close('1m', START * 1000)
+    assert close_ms + 3000 <= clock.now_ms() <= close_ms + 3500
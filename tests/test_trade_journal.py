@@ -0,0 +1,31 @@
+# test_trade_journal.py
+import asyncio
+from mock_exchange import MockExchange
+from trade_journal import TradeJournal, with_account_fills
+
+SYMBOL = 'BTC/USDT'
+
+def test_fees_come_from_account_trades_of_the_trade_orders():
+    async def scenario():
+        exchange = MockExchange(prices={SYMBOL: 100.0}, fee_rate=0.001)
+        entry = await exchange.create_market_buy_order(SYMBOL, 2.0)
+        other = await exchange.create_market_buy_order(SYMBOL, 1.0)
+        exit_order = await exchange.create_market_sell_order(SYMBOL, 3.0)
+        return [await with_account_fills(exchange, SYMBOL, order) for order in (entry, other, exit_order)]
+
+    entry, other, exit_order = asyncio.run(scenario())
+    assert 'fee' not in entry and len(entry['trades']) == 1
+    journal = TradeJournal(':memory:')
+    for order in (entry, other, exit_order):
+        journal.record_fill(SYMBOL, order['side'], 'entry' if order['side'] == 'buy' else 'exit', order)
+    # Opened long after the fills were stamped, as with a local clock ahead of the exchange
+    trade = journal.record_trade(SYMBOL, 'long', 2.0, 100.0, 100.0, 0.0, 0.0, 'Take-profit', opened_at=4e9, order_ids=(entry['id'], exit_order['id']))
+    assert abs(trade['fees'] - (0.2 + 0.3)) < 1e-9
+
+def test_orders_without_account_trades_are_kept():
+    class NoTrades(MockExchange):
+        async def fetch_my_trades(self, *args, **kwargs):
+            raise ConnectionError("timeout")
+
+    order = {'id': '7', 'amount': 1.0, 'price': 100.0}
+    assert asyncio.run(with_account_fills(NoTrades(), SYMBOL, order)) is order
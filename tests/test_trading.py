@@ -0,0 +1,140 @@
+# test_trading.py
+import asyncio
+import pandas as pd
+from mock_exchange import MockExchange
+from trade_journal import TradeJournal, with_account_fills
+from trading import process_trade, place_market_buy_order, place_market_sell_order, get_balance, find_filled_bracket, EXTERNAL_CLOSE
+
+SYMBOL = 'BTC/USDT'
+
+async def no_exit(df, exit_state):
+    return False
+
+async def fetch_candles(symbol, timeframe):
+    return pd.DataFrame({'close': [100.0]})
+
+class Trade:
+    """process_trade on a MockExchange with a long position already open, signals collected in messages."""
+
+    def __init__(self, use_brackets=True, take_profit_pct=5, stop_loss_pct=5):
+        self.exchange = MockExchange(prices={SYMBOL: 100.0})
+        self.journal = TradeJournal(':memory:')
+        self.messages = []
+        self.use_brackets = use_brackets
+        self.take_profit_pct = take_profit_pct
+        self.stop_loss_pct = stop_loss_pct
+
+    async def send_signal(self, text):
+        self.messages.append(text)
+
+    async def start(self):
+        entry = await place_market_buy_order(SYMBOL, 1.0, self.exchange)
+        self.journal.record_fill(SYMBOL, 'buy', 'entry', await with_account_fills(self.exchange, SYMBOL, entry))
+        self.task = asyncio.create_task(process_trade(
+            SYMBOL, 100.0, self.exchange, '1m', 21, 60, 365, self.take_profit_pct, self.stop_loss_pct, 60, False, self.journal, [SYMBOL], [None],
+            fetch_candles, lambda df, p1, p2, p3: df, no_exit, place_market_sell_order, place_market_buy_order, get_balance, self.send_signal,
+            lambda: '00:00', lambda: '00:00', 1, poll_interval=0.01, use_brackets=self.use_brackets, entry_order_id=entry['id'],
+        ))
+
+    async def wait_for_brackets(self):
+        while len(self.open_orders()) < 2:
+            await asyncio.sleep(0.01)
+        return self.open_orders()
+
+    def open_orders(self):
+        return [order for order in self.exchange.orders.values() if order['status'] == 'open']
+
+    async def result(self):
+        return await asyncio.wait_for(self.task, 2)
+
+def run(scenario):
+    return asyncio.run(scenario())
+
+def test_take_profit_bracket_fill_cancels_stop_loss():
+    async def scenario():
+        trade = Trade()
+        await trade.start()
+        await trade.wait_for_brackets()
+        trade.exchange.set_price(SYMBOL, 106.0)
+        order = await trade.result()
+        return trade, order
+
+    trade, order = run(scenario)
+    assert order['type'] == 'TAKE_PROFIT_MARKET' and order['average'] == 106.0
+    assert [o['status'] for o in trade.exchange.orders.values() if o['type'] == 'STOP_MARKET'] == ['canceled']
+    stats = trade.journal.stats()
+    assert stats['trades'] == 1 and stats['wins'] == 1
+    assert abs(stats['fees'] - (100.0 + 106.0) * trade.exchange.fee_rate) < 1e-9
+    assert trade.journal.recent(1)[0]['reason'] == 'Take-profit'
+
+def test_position_closed_after_brackets_were_cancelled():
+    # Binance drops closePosition stops with the position, so no bracket ever fills
+    async def scenario():
+        trade = Trade()
+        await trade.start()
+        for order in await trade.wait_for_brackets():
+            await trade.exchange.cancel_order(order['id'], SYMBOL)
+        trade.exchange.set_price(SYMBOL, 97.0)
+        trade.exchange.close_position(SYMBOL)
+        return trade, await trade.result()
+
+    trade, order = run(scenario)
+    assert order is None
+    recorded = trade.journal.recent(1)[0]
+    assert recorded['reason'] == EXTERNAL_CLOSE and recorded['exit_price'] == 97.0
+    assert 'Closed externally' in trade.messages[-1]
+
+def test_position_closed_while_brackets_still_open():
+    async def scenario():
+        trade = Trade()
+        await trade.start()
+        await trade.wait_for_brackets()
+        trade.exchange.close_position(SYMBOL)
+        await trade.result()
+        return trade
+
+    trade = run(scenario)
+    assert trade.open_orders() == []
+    assert trade.journal.recent(1)[0]['reason'] == EXTERNAL_CLOSE
+
+def test_position_closed_without_brackets():
+    async def scenario():
+        trade = Trade(use_brackets=False)
+        await trade.start()
+        while not any(call[0] == 'fetch_positions' for call in trade.exchange.calls):
+            await asyncio.sleep(0.01)
+        trade.exchange.close_position(SYMBOL, 103.0)
+        await trade.result()
+        return trade
+
+    trade = run(scenario)
+    assert trade.journal.recent(1)[0]['reason'] == EXTERNAL_CLOSE
+    assert trade.journal.stats()['trades'] == 1
+
+def test_find_filled_bracket_waits_while_one_is_open():
+    async def scenario():
+        exchange = MockExchange(prices={SYMBOL: 100.0})
+        tp = await exchange.create_order(SYMBOL, 'TAKE_PROFIT_MARKET', 'sell', 1.0, None, {'stopPrice': '110'})
+        sl = await exchange.create_order(SYMBOL, 'STOP_MARKET', 'sell', 1.0, None, {'stopPrice': '90'})
+        brackets = {'Take-profit': tp['id'], 'Stop-loss': sl['id']}
+        pending = await find_filled_bracket(SYMBOL, brackets, exchange)
+        await exchange.cancel_order(tp['id'], SYMBOL)
+        still_pending = await find_filled_bracket(SYMBOL, brackets, exchange)
+        exchange.orders[sl['id']]['status'] = 'expired'
+        return pending, still_pending, await find_filled_bracket(SYMBOL, brackets, exchange)
+
+    assert run(scenario) == ((None, None), (None, None), (EXTERNAL_CLOSE, None))
+
+def test_take_profit_without_brackets_closes_with_market_sell():
+    async def scenario():
+        trade = Trade(use_brackets=False, take_profit_pct=1)
+        await trade.start()
+        while not any(call[0] == 'fetch_positions' for call in trade.exchange.calls):
+            await asyncio.sleep(0.01)
+        trade.exchange.set_price(SYMBOL, 102.0)
+        return trade, await trade.result()
+
+    trade, order = run(scenario)
+    assert order['type'] == 'market' and order['side'] == 'sell' and order['reduceOnly']
+    assert trade.exchange.positions[SYMBOL]['contracts'] == 0
+    assert trade.journal.recent(1)[0]['reason'] == 'Take-profit'